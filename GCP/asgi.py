@@ -2,6 +2,8 @@
 ASGI config for GCP project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with ``gunicorn GCP.asgi:application -k uvicorn.workers.UvicornWorker``
+so async views such as the dashboard run on the event loop.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -35,6 +35,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'gwizacash.replicas.ReplicaStickyMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -48,7 +49,6 @@ TEMPLATES = [
             os.path.join(BASE_DIR, 'templates'),
             os.path.join(BASE_DIR, 'gwizacash', 'templates'),
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -56,6 +56,13 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compile each template once per process instead of on every render
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -63,8 +70,44 @@ TEMPLATES = [
 WSGI_APPLICATION = 'GCP.wsgi.application'
 
 # Database
+# DB_POOL_MAX_SIZE > 0 turns on psycopg's connection pool for PostgreSQL (needs psycopg[pool]);
+# otherwise each thread keeps a persistent connection that is health-checked before reuse
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '0'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+
+
+def database_config(url):
+    config = dj_database_url.parse(url, conn_max_age=600, conn_health_checks=True)
+    if DB_POOL_MAX_SIZE > 0 and config['ENGINE'] == 'django.db.backends.postgresql':
+        # The pool owns connection lifetimes, so Django's persistent connections must be off
+        config['CONN_MAX_AGE'] = 0
+        config.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': min(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE),
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    return config
+
+
 DATABASES = {
-    'default': dj_database_url.parse(os.environ.get('DATABASE_URL'), conn_max_age=600)
+    'default': database_config(os.environ.get('DATABASE_URL'))
+}
+
+# Optional read replica for reporting pages (see gwizacash/replicas.py)
+if os.environ.get('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = database_config(os.environ['DATABASE_REPLICA_URL'])
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['gwizacash.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '15'))
+REPLICA_READ_PATH_PREFIXES = ('/admin/',)
+
+# Cache (template fragments on the dashboard, member and loan pages)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gwizacash',
+    }
 }
 
 # Password validation
@@ -107,6 +150,8 @@ LOGIN_REDIRECT_URL = '/'
 # APScheduler settings
 APSCHEDULER_DATETIME_FORMAT = "N j, Y, f:s a"
 APSCHEDULER_RUN_NOW_TIMEOUT = 25  # Seconds
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '1'))  # Groups processed concurrently by scheduled jobs
+SCHEDULER_AUTOSTART = True  # Start the scheduled jobs when the app loads (never in DEBUG)
 
 # Logging configuration
 LOGGING = {
@@ -0,0 +1,9 @@
+"""Settings for the test suite: an in-memory sqlite database and no background scheduler"""
+import os
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://:memory:')
+
+from .settings import *  # noqa: E402,F401,F403
+
+SCHEDULER_AUTOSTART = False
+LOGGING['handlers']['file']['filename'] = os.devnull  # noqa: F405
@@ -1,18 +1,21 @@
 from django.contrib import admin
 from .models import (
-    UserProfile, Deposit, Loan, LoanPayment, 
-    Transaction, Penalty, ProfitDistribution, 
-    MonthlySharePayment, MonthlyDeadline
+    UserProfile, Deposit, Loan, LoanInstallment, LoanPayment, 
+    Transaction, Penalty, ProfitDistribution, DistributionRun,
+    MonthlySharePayment, MonthlyDeadline, DeadlineCompliance, SavingsGroup, WorkQueueCounts
 )
 
+admin.site.register(SavingsGroup)
 admin.site.register(UserProfile)
 admin.site.register(Deposit)
 admin.site.register(Loan)
+admin.site.register(LoanInstallment)
 admin.site.register(LoanPayment)
 admin.site.register(Transaction)
 admin.site.register(Penalty)
 admin.site.register(ProfitDistribution)
 admin.site.register(MonthlySharePayment)
 admin.site.register(MonthlyDeadline)
-
-
+admin.site.register(DeadlineCompliance)
+admin.site.register(DistributionRun)
+admin.site.register(WorkQueueCounts)
@@ -0,0 +1,175 @@
+"""Read-only JSON API for the mobile client.
+
+Every endpoint answers conditional GETs: the ETag is built from the member's
+version stamp (UserProfile.version_stamp), so a matching If-None-Match gets a
+304 before any of the summary queries run.
+"""
+import hashlib
+from decimal import Decimal
+from functools import wraps
+
+from django.core.paginator import Paginator
+from django.db.models import Count, Sum
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
+
+from .models import Loan, MonthlySharePayment, Penalty, Transaction
+from .replicas import replica_reads
+
+API_PAGE_SIZE = 20
+
+
+def api_login_required(view_func):
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def member_etag(request, *args, **kwargs):
+    stamp = request.user.userprofile.version_stamp()
+    # Overdue days and loan penalties move with the calendar even when nothing is written
+    key = f'{request.user.pk}:{stamp.isoformat()}:{timezone.localdate().isoformat()}:{request.get_full_path()}'
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def member_api_view(view_func):
+    """GET/HEAD only, session authenticated, answered with 304 while the member's data is unchanged"""
+    return require_safe(api_login_required(replica_reads(
+        cache_control(private=True, no_cache=True)(condition(etag_func=member_etag)(view_func))
+    )))
+
+
+def _paginate(request, queryset, serialize):
+    page_obj = Paginator(queryset, API_PAGE_SIZE).get_page(request.GET.get('page'))
+    return {
+        'count': page_obj.paginator.count,
+        'page': page_obj.number,
+        'num_pages': page_obj.paginator.num_pages,
+        'results': [serialize(obj) for obj in page_obj.object_list],
+    }
+
+
+def _installment_data(installment):
+    return {
+        'number': installment.number,
+        'due_date': installment.due_date,
+        'expected_amount': installment.expected_amount,
+        'amount_paid': installment.amount_paid,
+        'is_paid': installment.is_paid,
+    }
+
+
+def _loan_data(loan):
+    return {
+        'id': loan.id,
+        'amount': loan.amount,
+        'interest_amount': loan.interest_amount,
+        'total_amount': loan.total_amount,
+        'remaining_balance': loan.remaining_balance,
+        'status': loan.status,
+        'duration': loan.duration,
+        'request_date': loan.request_date,
+        'disbursement_date': loan.disbursement_date,
+        'due_date': loan.due_date,
+        'is_overdue': loan.is_overdue,
+        'days_overdue': loan.days_overdue,
+        'accrued_penalty': loan.accrued_penalty,
+        'installments': [_installment_data(installment) for installment in loan.installments.all()],
+    }
+
+
+def _penalty_data(penalty):
+    return {
+        'id': penalty.id,
+        'penalty_type': penalty.penalty_type,
+        'amount': penalty.amount,
+        'days_late': penalty.days_late,
+        'original_due_date': penalty.original_due_date,
+        'description': penalty.description,
+        'is_paid': penalty.is_paid,
+        'date': penalty.date,
+    }
+
+
+def _transaction_data(transaction):
+    return {
+        'id': transaction.id,
+        'transaction_type': transaction.transaction_type,
+        'amount': transaction.amount,
+        'status': transaction.status,
+        'reference_id': transaction.reference_id,
+        'description': transaction.description,
+        'date': transaction.date,
+    }
+
+
+@member_api_view
+def member_summary(request):
+    user = request.user
+    profile = user.userprofile
+
+    loans = Loan.objects.filter(user=user)
+    loan_balance = loans.outstanding().aggregate(total=Sum('remaining_balance'))['total'] or Decimal('0')
+    overdue = loans.overdue().aggregate(count=Count('id'), penalty=Sum('accrued_penalty'))
+    unpaid_penalties = Penalty.objects.filter(user=user, is_paid=False).aggregate(
+        count=Count('id'), total=Sum('amount')
+    )
+    has_monthly_payment = MonthlySharePayment.objects.filter(
+        user=user,
+        payment_month=timezone.now().date().replace(day=1)
+    ).exists()
+
+    return JsonResponse({
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'full_name': user.get_full_name(),
+            'user_type': profile.user_type,
+        },
+        'total_savings': profile.total_savings,
+        'shares': {
+            'committed': profile.committed_shares,
+            'paid': profile.paid_shares,
+            'remaining': profile.remaining_shares,
+            'share_value': profile.share_value,
+            'total_commitment': profile.total_commitment,
+            'remaining_balance': profile.remaining_share_balance,
+        },
+        'has_monthly_payment': has_monthly_payment,
+        'loan_balance': loan_balance,
+        'overdue_loans': overdue['count'],
+        'loan_penalties': overdue['penalty'] or Decimal('0'),
+        'unpaid_penalties': unpaid_penalties['count'],
+        'unpaid_penalty_amount': unpaid_penalties['total'] or Decimal('0'),
+        'version': profile.version_stamp(),
+    })
+
+
+@member_api_view
+def member_loans(request):
+    loans = Loan.objects.filter(user=request.user).with_overdue_info().prefetch_related(
+        'installments'
+    ).order_by('-created_at')
+    return JsonResponse({'results': [_loan_data(loan) for loan in loans]})
+
+
+@member_api_view
+def member_penalties(request):
+    penalties = Penalty.objects.filter(user=request.user).order_by('-date')
+    status = request.GET.get('status')
+    if status == 'unpaid':
+        penalties = penalties.filter(is_paid=False)
+    elif status == 'paid':
+        penalties = penalties.filter(is_paid=True)
+    return JsonResponse(_paginate(request, penalties, _penalty_data))
+
+
+@member_api_view
+def member_transactions(request):
+    transactions = Transaction.objects.filter(user=request.user).order_by('-date')
+    return JsonResponse(_paginate(request, transactions, _transaction_data))
@@ -0,0 +1,112 @@
+"""Approval steps shared by the single-item approval views and statement reconciliation.
+
+Each function approves one pending record that the caller has already scoped
+to the coordinator's group. The PENDING -> APPROVED move is a conditional
+update, so only one coordinator can approve a record, and a record that was
+approved elsewhere raises ValidationError. Callers run these through
+retry_on_conflict so a versioned save that loses a race is retried.
+"""
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from .models import DeadlineCompliance, Deposit, Loan, LoanPayment, MonthlySharePayment, PenaltyPayment, Transaction, UserProfile
+from .work_queues import record_transition
+
+
+def approve_deposit(deposit, approver):
+    user_profile = UserProfile.objects.get(user=deposit.user)
+
+    # Calculate shares based on remaining balance
+    remaining_shares = user_profile.remaining_shares
+
+    # Approve the deposit - only one coordinator can move it out of PENDING
+    claimed = Deposit.objects.filter(pk=deposit.pk, status='PENDING').update(
+        status='APPROVED', approved_by=approver, approval_date=timezone.now()
+    )
+    if not claimed:
+        raise ValidationError('Deposit not found or already processed')
+    record_transition(deposit, 'PENDING', 'APPROVED')
+
+    payment_month = timezone.now().date().replace(day=1)
+
+    # Update user profile - add ALL remaining shares since amount equals remaining balance
+    user_profile.paid_shares += remaining_shares
+    user_profile.total_savings += deposit.amount
+    user_profile.add_held_shares(remaining_shares, payment_month)  # Share-months weigh profit distributions
+    user_profile.save()  # Versioned: recalculates remaining_share_balance to 0, retried on conflict
+
+    MonthlySharePayment.objects.create(
+        user=deposit.user,
+        payment_month=payment_month,
+        shares_paid=remaining_shares,
+        amount_paid=deposit.amount,
+        deposit=deposit
+    )
+    # A deposit after the deadline settles the arrears recorded in that month's snapshot
+    DeadlineCompliance.objects.record_payment(deposit.user, payment_month, remaining_shares)
+
+    Transaction.objects.create(
+        user=deposit.user,
+        transaction_type='DEPOSIT',
+        amount=deposit.amount,
+        status='COMPLETED',
+        reference_id=f'DEP-{deposit.id}',
+    )
+    return deposit
+
+
+def approve_loan_payment(payment, approver):
+    # Only one coordinator can move the payment out of PENDING
+    claimed = LoanPayment.objects.filter(pk=payment.pk, status='PENDING').update(
+        status='APPROVED', approved_by=approver, approval_date=timezone.now()
+    )
+    if not claimed:
+        raise ValidationError('Only pending payments can be approved.')
+    record_transition(payment, 'PENDING', 'APPROVED')
+
+    # Update loan balance from a fresh read; the versioned save retries if another payment landed first
+    loan = Loan.objects.select_related('user').get(pk=payment.loan_id)
+    loan.remaining_balance -= payment.amount
+
+    # Check if loan is fully paid
+    if loan.remaining_balance <= 0:
+        loan.status = 'REPAID'
+        loan.completion_date = timezone.now().date()
+        loan.remaining_balance = 0  # Ensure it's exactly 0
+
+    loan.save()
+
+    # Settle the oldest open installments with this payment
+    loan.apply_installment_payment(payment.amount)
+
+    # Create transaction record
+    Transaction.objects.create(
+        user=loan.user,
+        transaction_type='LOAN_PAYMENT',
+        amount=payment.amount,
+        description=f'Loan payment for Loan #{loan.id}',
+        date=payment.payment_date,
+        status='COMPLETED'
+    )
+    return loan
+
+
+def approve_penalty_payment(payment, approver):
+    claimed = PenaltyPayment.objects.filter(pk=payment.pk, status='PENDING').update(
+        status='APPROVED', approved_by=approver, approval_date=timezone.now()
+    )
+    if not claimed:
+        raise ValidationError('This payment has already been reviewed.')
+    record_transition(payment, 'PENDING', 'APPROVED')
+
+    payment.penalty.is_paid = True
+    payment.penalty.save()
+    Transaction.objects.filter(
+        reference_id=f'PENALTY_PAYMENT-{payment.id}',
+        transaction_type='PENALTY_PAYMENT'
+    ).update(status='COMPLETED', updated_at=timezone.now())
+    Transaction.objects.filter(
+        reference_id=f'FINE-{payment.penalty.id}',
+        transaction_type='PENALTY'
+    ).update(status='COMPLETED', updated_at=timezone.now())
+    return payment
@@ -13,5 +13,7 @@ class GwizacashConfig(AppConfig):
     name = 'gwizacash'
 
     def ready(self):
+        from . import cache_versions  # noqa: F401  (connects fragment cache invalidation)
+        from . import deadlines  # noqa: F401  (connects deadline calendar invalidation)
         from . import scheduler
         scheduler.start_scheduler()
@@ -0,0 +1,89 @@
+"""Version numbers used to key cached data.
+
+Member-level fragments are keyed on UserProfile.version_stamp(). Fragments that
+show group-wide data (financial cards, member and loan tables) are keyed on
+their group's version, bumped once a transaction that saved or deleted a model
+they render commits, so stale fragments are simply never looked up again.
+
+The fragments themselves may sit in a per-process cache, but the versions are
+CacheVersion rows: every web worker and the scheduler read the same number, so
+a write in any of them retires the cached copies held by all the others.
+"""
+import time
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    CacheVersion, Deposit, Loan, LoanInstallment, LoanPayment, MonthlySharePayment, Penalty,
+    PenaltyPayment, ProfitDistribution, Transaction, UserProfile
+)
+
+# model -> path from a saved record to its group.
+# CollectiveFund is deliberately absent: it is re-derived from these models on every read
+VERSIONED_MODELS = {
+    User: 'userprofile__group',
+    UserProfile: 'group',
+    Deposit: 'group',
+    Loan: 'group',
+    LoanInstallment: 'loan__group',
+    LoanPayment: 'loan__group',
+    MonthlySharePayment: 'user__userprofile__group',
+    Penalty: 'group',
+    PenaltyPayment: 'penalty__group',
+    ProfitDistribution: 'group',
+    Transaction: 'user__userprofile__group',
+}
+
+
+def cache_version(key):
+    version = CacheVersion.objects.filter(pk=key).values_list('version', flat=True).first()
+    if version is None:
+        # Seed from the clock so a recreated row never reuses an old cache key
+        version = CacheVersion.objects.get_or_create(key=key, defaults={'version': time.time_ns()})[0].version
+    return version
+
+
+def bump_cache_version(key):
+    if not CacheVersion.objects.filter(pk=key).update(version=F('version') + 1, updated_at=timezone.now()):
+        CacheVersion.objects.get_or_create(key=key, defaults={'version': time.time_ns()})
+
+
+def _group_key(group_id):
+    return f'group:{group_id}'
+
+
+def group_version(group_id):
+    return cache_version(_group_key(group_id))
+
+
+def bump_group_version(group_id):
+    bump_cache_version(_group_key(group_id))
+
+
+def _group_id_of(record, path):
+    steps = path.split('__')
+    try:
+        for step in steps[:-1]:
+            record = getattr(record, step)
+    except ObjectDoesNotExist:
+        return None
+    return getattr(record, f'{steps[-1]}_id')
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_group_fragments(sender, instance, **kwargs):
+    if sender not in VERSIONED_MODELS:
+        return
+    update_fields = kwargs.get('update_fields')
+    if sender is User and update_fields and set(update_fields) == {'last_login'}:
+        return
+    # After commit, so a fragment rendered from the old rows is never cached under the new version
+    transaction.on_commit(partial(bump_group_version, _group_id_of(instance, VERSIONED_MODELS[sender])))
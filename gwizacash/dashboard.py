@@ -0,0 +1,178 @@
+"""Reads behind the dashboard: a fast shell plus lazily loaded fragments.
+
+Each loader is a plain synchronous function returning evaluated data (lists,
+numbers, dicts) rather than lazy QuerySets, so templates never query while
+they render. The page itself only needs the member's balance, loans, penalties
+and urgent payment; load_dashboard() runs those loaders at once on a small
+dedicated thread pool, so the shell waits for the slowest of a few cheap reads.
+The pool's threads live as long as the process and keep their database
+connections between requests (subject to CONN_MAX_AGE and the health checks,
+or handed back to the psycopg pool when one is configured), so concurrency
+costs at most DASHBOARD_READ_WORKERS connections per process, not new ones per
+request. Recent activity, group financials and the
+coordinator queues are FRAGMENTS fetched by the page after it has painted,
+each rendered from its own cache entry with its own TTL.
+"""
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Count, Q, Sum
+from django.template.loader import render_to_string
+
+from .cache_versions import group_version
+from .deadlines import add_months, deadline_calendar, start_of_day
+from .models import (
+    CollectiveFund, DeadlineCompliance, Deposit, Loan, LoanInstallment, MonthlySharePayment, Penalty, Transaction,
+    UserProfile
+)
+from .work_queues import queue_counts
+
+OUTSTANDING_LOAN_STATUSES = ['DISBURSED', 'ACTIVE']
+
+
+def member_loans(user):
+    active_loans = list(
+        Loan.objects.filter(user=user).outstanding().with_overdue_info().order_by('due_date')
+    )
+    overdue_loans = sorted(
+        (loan for loan in active_loans if loan.overdue_since is not None),
+        key=lambda loan: loan.days_overdue, reverse=True,
+    )
+    return {
+        'approved_loans': list(Loan.objects.filter(user=user, status='APPROVED')),  # Waiting for disbursement
+        'active_loans': active_loans,
+        'total_loan_balance': sum(loan.remaining_balance for loan in active_loans),
+        'overdue_loans': overdue_loans,
+        'loan_penalties': sum(loan.accrued_penalty for loan in overdue_loans),
+    }
+
+
+def member_penalties(user):
+    return list(Penalty.objects.filter(user=user, is_paid=False).order_by('id'))
+
+
+def member_month(user, month):
+    """Whether this month's shares are paid, and the first loan installment due this month"""
+    return {
+        'has_monthly_payment': MonthlySharePayment.objects.filter(user=user, payment_month=month).exists(),
+        'upcoming_installment': LoanInstallment.objects.filter(
+            loan__user=user,
+            loan__status__in=OUTSTANDING_LOAN_STATUSES,
+            is_paid=False,
+            due_date__gte=start_of_day(month),
+            due_date__lt=start_of_day(add_months(month, 1)),
+        ).order_by('due_date').first(),
+    }
+
+
+def member_arrears(user):
+    return list(DeadlineCompliance.objects.filter(user=user).open().order_by('due_date'))
+
+
+def recent_deposits(user, user_profile):
+    return {'recent_deposits': list(Deposit.objects.filter(user=user, status='APPROVED').order_by('-date')[:5])}
+
+
+def recent_transactions(user, user_profile):
+    return {'recent_transactions': list(Transaction.objects.filter(user=user).order_by('-date')[:10])}
+
+
+def group_financials(user, user_profile):
+    fund = CollectiveFund.get_fund(user_profile.group)
+    fund.update_totals()
+    return {'collective_fund': fund}
+
+
+def coordinator_stats(user, user_profile):
+    return {**coordinator_members(user_profile.group), **coordinator_queues(user_profile.group)}
+
+
+def coordinator_members(group):
+    members = UserProfile.objects.filter(group=group).aggregate(
+        total_members=Count('pk'),
+        members_only=Count('pk', filter=Q(user_type='MEMBER')),
+        coordinators=Count('pk', filter=Q(user_type='COORDINATOR')),
+        total_system_shares=Sum('committed_shares'),
+    )
+    members['total_system_shares'] = members['total_system_shares'] or 0
+    # Share arrears come from the open compliance snapshots of past deadlines
+    members['group_arrears'] = DeadlineCompliance.objects.filter(group=group).arrears()
+    return members
+
+
+def coordinator_queues(group):
+    # Waiting items come from the group's counters row rather than a COUNT per queue
+    counts = queue_counts(group.pk if group else None)
+    queues = {
+        'pending_loan_requests': counts['requested_loans'],
+        'approved_loans_count': counts['approved_loans'],  # Ready for disbursement
+        'pending_deposits_count': counts['pending_deposits'],
+        'pending_payments_count': counts['pending_loan_payments'],
+        'active_loans_count': Loan.objects.filter(group=group, status__in=OUTSTANDING_LOAN_STATUSES).count(),
+    }
+    queues['members_with_overdue_payments'] = Loan.objects.filter(
+        group=group
+    ).overdue().values('user').distinct().count()
+    return queues
+
+
+# One thread per shell loader; concurrent requests queue for them instead of opening more connections
+DASHBOARD_READ_WORKERS = 5
+_read_executor = ThreadPoolExecutor(max_workers=DASHBOARD_READ_WORKERS, thread_name_prefix='dashboard-read')
+
+
+def _on_read_thread(loader):
+    """Run a loader on the dashboard's thread pool, reusing the thread's connection as a request would"""
+    def run(*args):
+        # What request_started/request_finished do: drop connections past CONN_MAX_AGE or left broken
+        close_old_connections()
+        try:
+            return loader(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False, executor=_read_executor)
+
+
+async def load_dashboard(user, user_profile, today):
+    """The dashboard shell's reads for the user, issued concurrently; returns the results by name"""
+    month = today.replace(day=1)
+    loaders = {
+        'loans': (member_loans, user),
+        'penalties': (member_penalties, user),
+        'month': (member_month, user, month),
+        'arrears': (member_arrears, user),
+        'deadlines': (deadline_calendar,),
+    }
+    results = await asyncio.gather(*(_on_read_thread(loader)(*args) for loader, *args in loaders.values()))
+    return dict(zip(loaders, results))
+
+
+# scope 'member' caches a fragment per member until their data changes, 'group' per group until any group data does
+Fragment = namedtuple('Fragment', 'template loader ttl scope coordinator_only')
+
+FRAGMENTS = {
+    'recent-deposits': Fragment('gwizacash/dashboard/recent_deposits.html', recent_deposits, 600, 'member', False),
+    'recent-activity': Fragment('gwizacash/dashboard/recent_activity.html', recent_transactions, 600, 'member', False),
+    'group-financials': Fragment('gwizacash/dashboard/group_financials.html', group_financials, 600, 'group', False),
+    # Queues are what coordinators act on, so they are never more than a minute old
+    'coordinator-queues': Fragment('gwizacash/dashboard/coordinator_queues.html', coordinator_stats, 60, 'group', True),
+}
+
+
+def render_fragment(request, fragment, user_profile):
+    """A fragment's HTML from the cache, rendered and cached on a miss"""
+    if fragment.scope == 'member':
+        version = f'{user_profile.user_id}:{user_profile.version_stamp().timestamp()}'
+    else:
+        version = f'{user_profile.group_id}:{group_version(user_profile.group_id)}'
+    key = f'gwizacash:dashboard-fragment:{fragment.template}:{version}'
+    html = cache.get(key)
+    if html is None:
+        context = fragment.loader(request.user, user_profile)
+        html = render_to_string(fragment.template, context, request=request)
+        cache.set(key, html, fragment.ttl)
+    return html
@@ -0,0 +1,106 @@
+"""Monthly share deadlines as one in-process calendar.
+
+Every MonthlyDeadline row is materialised once into a dict of local calendar
+dates keyed by (group, month); months without a row fall back to the default
+day. The penalty engine, the dashboard and the profit distribution page all
+read dates from here instead of rebuilding them from month and deadline_day.
+
+The calendar is rebuilt when its CacheVersion row changes, which every web
+worker and the scheduler read from the database. Saving or deleting a
+MonthlyDeadline bumps it; bulk queryset updates skip the signals, so call
+invalidate_deadline_calendar() after one.
+"""
+import calendar
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache_versions import bump_cache_version, cache_version
+from .models import MonthlyDeadline
+
+DEFAULT_DEADLINE_DAY = 10
+CALENDAR_VERSION_KEY = 'deadline-calendar'
+
+Deadline = namedtuple('Deadline', 'pk group_id month date')
+
+
+def deadline_date(month, deadline_day=DEFAULT_DEADLINE_DAY):
+    """Deadline day of a month, clamped to the month's last day"""
+    last_day = calendar.monthrange(month.year, month.month)[1]
+    return month.replace(day=min(max(deadline_day, 1), last_day))
+
+
+def start_of_day(day):
+    """Aware midnight opening a local calendar date"""
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+class DeadlineCalendar:
+    def __init__(self, deadlines):
+        # Group-specific deadlines override the ones without a group for the same month
+        self._deadlines = {}
+        for row in sorted(deadlines, key=lambda row: (row.group_id is not None, row.pk)):
+            month = row.month.replace(day=1)
+            self._deadlines[(row.group_id, month)] = Deadline(
+                row.pk, row.group_id, month, deadline_date(month, row.deadline_day)
+            )
+        self._by_date = sorted(self._deadlines.values(), key=lambda deadline: (deadline.date, deadline.pk))
+
+    def deadline_for(self, group_id, month):
+        """Deadline date of a group's month, explicit or by default"""
+        month = month.replace(day=1)
+        deadline = self._deadlines.get((group_id, month)) or self._deadlines.get((None, month))
+        return deadline.date if deadline else deadline_date(month)
+
+    def next_deadline(self, group_id, today=None):
+        """The first deadline on or after today"""
+        today = today or timezone.localdate()
+        this_month = self.deadline_for(group_id, today)
+        return this_month if this_month >= today else self.deadline_for(group_id, add_months(today, 1))
+
+    def passed(self, group_id, today, since=None):
+        """Recorded deadlines applying to the group that fell in [since, today), oldest first"""
+        return [
+            deadline for deadline in self._by_date
+            if deadline.date < today and (since is None or deadline.date >= since)
+            and self._deadlines.get((group_id, deadline.month), deadline) == deadline
+            and deadline.group_id in (None, group_id)
+        ]
+
+
+_lock = threading.Lock()
+_calendar = None
+_calendar_version = None
+
+
+def deadline_calendar():
+    """The process's deadline calendar, rebuilt after any MonthlyDeadline write"""
+    global _calendar, _calendar_version
+    version = cache_version(CALENDAR_VERSION_KEY)
+    if _calendar is None or _calendar_version != version:
+        with _lock:
+            if _calendar is None or _calendar_version != version:
+                _calendar = DeadlineCalendar(MonthlyDeadline.objects.only('pk', 'group_id', 'month', 'deadline_day'))
+                _calendar_version = version
+    return _calendar
+
+
+def invalidate_deadline_calendar():
+    bump_cache_version(CALENDAR_VERSION_KEY)
+
+
+@receiver(post_save, sender=MonthlyDeadline)
+@receiver(post_delete, sender=MonthlyDeadline)
+def deadline_changed(sender, **kwargs):
+    # After commit, so no process can rebuild from the old rows under the new version
+    transaction.on_commit(invalidate_deadline_calendar)
@@ -0,0 +1,188 @@
+"""Monthly profit distribution as a resumable batch job.
+
+start_run() freezes what a group's month will pay out: the available profit
+and each member's weight (committed shares or share-months), one
+DistributionRunMember row per member, so deposits approved or shares changed
+while the run is under way cannot change anyone's part. advance_run() then
+pays the next chunk of those members in one short transaction that also
+moves the run's cursor past them, so no
+transaction spans the whole group and a run interrupted by a crash or a
+deploy picks up after the last member it paid. Chunks lock the run row, so
+the scheduler and a coordinator's browser can both push the same run
+forward without paying anyone twice. A run that keeps failing the same way
+is retried by the scheduler MAX_AUTO_RETRIES times, then left FAILED until a
+coordinator resumes it.
+"""
+import logging
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import (
+    CollectiveFund, DistributionRun, DistributionRunMember, ProfitDistribution, ProfitDistributionSummary,
+    SavingsGroup, Transaction, UserProfile, retry_on_conflict
+)
+from .money import share, to_cents, to_decimal
+from .profit_simulator import DISTRIBUTION_WEIGHT_FIELDS, distribution_weight
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+PROFIT_SOURCE = 'LOAN_INTEREST_AND_PENALTIES'
+
+
+def _members(group_id):
+    return UserProfile.objects.filter(group_id=group_id, committed_shares__gt=0)
+
+
+def start_run(group_id, month, basis='committed', started_by=None, chunk_size=CHUNK_SIZE):
+    """The group's run for month, created with its profit and weights frozen if there is none yet"""
+    month = month.replace(day=1)
+    with transaction.atomic():
+        # Lock the group's fund row so two callers cannot both start a run
+        fund = CollectiveFund.get_fund(SavingsGroup.objects.get(pk=group_id))
+        fund = CollectiveFund.objects.select_for_update().get(pk=fund.pk)
+
+        run = DistributionRun.objects.filter(group_id=group_id, month=month).first()
+        if run is not None:
+            return run
+        # Distributions paid before runs existed still count for their month
+        if ProfitDistribution.objects.filter(
+            group_id=group_id, run__isnull=True,
+            distribution_date__year=month.year, distribution_date__month=month.month,
+        ).exists():
+            raise ValidationError(f"Profits for {month:%Y-%m} have already been distributed.")
+
+        fund.update_totals()
+        if fund.available_profit <= 0:
+            raise ValidationError('No profits available to distribute.')
+
+        weights = {
+            profile.user_id: distribution_weight(profile, basis, month)
+            for profile in _members(group_id).only(*DISTRIBUTION_WEIGHT_FIELDS)
+        }
+        total_weight = sum(weights.values())
+        if not total_weight:
+            unit = 'share-months held' if basis == 'share_months' else 'committed shares'
+            raise ValidationError(f'No {unit} found. Cannot distribute profits.')
+
+        run = DistributionRun.objects.create(
+            group_id=group_id,
+            month=month,
+            basis=basis,
+            profit=fund.available_profit,
+            total_weight=total_weight,
+            chunk_size=chunk_size,
+            members_total=len(weights),
+            started_by=started_by,
+        )
+        DistributionRunMember.objects.bulk_create([
+            DistributionRunMember(run=run, user_id=user_id, weight=weight)
+            for user_id, weight in weights.items()
+        ], batch_size=1000)
+        return run
+
+
+def _pay_chunk(run_id):
+    run = DistributionRun.objects.select_for_update().get(pk=run_id)
+    if run.is_finished:
+        return run
+
+    unit = 'share-month' if run.basis == 'share_months' else 'share'
+    per_share_amount = run.per_share_amount
+    # Worked in whole cents; Decimals only for what is written
+    profit = to_cents(run.profit)
+    distributed = to_cents(run.total_distributed)
+    distribution_date = timezone.now()
+
+    members = list(
+        run.members.filter(user_id__gt=run.cursor).select_related('user__userprofile')
+        .order_by('user_id')[:run.chunk_size]
+    )
+    for member in members:
+        weight = member.weight
+        # Rounded down to the cent; the frozen weights add up to total_weight, so the run cannot overspend
+        user_profit = min(share(profit, weight, run.total_weight), profit - distributed)
+        if user_profit <= 0:
+            continue
+        distributed += user_profit
+        amount = to_decimal(user_profit)
+        ProfitDistribution.objects.create(
+            user=member.user,
+            group_id=run.group_id,
+            run=run,
+            distribution_date=distribution_date,
+            total_amount=amount,
+            per_share_amount=per_share_amount,
+            source=PROFIT_SOURCE,
+            shares_distributed=weight,
+            basis=run.basis,
+        )
+        Transaction.objects.create(
+            user=member.user,
+            transaction_type='PROFIT_DISTRIBUTION',
+            amount=amount,
+            description=f'Monthly profit for {weight} {unit}s @ {per_share_amount:.2f} RWF/{unit}',
+            date=distribution_date,
+            status='COMPLETED'
+        )
+        profile = member.user.userprofile
+        profile.total_savings += amount
+        profile.save()
+
+    run.total_distributed = to_decimal(distributed)
+    if members:
+        run.cursor = members[-1].user_id
+        run.members_done += len(members)
+    run.error = ''
+    run.failures = 0
+    if len(members) < run.chunk_size:
+        ProfitDistributionSummary.objects.create(
+            group_id=run.group_id, total_distributed=run.total_distributed, source=PROFIT_SOURCE
+        )
+        CollectiveFund.get_fund(run.group).update_totals()
+        run.status = DistributionRun.STATUS.COMPLETED
+        run.completed_at = timezone.now()
+    else:
+        run.status = DistributionRun.STATUS.RUNNING
+    run.save()
+    return run
+
+
+def advance_run(run):
+    """Pay the run's next chunk of members; a chunk that fails is rolled back and the run marked FAILED"""
+    try:
+        return retry_on_conflict(_pay_chunk, run.pk)
+    except Exception as e:
+        logger.exception(f"Distribution run {run.pk} failed")
+        DistributionRun.objects.filter(pk=run.pk).exclude(status=DistributionRun.STATUS.COMPLETED).update(
+            status=DistributionRun.STATUS.FAILED, error=str(e), failures=F('failures') + 1, updated_at=timezone.now()
+        )
+        failures = DistributionRun.objects.filter(pk=run.pk).values_list('failures', flat=True).first()
+        if failures == DistributionRun.MAX_AUTO_RETRIES:
+            logger.error(
+                f"Distribution run {run.pk} (group {run.group_id}, {run.month:%Y-%m}) failed {failures} times in a row; "
+                f"left for a coordinator to resume"
+            )
+        raise
+
+
+def finish_run(run):
+    """Pay chunks until the run completes"""
+    while not run.is_finished:
+        run = advance_run(run)
+    return run
+
+
+def unfinished_runs(group_id=None):
+    runs = DistributionRun.objects.exclude(status=DistributionRun.STATUS.COMPLETED).order_by('month', 'pk')
+    return runs if group_id is None else runs.filter(group_id=group_id)
+
+
+def resumable_runs(group_id=None):
+    """Unfinished runs the scheduler may still retry on its own"""
+    return unfinished_runs(group_id).exclude(
+        status=DistributionRun.STATUS.FAILED, failures__gte=DistributionRun.MAX_AUTO_RETRIES
+    )
@@ -1,20 +1,209 @@
 # gwizacash/management/commands/calculate_penalties.py
 
-# gwizacash/management/commands/calculate_penalties.py
-
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from gwizacash.models import Loan, Penalty, MonthlyDeadline, MonthlySharePayment, UserProfile, Transaction
+from django.db.models import Exists, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Cast, Substr
+from gwizacash.models import (
+    DeadlineCompliance, LoanInstallment, Penalty, MonthlySharePayment, SavingsGroup, UserProfile, Transaction
+)
+from gwizacash.deadlines import deadline_calendar, start_of_day
+from gwizacash.money import Money
+from gwizacash.partitions import run_partitions, write_partition_report
 from decimal import Decimal
 from django.db import transaction
-from datetime import datetime, timedelta
+from datetime import datetime
 from gwizacash.views import calculate_penalty
 import logging
 
 logger = logging.getLogger(__name__)
 
+# calculate_penalty's schedule per share, in cents: a first-day fine, then a fixed amount per further day
+FIRST_DAY_FINE = Money.from_decimal(calculate_penalty(1))
+DAILY_FINE = Money.from_decimal(calculate_penalty(2)) - FIRST_DAY_FINE
+
+
+def accrual_terms(days_late, shares=1):
+    """(amount after days_late days, amount added per further day) under calculate_penalty's schedule"""
+    if days_late < 1:
+        return Decimal('0.00'), (DAILY_FINE * shares).decimal
+    amount = (FIRST_DAY_FINE + DAILY_FINE * (days_late - 1)) * shares
+    return amount.decimal, (DAILY_FINE * shares).decimal
+
+
+def stop_settled_accruals(group_id):
+    """Freeze penalties with nothing left owing behind them, as the full recompute used to.
+
+    A penalty keeps growing only while its deadline's compliance snapshot is still open or its
+    installment is still unpaid on an outstanding loan. One with neither (paid since, a repaid loan,
+    a member no longer committed to shares) stops where it is.
+    """
+    accruing = Penalty.objects.filter(group_id=group_id, is_paid=False, daily_rate__gt=0)
+    # A late deposit that covers the arrears closes the deadline's compliance snapshot
+    shares_owed = DeadlineCompliance.objects.filter(
+        user=OuterRef('user'), due_date=OuterRef('accrues_from'), closed=False
+    )
+    installment_owed = LoanInstallment.objects.filter(
+        loan__user=OuterRef('user'), loan__status__in=['DISBURSED', 'ACTIVE'],
+        due_date=OuterRef('original_due_date'), is_paid=False,
+    )
+    stopped = accruing.filter(penalty_type='LATE_DEPOSIT').exclude(Exists(shares_owed)).update(
+        daily_rate=Decimal('0.00'), updated_at=timezone.now()
+    )
+    stopped += accruing.filter(penalty_type='LATE_LOAN_REPAYMENT').exclude(Exists(installment_owed)).update(
+        daily_rate=Decimal('0.00'), updated_at=timezone.now()
+    )
+    return stopped
+
+
+def accrue_open_penalties(group_id, today):
+    """Add the days since each open penalty was last accrued, one bulk UPDATE per distinct watermark"""
+    accruing = Penalty.objects.filter(
+        group_id=group_id, is_paid=False, daily_rate__gt=0, accrued_through__lt=today
+    )
+    accrued = 0
+    # Every penalty accrued by the previous run shares its date, so this is normally a single UPDATE
+    for accrued_through in accruing.order_by().values_list('accrued_through', flat=True).distinct():
+        batch = accruing.filter(accrued_through=accrued_through)
+        references = [f'FINE-{penalty_id}' for penalty_id in batch.values_list('id', flat=True)]
+        days = (today - accrued_through).days
+        accrued += batch.update(
+            amount=F('amount') + F('daily_rate') * days,
+            days_late=F('days_late') + days,
+            accrued_through=today,
+            updated_at=timezone.now(),
+        )
+        # Keep each fine's pending ledger entry equal to the penalty
+        fine_amount = Penalty.objects.filter(
+            pk=Cast(Substr(OuterRef('reference_id'), 6), IntegerField())
+        ).values('amount')[:1]
+        Transaction.objects.filter(transaction_type='PENALTY', reference_id__in=references).update(
+            amount=Subquery(fine_amount), updated_at=timezone.now()
+        )
+    return accrued
+
+
+def snapshot_deadline(deadline, members):
+    """Record each member's shares due and paid for a calendar deadline that has just passed"""
+    shares_paid = dict(MonthlySharePayment.objects.filter(
+        user_id__in=[profile.user_id for profile in members], payment_month=deadline.month
+    ).values_list('user_id', 'shares_paid'))
+    # Existing snapshots are left alone: after the deadline only late deposits may change them
+    DeadlineCompliance.objects.bulk_create([
+        DeadlineCompliance(
+            deadline_id=deadline.pk,
+            user_id=profile.user_id,
+            group_id=profile.group_id,
+            due_date=deadline.date,
+            shares_due=profile.committed_shares,
+            shares_paid=shares_paid.get(profile.user_id, 0),
+            closed=shares_paid.get(profile.user_id, 0) >= profile.committed_shares,
+        )
+        for profile in members
+    ], batch_size=500, ignore_conflicts=True)
+
+
+def open_penalty(user, penalty_type, due, accrues_from, today, description, fine_description, shares=1):
+    days_late = max(1, (today - accrues_from).days)
+    amount, daily_rate = accrual_terms(days_late, shares)
+    penalty = Penalty.objects.create(
+        user=user,
+        penalty_type=penalty_type,
+        amount=amount,
+        days_late=days_late,
+        original_due_date=due,
+        description=description,
+        accrues_from=accrues_from,
+        daily_rate=daily_rate,
+        accrued_through=today,
+    )
+    Transaction.objects.create(
+        user=user,
+        transaction_type='PENALTY',
+        amount=amount,
+        status='PENDING',
+        reference_id=f'FINE-{penalty.id}',
+        description=fine_description,
+    )
+    return penalty
+
+
+def calculate_group_penalties(group_id, today, full_scan=False):
+    """Accrue one group's open penalties and open new ones for deadlines missed since the last run"""
+    penalties_created = 0
+
+    with transaction.atomic():
+        group = SavingsGroup.objects.select_for_update().get(pk=group_id)
+        since = None if full_scan else group.penalties_processed_through
+        if since is not None and since >= today:
+            return {'created': 0, 'accrued': 0, 'stopped': 0, 'skipped': f'already processed through {since}'}
+
+        penalties_stopped = stop_settled_accruals(group_id)
+        penalties_accrued = accrue_open_penalties(group_id, today)
+
+        # ----- Share Payment Penalties -----
+        # Only deadlines that passed since the watermark; deadlines without a group apply to every group
+        members = list(UserProfile.objects.filter(group_id=group_id, committed_shares__gt=0))
+        for deadline in deadline_calendar().passed(group_id, today, since):
+            due = start_of_day(deadline.date)
+            snapshot_deadline(deadline, members)
+            already_fined = set(Penalty.objects.filter(
+                user__userprofile__group_id=group_id,
+                penalty_type='LATE_DEPOSIT',
+                original_due_date=due,
+            ).values_list('user_id', flat=True))
+
+            arrears = DeadlineCompliance.objects.open().filter(
+                deadline_id=deadline.pk, group_id=group_id
+            ).exclude(user_id__in=already_fined).select_related('user')
+            for compliance in arrears:
+                missing_shares = compliance.shares_owed
+                open_penalty(
+                    compliance.user, 'LATE_DEPOSIT', due, deadline.date, today,
+                    description=f'Late payment for {missing_shares} shares',
+                    fine_description=f'Fine for late payment: {missing_shares} shares',
+                    shares=missing_shares,
+                )
+                penalties_created += 1
+
+        # ----- Loan Penalties -----
+        # One penalty per installment that fell overdue since the watermark, found with an indexed range query.
+        # Installments backfilled onto loans that predate schedules are only fined from when they were
+        # scheduled; before that a loan was fined once it passed its final due date, and that still holds.
+        today_start = start_of_day(today)
+        overdue_installments = LoanInstallment.objects.filter(
+            Q(due_date__gte=F('scheduled_at')) | Q(number=F('loan__duration')),
+            is_paid=False,
+            due_date__lt=today_start,
+            loan__group_id=group_id,
+            loan__status__in=['DISBURSED', 'ACTIVE'],
+        ).select_related('loan', 'loan__user')
+        if since is not None:
+            overdue_installments = overdue_installments.filter(due_date__gte=start_of_day(since))
+        for installment in overdue_installments:
+            loan = installment.loan
+            # Fines from before schedules were keyed by the loan's own due date
+            if Penalty.objects.filter(
+                user=loan.user, penalty_type='LATE_LOAN_REPAYMENT',
+                original_due_date__in=[installment.due_date, loan.due_date],
+            ).exists():
+                continue
+            open_penalty(
+                loan.user, 'LATE_LOAN_REPAYMENT', installment.due_date,
+                timezone.localtime(installment.due_date).date(), today,
+                description=f'Late loan repayment - Loan #{loan.id} installment {installment.number}',
+                fine_description=f'Fine for late loan repayment: Loan #{loan.id} installment {installment.number}',
+            )
+            penalties_created += 1
+
+        group.penalties_processed_through = today
+        group.save(update_fields=['penalties_processed_through'])
+
+    return {'created': penalties_created, 'accrued': penalties_accrued, 'stopped': penalties_stopped}
+
+
 class Command(BaseCommand):
-    help = 'Calculate penalties for late loans and share payments'
+    help = 'Accrue penalties for late loans and share payments, one savings group per partition'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -22,6 +211,17 @@ class Command(BaseCommand):
             type=str,
             help='Specify date for penalty calculation (YYYY-MM-DD)',
         )
+        parser.add_argument(
+            '--full-scan',
+            action='store_true',
+            help='Ignore the last-processed watermark and re-check every deadline and overdue installment',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of groups to process concurrently',
+        )
 
     def handle(self, *args, **kwargs):
         # Determine today
@@ -31,120 +231,14 @@ class Command(BaseCommand):
         else:
             today = timezone.now().date()
 
-        penalties_created = 0
-        penalties_updated = 0
-
-        with transaction.atomic():
-            # ----- Share Payment Penalties -----
-            deadlines = MonthlyDeadline.objects.all().order_by('month')
-            for deadline in deadlines:
-                # Construct exact deadline date
-                try:
-                    naive_deadline = deadline.month.replace(day=deadline.deadline_day)
-                except ValueError:
-                    naive_deadline = deadline.month.replace(day=1) + timedelta(days=deadline.deadline_day - 1)
-
-                deadline_date = timezone.make_aware(datetime.combine(naive_deadline, datetime.min.time())).date()
-
-                # Skip deadlines after today
-                if today <= deadline_date:
-                    continue
-
-                # Loop through all committed users
-                for profile in UserProfile.objects.filter(committed_shares__gt=0).select_related('user'):
-                    payment = MonthlySharePayment.objects.filter(
-                        user=profile.user,
-                        payment_month=deadline.month
-                    ).first()
-                    missing_shares = profile.committed_shares - (payment.shares_paid if payment else 0)
-                    if missing_shares <= 0:
-                        continue
-
-                    days_late = max(1, (today - deadline_date).days)
-                    penalty_amount = calculate_penalty(days_late, missing_shares)
-
-                    # Check existing penalty
-                    existing_penalty = Penalty.objects.filter(
-                        user=profile.user,
-                        penalty_type='LATE_DEPOSIT',
-                        original_due_date=deadline_date,
-                        is_paid=False
-                    ).first()
-
-                    if existing_penalty:
-                        if existing_penalty.amount != penalty_amount:
-                            existing_penalty.amount = penalty_amount.quantize(Decimal('0.01'))
-                            existing_penalty.days_late = days_late
-                            existing_penalty.save()
-                            Transaction.objects.filter(reference_id=f'FINE-{existing_penalty.id}').update(
-                                amount=penalty_amount,
-                                description=f'Fine for late payment: {missing_shares} shares, {days_late} days late'
-                            )
-                            penalties_updated += 1
-                    else:
-                        penalty = Penalty.objects.create(
-                            user=profile.user,
-                            penalty_type='LATE_DEPOSIT',
-                            amount=penalty_amount.quantize(Decimal('0.01')),
-                            days_late=days_late,
-                            original_due_date=deadline_date,
-                            description=f'Late payment for {missing_shares} shares'
-                        )
-                        Transaction.objects.create(
-                            user=profile.user,
-                            transaction_type='PENALTY',
-                            amount=penalty_amount,
-                            status='PENDING',
-                            reference_id=f'FINE-{penalty.id}',
-                            description=f'Fine for late payment: {missing_shares} shares, {days_late} days late'
-                        )
-                        penalties_created += 1
-
-            # ----- Loan Penalties -----
-            loans = Loan.objects.filter(status__in=['APPROVED', 'ACTIVE', 'DISBURSED'])
-            for loan in loans:
-                if today <= loan.due_date.date() or loan.remaining_balance <= 0:
-                    continue
-
-                days_late = max(1, (today - loan.due_date.date()).days)
-                penalty_amount = calculate_penalty(days_late)
-
-                existing_penalty = Penalty.objects.filter(
-                    user=loan.user,
-                    penalty_type='LATE_LOAN_REPAYMENT',
-                    original_due_date=loan.due_date,
-                    is_paid=False
-                ).first()
-
-                if existing_penalty:
-                    if existing_penalty.amount != penalty_amount:
-                        existing_penalty.amount = penalty_amount.quantize(Decimal('0.01'))
-                        existing_penalty.days_late = days_late
-                        existing_penalty.save()
-                        Transaction.objects.filter(reference_id=f'FINE-{existing_penalty.id}').update(
-                            amount=penalty_amount,
-                            description=f'Fine for late loan repayment: {days_late} days late'
-                        )
-                        penalties_updated += 1
-                else:
-                    penalty = Penalty.objects.create(
-                        user=loan.user,
-                        penalty_type='LATE_LOAN_REPAYMENT',
-                        amount=penalty_amount.quantize(Decimal('0.01')),
-                        days_late=days_late,
-                        original_due_date=loan.due_date,
-                        description=f'Late loan repayment - Loan #{loan.id}, {days_late} days late'
-                    )
-                    Transaction.objects.create(
-                        user=loan.user,
-                        transaction_type='PENALTY',
-                        amount=penalty_amount,
-                        status='PENDING',
-                        reference_id=f'FINE-{penalty.id}',
-                        description=f'Fine for late loan repayment: {days_late} days late'
-                    )
-                    penalties_created += 1
+        results = run_partitions(
+            calculate_group_penalties, SavingsGroup.objects.order_by('id'), today, kwargs['full_scan'],
+            workers=kwargs['workers'],
+        )
+        write_partition_report(self, results)
 
+        penalties_created = sum(result['summary'].get('created', 0) for result in results)
+        penalties_accrued = sum(result['summary'].get('accrued', 0) for result in results)
         self.stdout.write(self.style.SUCCESS(
-            f'Created {penalties_created} new penalties, updated {penalties_updated} existing penalties for {today}'
+            f'Created {penalties_created} new penalties, accrued {penalties_accrued} open penalties for {today}'
         ))
@@ -1,94 +1,84 @@
 #gwizacash/management/commands/distribute_profits.py
 
+from django.core.exceptions import ValidationError
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from decimal import Decimal
-from django.db.models import Sum
-from gwizacash.models import (
-    UserProfile, CollectiveFund, ProfitDistribution, 
-    ProfitDistributionSummary, Transaction
-)
-from django.db import transaction
-from datetime import date
+from gwizacash.distribution import CHUNK_SIZE, finish_run, resumable_runs, start_run
+from gwizacash.models import SavingsGroup
+from gwizacash.partitions import run_partitions, write_partition_report
+from gwizacash.profit_simulator import DISTRIBUTION_MODES
 
-class Command(BaseCommand):
-    help = 'Distribute monthly profits from interest and penalties to all members with shares'
 
-    def handle(self, *args, **kwargs):
-        today = timezone.now().date()
-        
-        # Check if already distributed this month
-        if ProfitDistribution.objects.filter(
-            distribution_date__month=today.month, 
-            distribution_date__year=today.year
-        ).exists():
-            self.stdout.write(self.style.WARNING(f"Profits already distributed for {today.strftime('%Y-%m')}"))
-            return
+def _run_summary(run):
+    unit = 'share-month' if run.basis == 'share_months' else 'share'
+    return {
+        'month': f'{run.month:%Y-%m}',
+        'distributed': f'{run.total_distributed:,.0f} RWF',
+        'per_share': f'{run.per_share_amount:.2f} RWF/{unit}',
+        'members': run.members_done,
+    }
 
-        # Get current available profit from CollectiveFund
-        fund = CollectiveFund.get_fund()
-        fund.update_totals()
-        
-        if fund.available_profit <= 0:
-            self.stdout.write(self.style.WARNING("No profits available for distribution"))
-            return
 
-        # Get all members with committed shares (regardless of payment status)
-        members_with_shares = UserProfile.objects.filter(committed_shares__gt=0)
+def distribute_group_profits(group_id, today, mode='committed', chunk_size=CHUNK_SIZE):
+    """Start (or pick up) the group's run for this month and pay it out chunk by chunk"""
+    try:
+        run = start_run(group_id, today, mode, chunk_size=chunk_size)
+    except ValidationError as e:
+        return {'skipped': e.messages[0]}
+    if run.is_finished:
+        return {'skipped': f"already distributed for {today.strftime('%Y-%m')}"}
+    return _run_summary(finish_run(run))
 
-        if not members_with_shares.exists():
-            self.stdout.write(self.style.WARNING("No members with shares found"))
-            return
 
-        try:
-            with transaction.atomic():
-                total_shares = sum(member.committed_shares for member in members_with_shares)
-                per_share_amount = fund.available_profit / total_shares
-                
-                distribution_time = timezone.now()
-                total_distributed = Decimal('0')
+def resume_group_runs(group_id):
+    """Finish every run of the group that stopped part-way, oldest first, short of ones left to a coordinator"""
+    runs = list(resumable_runs(group_id))
+    if not runs:
+        return {'skipped': 'nothing to resume'}
+    for run in runs:
+        summary = _run_summary(finish_run(run))
+    return {**summary, 'resumed': len(runs)}
 
-                # Distribute to all members with shares
-                for profile in members_with_shares:
-                    user_profit = per_share_amount * profile.committed_shares
-                    
-                    ProfitDistribution.objects.create(
-                        user=profile.user,
-                        distribution_date=distribution_time,
-                        total_amount=user_profit,
-                        per_share_amount=per_share_amount,
-                        source='LOAN_INTEREST_AND_PENALTIES',
-                        shares_distributed=profile.committed_shares
-                    )
-                    
-                    Transaction.objects.create(
-                        user=profile.user,
-                        transaction_type='PROFIT_DISTRIBUTION',
-                        amount=user_profit,
-                        description=f'Monthly profit for {profile.committed_shares} shares @ {per_share_amount:.2f} RWF/share',
-                        date=distribution_time,
-                        status='COMPLETED'
-                    )
-                    
-                    # Add to member's savings
-                    profile.total_savings += user_profit
-                    profile.save()
-                    
-                    total_distributed += user_profit
 
-                # Create summary record
-                ProfitDistributionSummary.objects.create(
-                    total_distributed=total_distributed,
-                    source='LOAN_INTEREST_AND_PENALTIES'
-                )
+class Command(BaseCommand):
+    help = 'Distribute monthly profits from interest and penalties to the members with shares in each savings group'
 
-                # Update fund totals
-                fund.update_totals()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of groups to process concurrently',
+        )
+        parser.add_argument(
+            '--mode',
+            choices=sorted(DISTRIBUTION_MODES),
+            default='committed',
+            help='Weigh members by committed shares or by share-months held (time-weighted)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Members paid per transaction',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Only finish distribution runs that stopped part-way; start no new ones, and skip runs '
+                 'that failed too often to retry unattended',
+        )
 
-                self.stdout.write(self.style.SUCCESS(
-                    f'Distributed {total_distributed:,.0f} RWF at {per_share_amount:.2f} RWF/share '
-                    f'to {members_with_shares.count()} members on {today.strftime("%B %Y")}'
-                ))
+    def handle(self, *args, **kwargs):
+        today = timezone.now().date()
 
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error distributing profits: {str(e)}'))
+        # Each savings group has its own fund, members and distribution history
+        if kwargs['resume']:
+            groups = SavingsGroup.objects.filter(pk__in=resumable_runs().values('group_id')).order_by('id')
+            results = run_partitions(resume_group_runs, groups, workers=kwargs['workers'])
+        else:
+            results = run_partitions(
+                distribute_group_profits, SavingsGroup.objects.order_by('id'), today, kwargs['mode'],
+                kwargs['chunk_size'], workers=kwargs['workers'],
+            )
+        write_partition_report(self, results)
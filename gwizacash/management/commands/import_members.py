@@ -0,0 +1,71 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from gwizacash.models import UserProfile
+from gwizacash.onboarding import MEMBER_CSV_COLUMNS, PASSWORD_HASH_WORKERS, import_members, parse_member_csv
+
+
+class Command(BaseCommand):
+    help = 'Create members in bulk from a CSV file with columns: ' + ', '.join(MEMBER_CSV_COLUMNS)
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='CSV file to import')
+        parser.add_argument(
+            '--coordinator',
+            required=True,
+            help='Username of the coordinator who will manage the imported members',
+        )
+        parser.add_argument(
+            '--credentials-out',
+            help='Write the generated usernames and passwords to this CSV file instead of stdout',
+        )
+        parser.add_argument(
+            '--hash-workers',
+            type=int,
+            default=PASSWORD_HASH_WORKERS,
+            help='Threads used to hash the generated passwords',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without creating anyone',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            coordinator = UserProfile.objects.select_related('group').get(
+                user__username=options['coordinator'], user_type='COORDINATOR'
+            )
+        except UserProfile.DoesNotExist:
+            raise CommandError(f"No coordinator with username '{options['coordinator']}'")
+
+        try:
+            with open(options['csv_path'], encoding='utf-8-sig', newline='') as csv_file:
+                rows, errors = parse_member_csv(csv_file)
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f'Could not read {options["csv_path"]}: {e}')
+
+        if errors:
+            for error in errors:
+                self.stderr.write(self.style.ERROR(error))
+            raise CommandError(f'{len(errors)} problem(s) found; nothing was imported')
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{len(rows)} members are valid and ready to import'))
+            return
+
+        # A command exits right after returning, so don't leave emails to a daemon thread
+        created = import_members(coordinator, rows, hash_workers=options['hash_workers'], email_in_background=False)
+
+        if options['credentials_out']:
+            with open(options['credentials_out'], 'w', newline='') as out:
+                self.write_credentials(out, created)
+        else:
+            self.write_credentials(self.stdout, created)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {len(created)} members into {coordinator.group} under {coordinator.user.username}'
+        ))
+
+    def write_credentials(self, out, created):
+        writer = csv.DictWriter(out, fieldnames=list(created[0]), lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(created)
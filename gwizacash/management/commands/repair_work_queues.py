@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from gwizacash.models import SavingsGroup
+from gwizacash.partitions import run_partitions, write_partition_report
+from gwizacash.work_queues import repair_counts
+import logging
+
+logger = logging.getLogger(__name__)
+
+def repair_group_queues(group_id):
+    """Recount one group's coordinator queues, reporting any counter that had drifted"""
+    drifted = repair_counts(group_id)
+    for queue, count in drifted.items():
+        logger.warning(f"Work queue {queue} of group {group_id} had drifted; recounted as {count}")
+    return {'drifted': ', '.join(drifted) or 'none'}
+
+
+class Command(BaseCommand):
+    help = 'Recount the coordinator work queue counters of every savings group'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of groups to process concurrently',
+        )
+
+    def handle(self, *args, **kwargs):
+        results = run_partitions(repair_group_queues, SavingsGroup.objects.order_by('id'), workers=kwargs['workers'])
+        write_partition_report(self, results)
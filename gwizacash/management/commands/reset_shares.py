@@ -1,22 +1,44 @@
 from django.core.management.base import BaseCommand
-from gwizacash.models import UserProfile
+from gwizacash.models import SavingsGroup, UserProfile, retry_on_conflict
+from gwizacash.partitions import run_partitions, write_partition_report
 from django.db import transaction
 import logging
 
 logger = logging.getLogger(__name__)
 
+def reset_group_shares(group_id):
+    """Reset one group's monthly share payments in a single short transaction, retried on concurrent changes"""
+    return retry_on_conflict(_reset_group_shares, group_id)
+
+
+def _reset_group_shares(group_id):
+    with transaction.atomic():
+        profiles = UserProfile.objects.filter(group_id=group_id, committed_shares__gt=0).select_related('user')
+        reset_count = 0
+        for profile in profiles:
+            profile.paid_shares = 0
+            profile.remaining_share_balance = profile.committed_shares * profile.share_value
+            profile.save()
+            reset_count += 1
+            logger.info(f"Reset {profile.user.username}: Paid={profile.paid_shares}, Remaining={profile.remaining_share_balance}")
+    logger.info(f"Reset {reset_count} users in group {group_id}")
+    return {'reset': reset_count}
+
+
 class Command(BaseCommand):
-    help = 'Reset monthly shares for all users'
+    help = 'Reset monthly shares for all users, one savings group per partition'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of groups to process concurrently',
+        )
 
     def handle(self, *args, **kwargs):
-        try:
-            with transaction.atomic():
-                profiles = UserProfile.objects.filter(committed_shares__gt=0)
-                for profile in profiles:
-                    profile.paid_shares = 0
-                    profile.remaining_share_balance = profile.committed_shares * profile.share_value
-                    profile.save()
-                    logger.info(f"Reset {profile.user.username}: Paid={profile.paid_shares}, Remaining={profile.remaining_share_balance}")
-                logger.info(f"Reset {profiles.count()} users")
-        except Exception as e:
-            logger.error(f"Reset error: {str(e)}")
\ No newline at end of file
+        results = run_partitions(reset_group_shares, SavingsGroup.objects.order_by('id'), workers=kwargs['workers'])
+        for result in results:
+            if not result['ok']:
+                logger.error(f"Reset error in {result['group']}: {result['error']}")
+        write_partition_report(self, results)
@@ -0,0 +1,116 @@
+"""Member lookup: search for coordinators and username allocation.
+
+On PostgreSQL, substring matches on name, username, email and phone are served
+by the pg_trgm GIN indexes from migration 0024 and ranked by trigram word
+similarity. Other backends (SQLite in development) search an in-memory prefix
+index of each coordinator's members, cached per group version so any member
+edit rebuilds it on the next search.
+"""
+import re
+from bisect import bisect_left
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from .cache_versions import group_version
+from .models import UserProfile
+
+MEMBER_SEARCH_LIMIT = 20
+SEARCH_FIELDS = ('user__first_name', 'user__last_name', 'user__username', 'user__email', 'phone')
+
+
+def managed_profiles(coordinator):
+    """The coordinator's own profile and the members they manage"""
+    return UserProfile.objects.filter(Q(coordinator=coordinator) | Q(pk=coordinator.pk))
+
+
+def _search_words(text):
+    return [word for word in re.split(r'[\s_@.+-]+', text.lower()) if word]
+
+
+def _prefix_index(coordinator):
+    """Sorted (token, profile id) pairs for every word of the coordinator's members' details"""
+    key = f'gwizacash:member-search:{coordinator.pk}:{group_version(coordinator.group_id)}'
+    index = cache.get(key)
+    if index is None:
+        entries = set()
+        for row in managed_profiles(coordinator).values_list('pk', *SEARCH_FIELDS):
+            profile_id, values = row[0], row[1:]
+            for value in values:
+                for word in _search_words(value or ''):
+                    entries.add((word, profile_id))
+            phone = re.sub(r'\D', '', row[-1] or '')
+            if phone:
+                entries.add((phone, profile_id))
+                # Members are often looked up by the last digits of their number
+                entries.update((phone[i:], profile_id) for i in range(1, len(phone) - 3))
+        index = sorted(entries)
+        cache.set(key, index, timeout=60 * 60)
+    return index
+
+
+def _prefix_matches(index, word):
+    matches = set()
+    position = bisect_left(index, (word,))
+    while position < len(index) and index[position][0].startswith(word):
+        matches.add(index[position][1])
+        position += 1
+    return matches
+
+
+def search_members(coordinator, query):
+    """Profiles managed by the coordinator matching every word of query, best matches first"""
+    profiles = managed_profiles(coordinator)
+    words = _search_words(query)
+    if not words:
+        return profiles.none()
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        for word in words:
+            matches_word = Q()
+            for field in SEARCH_FIELDS:
+                matches_word |= Q(**{f'{field}__icontains': word})
+            profiles = profiles.filter(matches_word)
+        return profiles.annotate(
+            rank=Greatest(*(TrigramWordSimilarity(query, field) for field in SEARCH_FIELDS))
+        ).order_by('-rank', 'user__first_name', 'user__last_name')
+
+    index = _prefix_index(coordinator)
+    matched = None
+    for word in words:
+        ids = _prefix_matches(index, word)
+        matched = ids if matched is None else matched & ids
+        if not matched:
+            return profiles.none()
+    return profiles.filter(pk__in=matched).order_by('user__first_name', 'user__last_name')
+
+
+def allocate_username(base):
+    """base, or base_N with the smallest free N, using one query for all collisions"""
+    return allocate_usernames([base])[0]
+
+
+def allocate_usernames(bases, chunk_size=100):
+    """A distinct free username for every base, fetching the collisions of each chunk of bases in one query"""
+    taken = set()
+    unique_bases = list(dict.fromkeys(bases))
+    for start in range(0, len(unique_bases), chunk_size):
+        collides = Q()
+        for base in unique_bases[start:start + chunk_size]:
+            collides |= Q(username__startswith=base)
+        taken.update(User.objects.filter(collides).values_list('username', flat=True))
+
+    usernames = []
+    for base in bases:
+        username, suffix = base, 0
+        while username in taken:
+            suffix += 1
+            username = f'{base}_{suffix}'
+        taken.add(username)
+        usernames.append(username)
+    return usernames
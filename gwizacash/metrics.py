@@ -0,0 +1,45 @@
+"""Operational metrics for staff, served as JSON."""
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+
+def connection_pool_stats():
+    """Connection settings per database alias, plus live pool counters where pooling is enabled"""
+    stats = {}
+    for alias in connections:
+        connection = connections[alias]
+        settings_dict = connection.settings_dict
+        entry = {
+            'vendor': connection.vendor,
+            'pooled': bool(settings_dict.get('OPTIONS', {}).get('pool')),
+            'conn_max_age': settings_dict.get('CONN_MAX_AGE'),
+            'health_checks': settings_dict.get('CONN_HEALTH_CHECKS'),
+        }
+        pool = getattr(connection, 'pool', None) if entry['pooled'] else None
+        if pool is not None:
+            pool_stats = pool.get_stats()
+            entry.update({
+                'size': pool_stats.get('pool_size', 0),
+                'available': pool_stats.get('pool_available', 0),
+                'min_size': pool_stats.get('pool_min', 0),
+                'max_size': pool_stats.get('pool_max', 0),
+                'checkouts': pool_stats.get('requests_num', 0),
+                'waits': pool_stats.get('requests_queued', 0),
+                'waiting_now': pool_stats.get('requests_waiting', 0),
+                'wait_ms': pool_stats.get('requests_wait_ms', 0),
+                'timeouts': pool_stats.get('requests_errors', 0),
+                'connections_opened': pool_stats.get('connections_num', 0),
+                'connection_errors': pool_stats.get('connections_errors', 0),
+            })
+        stats[alias] = entry
+    return stats
+
+
+@require_safe
+@never_cache
+@staff_member_required
+def db_pool_metrics(request):
+    return JsonResponse({'databases': connection_pool_stats()})
@@ -0,0 +1,71 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:39
+
+import django.db.models.deletion
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def amortization_schedule(start, total_amount, duration):
+    # Frozen copy of gwizacash.models.amortization_schedule as of this migration
+    total_amount = Decimal(total_amount)
+    duration = max(int(duration), 1)
+    monthly = (total_amount / duration).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+    schedule = []
+    for number in range(1, duration + 1):
+        amount = monthly if number < duration else total_amount - monthly * (duration - 1)
+        schedule.append((number, start + timedelta(days=number * 30), amount))
+    return schedule
+
+
+def backfill_installments(apps, schema_editor):
+    Loan = apps.get_model('gwizacash', 'Loan')
+    LoanInstallment = apps.get_model('gwizacash', 'LoanInstallment')
+    now = timezone.now()
+    installments = []
+    loans = Loan.objects.filter(status__in=['DISBURSED', 'ACTIVE'], disbursement_date__isnull=False)
+    for loan in loans.iterator():
+        already_paid = max(loan.total_amount - loan.remaining_balance, Decimal('0'))
+        for number, due_date, amount in amortization_schedule(loan.disbursement_date, loan.total_amount, loan.duration):
+            paid = min(already_paid, amount)
+            already_paid -= paid
+            installments.append(LoanInstallment(
+                loan_id=loan.id,
+                number=number,
+                due_date=due_date,
+                expected_amount=amount,
+                amount_paid=paid,
+                is_paid=paid >= amount,
+                paid_date=now if paid >= amount else None,
+            ))
+    LoanInstallment.objects.bulk_create(installments, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0018_userprofile_profile_picture'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanInstallment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('due_date', models.DateTimeField()),
+                ('expected_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('is_paid', models.BooleanField(default=False)),
+                ('paid_date', models.DateTimeField(blank=True, null=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installments', to='gwizacash.loan')),
+            ],
+            options={
+                'ordering': ['loan', 'number'],
+                'indexes': [models.Index(fields=['is_paid', 'due_date'], name='installment_unpaid_due_idx')],
+                'unique_together': {('loan', 'number')},
+            },
+        ),
+        migrations.RunPython(backfill_installments, migrations.RunPython.noop),
+    ]
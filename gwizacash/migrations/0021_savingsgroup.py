@@ -0,0 +1,105 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_default_group(apps, schema_editor):
+    """Put every existing member, fund and ledger row into a single default group"""
+    SavingsGroup = apps.get_model('gwizacash', 'SavingsGroup')
+    CollectiveFund = apps.get_model('gwizacash', 'CollectiveFund')
+    UserProfile = apps.get_model('gwizacash', 'UserProfile')
+    if not UserProfile.objects.exists() and not CollectiveFund.objects.exists():
+        return
+
+    group, _ = SavingsGroup.objects.get_or_create(name='Gwiza Cash')
+    fund = CollectiveFund.objects.order_by('id').first()
+    if fund is not None:
+        fund.group = group
+        fund.save(update_fields=['group'])
+
+    for model_name in ('UserProfile', 'Deposit', 'Loan', 'Penalty', 'ProfitDistribution',
+                       'ProfitDistributionSummary', 'MonthlyDeadline'):
+        apps.get_model('gwizacash', model_name).objects.filter(group__isnull=True).update(group=group)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0020_updated_at_version_stamps'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavingsGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='collectivefund',
+            name='group',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fund', to='gwizacash.savingsgroup'),
+        ),
+        migrations.AddField(
+            model_name='deposit',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gwizacash.savingsgroup'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gwizacash.savingsgroup'),
+        ),
+        migrations.AddField(
+            model_name='monthlydeadline',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gwizacash.savingsgroup'),
+        ),
+        migrations.AddField(
+            model_name='penalty',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gwizacash.savingsgroup'),
+        ),
+        migrations.AddField(
+            model_name='profitdistribution',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gwizacash.savingsgroup'),
+        ),
+        migrations.AddField(
+            model_name='profitdistributionsummary',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gwizacash.savingsgroup'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='members', to='gwizacash.savingsgroup'),
+        ),
+        migrations.AddIndex(
+            model_name='deposit',
+            index=models.Index(fields=['group', 'status'], name='deposit_group_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['group', 'status'], name='loan_group_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='penalty',
+            index=models.Index(fields=['group', 'is_paid'], name='penalty_group_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profitdistribution',
+            index=models.Index(fields=['group', 'distribution_date'], name='distribution_group_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['group', 'user_type'], name='profile_group_type_idx'),
+        ),
+        migrations.RunPython(assign_default_group, migrations.RunPython.noop),
+    ]
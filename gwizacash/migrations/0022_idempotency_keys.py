@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0021_savingsgroup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deposit',
+            name='idempotency_key',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='idempotency_key',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='loanpayment',
+            name='idempotency_key',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='penaltypayment',
+            name='idempotency_key',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
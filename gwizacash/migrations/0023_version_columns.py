@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-19 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0022_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
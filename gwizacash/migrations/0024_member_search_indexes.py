@@ -0,0 +1,44 @@
+# Generated by Django 5.1.5 on 2026-10-19 10:05
+
+from django.conf import settings
+from django.db import migrations
+
+# Django compiles icontains to UPPER(col::text) LIKE UPPER(...), so the trigram
+# indexes are built on that expression for the planner to use them
+TRIGRAM_INDEXES = (
+    ('member_first_name_trgm_idx', 'auth_user', 'first_name'),
+    ('member_last_name_trgm_idx', 'auth_user', 'last_name'),
+    ('member_username_trgm_idx', 'auth_user', 'username'),
+    ('member_email_trgm_idx', 'auth_user', 'email'),
+    ('member_phone_trgm_idx', 'gwizacash_userprofile', 'phone'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """PostgreSQL only; other backends search members through an in-memory index"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gwizacash', '0023_version_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
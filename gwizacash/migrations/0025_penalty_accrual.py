@@ -0,0 +1,66 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:05
+
+from datetime import timedelta
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+FIRST_DAY_PENALTY = Decimal('2000')
+DAILY_PENALTY = Decimal('500')
+
+
+def start_open_penalty_accruals(apps, schema_editor):
+    """Give every open late-payment penalty the accrual it was being recomputed with"""
+    Loan = apps.get_model('gwizacash', 'Loan')
+    Penalty = apps.get_model('gwizacash', 'Penalty')
+    # Loan fines were keyed by the loan's due date; only outstanding loans were still being fined
+    outstanding_loan = Loan.objects.filter(
+        user=OuterRef('user'), due_date=OuterRef('original_due_date'), status__in=['DISBURSED', 'ACTIVE']
+    )
+    penalties = Penalty.objects.filter(
+        Q(penalty_type='LATE_DEPOSIT') | Q(Exists(outstanding_loan), penalty_type='LATE_LOAN_REPAYMENT'),
+        is_paid=False,
+        original_due_date__isnull=False,
+        days_late__gte=1,
+    )
+    accruing = []
+    for penalty in penalties.iterator():
+        # The stored amount is (first day + daily rate * later days) * missing shares
+        shares = penalty.amount / (FIRST_DAY_PENALTY + DAILY_PENALTY * (penalty.days_late - 1))
+        penalty.daily_rate = (DAILY_PENALTY * shares).quantize(Decimal('0.01'))
+        penalty.accrues_from = timezone.localtime(penalty.original_due_date).date()
+        penalty.accrued_through = penalty.accrues_from + timedelta(days=penalty.days_late)
+        accruing.append(penalty)
+    Penalty.objects.bulk_update(accruing, ['daily_rate', 'accrues_from', 'accrued_through'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0024_member_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='penalty',
+            name='accrued_through',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='penalty',
+            name='accrues_from',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='penalty',
+            name='daily_rate',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='savingsgroup',
+            name='penalties_processed_through',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(start_open_penalty_accruals, migrations.RunPython.noop),
+    ]
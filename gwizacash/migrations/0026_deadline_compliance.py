@@ -0,0 +1,77 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:07
+
+import calendar
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def deadline_date(month, deadline_day):
+    # Frozen copy of gwizacash.deadlines.deadline_date: the day, clamped to the month's last day
+    last_day = calendar.monthrange(month.year, month.month)[1]
+    return month.replace(day=min(max(deadline_day, 1), last_day))
+
+
+def snapshot_passed_deadlines(apps, schema_editor):
+    """Write the compliance snapshot of every deadline that has already passed"""
+    DeadlineCompliance = apps.get_model('gwizacash', 'DeadlineCompliance')
+    MonthlyDeadline = apps.get_model('gwizacash', 'MonthlyDeadline')
+    MonthlySharePayment = apps.get_model('gwizacash', 'MonthlySharePayment')
+    UserProfile = apps.get_model('gwizacash', 'UserProfile')
+
+    today = timezone.localdate()
+    members = UserProfile.objects.filter(committed_shares__gt=0)
+    for deadline in MonthlyDeadline.objects.order_by('month').iterator():
+        due_date = deadline_date(deadline.month.replace(day=1), deadline.deadline_day)
+        if due_date >= today:
+            continue
+        # Deadlines without a group apply to every group
+        profiles = members if deadline.group_id is None else members.filter(group_id=deadline.group_id)
+        shares_paid = dict(MonthlySharePayment.objects.filter(
+            payment_month=deadline.month
+        ).values_list('user_id', 'shares_paid'))
+        DeadlineCompliance.objects.bulk_create([
+            DeadlineCompliance(
+                deadline=deadline,
+                user_id=profile.user_id,
+                group_id=profile.group_id,
+                due_date=due_date,
+                shares_due=profile.committed_shares,
+                shares_paid=shares_paid.get(profile.user_id, 0),
+                closed=shares_paid.get(profile.user_id, 0) >= profile.committed_shares,
+            )
+            for profile in profiles.iterator()
+        ], batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0025_penalty_accrual'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeadlineCompliance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_date', models.DateField()),
+                ('shares_due', models.PositiveIntegerField()),
+                ('shares_paid', models.PositiveIntegerField(default=0)),
+                ('closed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deadline', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compliance', to='gwizacash.monthlydeadline')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='gwizacash.savingsgroup')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deadline_compliance', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['group', 'closed'], name='compliance_group_closed_idx'), models.Index(fields=['user', 'closed'], name='compliance_user_closed_idx')],
+                'unique_together': {('deadline', 'user')},
+            },
+        ),
+        migrations.RunPython(snapshot_passed_deadlines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:15
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def accumulate_share_months(apps, schema_editor):
+    """Seed each member's share-months from their approved monthly payments"""
+    MonthlySharePayment = apps.get_model('gwizacash', 'MonthlySharePayment')
+    UserProfile = apps.get_model('gwizacash', 'UserProfile')
+
+    payments = defaultdict(list)
+    for user_id, payment_month, shares_paid in MonthlySharePayment.objects.values_list(
+        'user_id', 'payment_month', 'shares_paid'
+    ).iterator():
+        payments[user_id].append((payment_month.replace(day=1), shares_paid))
+
+    profiles = []
+    for profile in UserProfile.objects.filter(user_id__in=payments).iterator():
+        through = max(month for month, _ in payments[profile.user_id])
+        profile.held_shares = sum(shares for _, shares in payments[profile.user_id])
+        profile.share_months = sum(
+            shares * ((through.year - month.year) * 12 + through.month - month.month + 1)
+            for month, shares in payments[profile.user_id]
+        )
+        profile.share_months_through = through
+        profiles.append(profile)
+    UserProfile.objects.bulk_update(profiles, ['held_shares', 'share_months', 'share_months_through'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0026_deadline_compliance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profitdistribution',
+            name='basis',
+            field=models.CharField(default='committed', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='held_shares',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='share_months',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='share_months_through',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(accumulate_share_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:19
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0027_share_months'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DistributionRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('basis', models.CharField(default='committed', max_length=20)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('profit', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('total_weight', models.PositiveBigIntegerField()),
+                ('chunk_size', models.PositiveIntegerField(default=500)),
+                ('last_user_id', models.PositiveIntegerField()),
+                ('cursor', models.PositiveIntegerField(default=0)),
+                ('members_total', models.PositiveIntegerField()),
+                ('members_done', models.PositiveIntegerField(default=0)),
+                ('total_distributed', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='distribution_runs', to='gwizacash.savingsgroup')),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-month'],
+                'unique_together': {('group', 'month')},
+            },
+        ),
+        migrations.AddField(
+            model_name='profitdistribution',
+            name='run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='distributions', to='gwizacash.distributionrun'),
+        ),
+    ]
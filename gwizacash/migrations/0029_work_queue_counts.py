@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0028_distribution_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkQueueCounts',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='work_queue_counts', serialize=False, to='gwizacash.savingsgroup')),
+                ('pending_deposits', models.PositiveIntegerField(default=0)),
+                ('requested_loans', models.PositiveIntegerField(default=0)),
+                ('approved_loans', models.PositiveIntegerField(default=0)),
+                ('pending_loan_payments', models.PositiveIntegerField(default=0)),
+                ('pending_penalty_payments', models.PositiveIntegerField(default=0)),
+                ('repaired_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'work queue counts',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0029_work_queue_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loaninstallment',
+            name='scheduled_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def snapshot_unfinished_runs(apps, schema_editor):
+    # Runs already under way keep paying the members they had left, at their weights as of now
+    DistributionRun = apps.get_model('gwizacash', 'DistributionRun')
+    DistributionRunMember = apps.get_model('gwizacash', 'DistributionRunMember')
+    UserProfile = apps.get_model('gwizacash', 'UserProfile')
+    for run in DistributionRun.objects.exclude(status='COMPLETED'):
+        profiles = UserProfile.objects.filter(
+            group_id=run.group_id, committed_shares__gt=0, user_id__gt=run.cursor, user_id__lte=run.last_user_id
+        )
+        members = []
+        for profile in profiles:
+            if run.basis != 'share_months':
+                weight = profile.committed_shares
+            elif profile.share_months_through is None:
+                weight = 0
+            else:
+                months = (run.month.year - profile.share_months_through.year) * 12 \
+                    + run.month.month - profile.share_months_through.month
+                weight = profile.share_months + profile.held_shares * max(months, 0)
+            members.append(DistributionRunMember(run_id=run.pk, user_id=profile.user_id, weight=weight))
+        DistributionRunMember.objects.bulk_create(members, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0031_cache_versions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DistributionRunMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.PositiveBigIntegerField()),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='gwizacash.distributionrun')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['run', 'user'],
+                'unique_together': {('run', 'user')},
+            },
+        ),
+        migrations.RunPython(snapshot_unfinished_runs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='distributionrun',
+            name='last_user_id',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gwizacash', '0032_distribution_run_members'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='distributionrun',
+            name='failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,12 +1,80 @@
 from datetime import timedelta
-from django.db import models
+from django.db import DatabaseError, models, transaction
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
-from decimal import Decimal
+from django.utils.functional import cached_property
+from decimal import ROUND_DOWN, Decimal
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import CheckConstraint, Q
+from django.db.models import (
+    Case, CheckConstraint, Exists, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce, Greatest
+
+
+# Optimistic concurrency for rows holding balances
+class StaleObjectError(DatabaseError):
+    """The row was changed by another request since it was read"""
+
+
+class OptimisticLockModel(models.Model):
+    """Saves are conditional UPDATE ... WHERE version = <version read>, bumping the version on success"""
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields'):
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'version'}
+        super().save(*args, **kwargs)
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = self.version
+        values = [
+            (field, model, expected + 1 if field.attname == 'version' else value)
+            for field, model, value in values
+        ]
+        updated = super()._do_update(
+            base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update
+        )
+        if updated:
+            self.version = expected + 1
+        elif base_qs.filter(pk=pk_val).exists():
+            raise StaleObjectError(f'{self._meta.object_name} {pk_val} was modified concurrently')
+        return updated
+
+
+def retry_on_conflict(func, *args, attempts=3, **kwargs):
+    """Run func in its own transaction, re-running it from fresh reads if a versioned save loses a race"""
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except StaleObjectError:
+            if attempt == attempts - 1:
+                raise
+
+
+# Savings group model
+class SavingsGroup(models.Model):
+    """A savings group hosted on this deployment; members, funds, deadlines and distributions belong to one group"""
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Watermark of calculate_penalties: deadlines and installments due before this date have been processed
+    penalties_processed_through = models.DateField(null=True, blank=True)
+
+    @classmethod
+    def get_default(cls):
+        group = cls.objects.order_by('id').first()
+        if group is None:
+            group = cls.objects.create(name='Gwiza Cash')
+        return group
+
+    def __str__(self):
+        return self.name
+
 
 # User profile model
 USER_TYPES = (
@@ -14,9 +82,41 @@ USER_TYPES = (
     ('MEMBER', 'Member'),
 )
 
-class UserProfile(models.Model):
+class UserProfileQuerySet(models.QuerySet):
+    @staticmethod
+    def _user_total(queryset, field, output_field):
+        """Correlated per-user SUM, so several totals can be annotated without multiplying joined rows"""
+        totals = queryset.filter(user=OuterRef('user')).order_by().values('user').annotate(total=Sum(field))
+        return Coalesce(Subquery(totals.values('total')[:1]), Value(0), output_field=output_field)
+
+    def with_ledger(self, month_start=None):
+        """Annotate outstanding loan balance, unpaid penalties, last approved deposit and this month's paid shares"""
+        if month_start is None:
+            month_start = timezone.localdate().replace(day=1)
+        money = models.DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            outstanding_loan=self._user_total(
+                Loan.objects.filter(status__in=['DISBURSED', 'ACTIVE']), 'remaining_balance', money
+            ),
+            unpaid_penalties=self._user_total(Penalty.objects.filter(is_paid=False), 'amount', money),
+            last_deposit_date=Subquery(
+                Deposit.objects.filter(user=OuterRef('user'), status='APPROVED').order_by('-date').values('date')[:1]
+            ),
+            month_shares_paid=Coalesce(
+                Subquery(
+                    MonthlySharePayment.objects.filter(
+                        user=OuterRef('user'), payment_month=month_start
+                    ).values('shares_paid')[:1]
+                ),
+                Value(0),
+            ),
+        )
+
+
+class UserProfile(OptimisticLockModel):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     user_type = models.CharField(max_length=20, choices=USER_TYPES)
+    group = models.ForeignKey(SavingsGroup, on_delete=models.SET_NULL, null=True, blank=True, related_name='members')
     coordinator = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True)
     phone = models.CharField(max_length=15, blank=True, null=True)
     first_login = models.BooleanField(default=True)
@@ -32,17 +132,135 @@ class UserProfile(models.Model):
     # Financial fields
     total_savings = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'), validators=[MinValueValidator(0)])  # FIXED: Added validator
 
+    # Time-weighted share accounting, kept up to date on each approved deposit: share_months counts every
+    # paid share once for each month it was held up to share_months_through; held_shares never resets
+    held_shares = models.PositiveIntegerField(default=0)
+    share_months = models.PositiveBigIntegerField(default=0)
+    share_months_through = models.DateField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = UserProfileQuerySet.as_manager()
+
     class Meta:
         constraints = [
             CheckConstraint(check=Q(total_savings__gte=0), name='total_savings_non_negative'),
             CheckConstraint(check=Q(remaining_share_balance__gte=0), name='remaining_share_balance_non_negative'),
         ]
+        indexes = [
+            models.Index(fields=['group', 'user_type'], name='profile_group_type_idx'),
+        ]
 
-    def save(self, *args, **kwargs):
+    # Inputs of the stored share totals; the totals are only recomputed when one of these changes
+    SHARE_INPUT_FIELDS = ('committed_shares', 'paid_shares', 'share_value')
+    SHARE_TOTAL_FIELDS = ('total_commitment', 'remaining_share_balance')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_loaded_values()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._snapshot_loaded_values()
+
+    def _field_state(self, field):
+        return field.get_prep_value(getattr(self, field.attname))
+
+    def _snapshot_loaded_values(self):
+        """Remember the column values as last read from / written to the database"""
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: self._field_state(field)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred
+        }
+
+    def get_dirty_fields(self):
+        """Names of the fields changed since the row was loaded, or None for unsaved profiles"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None or self._state.adding:
+            return None
+        dirty = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if field.attname not in loaded or self._field_state(field) != loaded[field.attname]:
+                dirty.append(field.name)
+        return dirty
+
+    @property
+    def remaining_shares(self):
+        return max(self.committed_shares - self.paid_shares, 0)
+
+    @property
+    def paid_share_value(self):
+        return Decimal(self.paid_shares) * self.share_value
+
+    def recalculate_share_totals(self):
         # FIXED: Ensure consistent calculations
         self.total_commitment = Decimal(self.committed_shares) * self.share_value
-        self.remaining_share_balance = self.total_commitment - (Decimal(self.paid_shares) * self.share_value)
+        self.remaining_share_balance = self.total_commitment - self.paid_share_value
+
+    def save(self, *args, **kwargs):
+        dirty = self.get_dirty_fields()
+        update_fields = kwargs.get('update_fields')
+
+        if dirty is None or kwargs.get('force_insert'):
+            # New profile: write every column
+            self.recalculate_share_totals()
+        elif update_fields is not None:
+            update_fields = set(update_fields)
+            if update_fields.intersection(self.SHARE_INPUT_FIELDS):
+                self.recalculate_share_totals()
+                update_fields.update(self.SHARE_TOTAL_FIELDS)
+            if update_fields:
+                update_fields.add('updated_at')
+            kwargs['update_fields'] = update_fields
+        else:
+            # Only touch the columns that actually changed, and skip the write entirely if none did
+            if set(dirty).intersection(self.SHARE_INPUT_FIELDS):
+                self.recalculate_share_totals()
+                dirty = self.get_dirty_fields()
+            if not dirty:
+                return
+            kwargs['update_fields'] = set(dirty) | {'updated_at'}
+
         super().save(*args, **kwargs)
+        self._snapshot_loaded_values()
+
+    def version_stamp(self):
+        """Latest modification time across the member's profile, loans, penalties and transactions"""
+        def latest(model):
+            return Subquery(
+                model.objects.filter(user_id=OuterRef('user_id')).order_by('-updated_at').values('updated_at')[:1]
+            )
+
+        stamps = UserProfile.objects.filter(pk=self.pk).annotate(
+            loans_updated=latest(Loan),
+            penalties_updated=latest(Penalty),
+            transactions_updated=latest(Transaction),
+        ).values_list('updated_at', 'loans_updated', 'penalties_updated', 'transactions_updated').first()
+        return max(stamp for stamp in stamps if stamp is not None)
+
+    def add_held_shares(self, shares, month):
+        """Count newly paid shares as held from month onwards; the caller saves the profile"""
+        month = month.replace(day=1)
+        through = self.share_months_through
+        if through is None or month > through:
+            self.share_months = self.share_months_as_of(month) + shares
+            self.share_months_through = month
+        else:
+            # Backdated payment: it has been held every month up to the accumulator's
+            self.share_months += shares * (months_between(month, through) + 1)
+        self.held_shares += shares
+
+    def share_months_as_of(self, month):
+        """Share-months held through month, counting that month"""
+        if self.share_months_through is None:
+            return 0
+        return self.share_months + self.held_shares * max(months_between(self.share_months_through, month), 0)
 
     def is_coordinator(self):
         return self.user_type == 'COORDINATOR'
@@ -53,6 +271,16 @@ class UserProfile(models.Model):
         return UserProfile.objects.none()
 
 
+def months_between(start, end):
+    """Whole calendar months from start's month to end's month"""
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def group_id_for_user(user_id):
+    """Savings group of a user, used to stamp the group key on rows created for them"""
+    return UserProfile.objects.filter(user_id=user_id).values_list('group_id', flat=True).first()
+
+
 # Deposit model
 class Deposit(models.Model):
     STATUS_CHOICES = [
@@ -61,6 +289,7 @@ class Deposit(models.Model):
         ('REJECTED', 'Rejected')
     ]
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    group = models.ForeignKey(SavingsGroup, on_delete=models.SET_NULL, null=True, blank=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])  # FIXED: Added validator
     date = models.DateTimeField(auto_now_add=True)
     bank_slip = models.FileField(upload_to='bank_slips/')
@@ -70,8 +299,16 @@ class Deposit(models.Model):
     rejection_reason = models.TextField(blank=True, null=True)  # NEW: Added from views
     rejected_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='rejected_deposits')  # NEW: Added from views
     rejection_date = models.DateTimeField(null=True, blank=True)  # NEW: Added from views
+    idempotency_key = models.UUIDField(null=True, blank=True, unique=True, editable=False)  # Token of the form that created it
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'status'], name='deposit_group_status_idx'),
+        ]
 
     def save(self, *args, **kwargs):
+        if self.group_id is None:
+            self.group_id = group_id_for_user(self.user_id)
         if self.status == 'APPROVED' and not self.approval_date:
             self.approval_date = timezone.now()
         if self.status == 'REJECTED' and not self.rejection_date:
@@ -100,6 +337,12 @@ class Transaction(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     reference_id = models.CharField(max_length=50, blank=True, null=True)
     description = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='transaction_user_updated_idx'),
+        ]
 
 # Monthly share payment tracking
 class MonthlySharePayment(models.Model):
@@ -121,22 +364,93 @@ class MonthlySharePayment(models.Model):
 @receiver(post_save, sender=User)
 def manage_user_profile(sender, instance, created, **kwargs):
     if created:
+        coordinator = UserProfile.objects.filter(user_type='COORDINATOR').first()
         UserProfile.objects.get_or_create(
             user=instance,
             defaults={
                 'user_type': 'MEMBER',
-                'coordinator': UserProfile.objects.filter(user_type='COORDINATOR').first()
+                'coordinator': coordinator,
+                'group': coordinator.group if coordinator and coordinator.group else SavingsGroup.get_default(),
             }
         )
     else:
         if hasattr(instance, 'userprofile'):
             instance.userprofile.save()
 
+class DaysBetween(models.Func):
+    """Whole days elapsed between two datetime expressions (end - start)"""
+    arg_joiner = ' - '
+    template = 'CAST(EXTRACT(DAY FROM (%(expressions)s)) AS INTEGER)'
+    output_field = models.IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        end, start = self.get_source_expressions()
+        return models.Func(
+            start, end, template='TIMESTAMPDIFF(DAY, %(expressions)s)', output_field=models.IntegerField()
+        ).as_sql(compiler, connection, **extra_context)
+
+
+class LoanQuerySet(models.QuerySet):
+    def outstanding(self):
+        return self.filter(status__in=['DISBURSED', 'ACTIVE'])
+
+    def with_overdue_info(self, now=None):
+        """Annotate overdue_since, is_overdue, days_overdue and accrued_penalty in SQL"""
+        now = now or timezone.now()
+        oldest_unpaid_due = LoanInstallment.objects.filter(
+            loan=OuterRef('pk'), is_paid=False, due_date__lt=now
+        ).order_by('due_date').values('due_date')[:1]
+        has_schedule = Exists(LoanInstallment.objects.filter(loan=OuterRef('pk')))
+
+        return self.annotate(
+            overdue_since=Case(
+                When(~Q(status__in=['DISBURSED', 'ACTIVE']), then=Value(None)),
+                When(has_schedule, then=Subquery(oldest_unpaid_due)),
+                # Loans disbursed without a schedule fall back to the single final due date
+                When(due_date__lt=now, then=F('due_date')),
+                default=Value(None),
+                output_field=models.DateTimeField(),
+            ),
+        ).annotate(
+            is_overdue=ExpressionWrapper(Q(overdue_since__isnull=False), output_field=models.BooleanField()),
+            days_overdue=Case(
+                When(overdue_since__isnull=True, then=Value(0)),
+                default=DaysBetween(Value(now, output_field=models.DateTimeField()), F('overdue_since')),
+                output_field=models.IntegerField(),
+            ),
+        ).annotate(
+            accrued_penalty=Case(
+                When(overdue_since__isnull=True, then=Value(Decimal('0.00'))),
+                default=Value(Loan.FIRST_DAY_PENALTY) + Value(Loan.DAILY_PENALTY) * Greatest(F('days_overdue') - 1, Value(0)),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+
+    def overdue(self, now=None):
+        return self.outstanding().with_overdue_info(now).filter(overdue_since__isnull=False)
+
+    def current(self, now=None):
+        return self.outstanding().with_overdue_info(now).filter(overdue_since__isnull=True)
+
+
 # Loan model
-class Loan(models.Model):
+class Loan(OptimisticLockModel):
     STATUS = models.TextChoices('Status', 'REQUESTED APPROVED DISBURSED ACTIVE REPAID REJECTED')
+
+    # Late repayment penalty: 2000 RWF on the first day, 500 RWF for each day after
+    FIRST_DAY_PENALTY = Decimal('2000.00')
+    DAILY_PENALTY = Decimal('500.00')
         
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    group = models.ForeignKey(SavingsGroup, on_delete=models.SET_NULL, null=True, blank=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     interest_rate = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('5.00'))
     interest_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
@@ -154,35 +468,76 @@ class Loan(models.Model):
     
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    idempotency_key = models.UUIDField(null=True, blank=True, unique=True, editable=False)  # Token of the form that created it
+
+    objects = LoanQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'status'], name='loan_group_status_idx'),
+        ]
     
     @property
     def total_interest(self):
         return self.interest_amount
     
+    @cached_property
+    def overdue_since(self):
+        """Due date of the oldest unpaid installment that is already past due, if any"""
+        if self.status not in ['DISBURSED', 'ACTIVE']:
+            return None
+        now = timezone.now()
+        earliest = self.installments.filter(
+            is_paid=False, due_date__lt=now
+        ).order_by('due_date').values_list('due_date', flat=True).first()
+        if earliest is None and self.due_date and now > self.due_date and not self.installments.exists():
+            # Loans disbursed without a schedule fall back to the single final due date
+            earliest = self.due_date
+        return earliest
+
+    # is_overdue / days_overdue / accrued_penalty are read from the LoanQuerySet.with_overdue_info()
+    # annotations when present and only computed per object otherwise
     @property
     def is_overdue(self):
-        if self.due_date and self.status in ['DISBURSED', 'ACTIVE']:
-            return timezone.now() > self.due_date
-        return False
+        if '_is_overdue' in self.__dict__:
+            return self._is_overdue
+        return self.overdue_since is not None
+
+    @is_overdue.setter
+    def is_overdue(self, value):
+        self._is_overdue = value
     
     @property
     def days_overdue(self):
+        if '_days_overdue' in self.__dict__:
+            return self._days_overdue
         if self.is_overdue:
-            return (timezone.now() - self.due_date).days
+            return (timezone.now() - self.overdue_since).days
         return 0
+
+    @days_overdue.setter
+    def days_overdue(self, value):
+        self._days_overdue = value
+
+    @property
+    def next_installment(self):
+        return self.installments.filter(is_paid=False).order_by('due_date').first()
     
     def calculate_penalty(self):
         """Calculate penalty based on days overdue"""
+        if 'accrued_penalty' in self.__dict__:
+            return self.accrued_penalty
         if not self.is_overdue:
             return Decimal('0')
         
         days = self.days_overdue
-        if days == 1:
-            return Decimal('2000.00')  # First day: 2000 RWF
-        else:
-            return Decimal('2000.00') + (Decimal('500.00') * (days - 1))  # Subsequent days: 500 RWF each
+        # First day: 2000 RWF, subsequent days: 500 RWF each
+        return self.FIRST_DAY_PENALTY + self.DAILY_PENALTY * max(days - 1, 0)
     
     def save(self, *args, **kwargs):
+        if self.group_id is None:
+            self.group_id = group_id_for_user(self.user_id)
+
         # Set interest rate based on duration
         if self.duration == 3:
             self.interest_rate = Decimal('5.00')
@@ -214,11 +569,91 @@ class Loan(models.Model):
             
         super().save(*args, **kwargs)
 
+    def create_installments(self):
+        """Build the monthly repayment schedule from the disbursement date"""
+        self.installments.all().delete()
+        installments = [
+            LoanInstallment(loan=self, number=number, due_date=due_date, expected_amount=amount)
+            for number, due_date, amount in amortization_schedule(
+                self.disbursement_date, self.total_amount, self.duration
+            )
+        ]
+        LoanInstallment.objects.bulk_create(installments)
+        self.__dict__.pop('overdue_since', None)
+        return installments
+
+    def apply_installment_payment(self, amount):
+        """Allocate an approved payment to the oldest unpaid installments"""
+        remaining = Decimal(amount)
+        now = timezone.now()
+        updated = []
+        for installment in self.installments.filter(is_paid=False).order_by('number'):
+            if remaining <= 0:
+                break
+            applied = min(remaining, installment.remaining_amount)
+            installment.amount_paid += applied
+            remaining -= applied
+            if installment.remaining_amount <= 0:
+                installment.is_paid = True
+                installment.paid_date = now
+            updated.append(installment)
+        LoanInstallment.objects.bulk_update(updated, ['amount_paid', 'is_paid', 'paid_date'])
+        self.__dict__.pop('overdue_since', None)
+        return updated
+
     def __str__(self):
         return f"Loan {self.id} - {self.user.username} - {self.amount} RWF"
 
+
+def amortization_schedule(start, total_amount, duration):
+    """Split total_amount into `duration` monthly (30-day) installments starting from `start`.
+
+    Returns (number, due_date, amount) tuples; the last installment absorbs the rounding
+    difference so the schedule always adds up to total_amount and ends on the loan due date.
+    """
+    total_amount = Decimal(total_amount)
+    duration = max(int(duration), 1)
+    monthly = (total_amount / duration).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+    schedule = []
+    for number in range(1, duration + 1):
+        amount = monthly if number < duration else total_amount - monthly * (duration - 1)
+        schedule.append((number, start + timedelta(days=number * 30), amount))
+    return schedule
+
+
+class LoanInstallment(models.Model):
+    """One monthly repayment of a disbursed loan"""
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='installments')
+    number = models.PositiveIntegerField()
+    due_date = models.DateTimeField()
+    expected_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    is_paid = models.BooleanField(default=False)
+    paid_date = models.DateTimeField(null=True, blank=True)
+    # Installments that fell due before they were scheduled (backfilled onto older loans) are not fined
+    scheduled_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['loan', 'number']
+        unique_together = ('loan', 'number')
+        indexes = [
+            models.Index(fields=['is_paid', 'due_date'], name='installment_unpaid_due_idx'),
+        ]
+
+    @property
+    def remaining_amount(self):
+        return max(self.expected_amount - self.amount_paid, Decimal('0'))
+
+    @property
+    def is_overdue(self):
+        return not self.is_paid and timezone.now() > self.due_date
+
+    def __str__(self):
+        return f"Loan {self.loan_id} installment {self.number} - {self.expected_amount} RWF"
+
 class CollectiveFund(models.Model):
-    """Tracks the collective savings pool of all members"""
+    """Tracks the collective savings pool of a group's members"""
+    group = models.OneToOneField(SavingsGroup, on_delete=models.CASCADE, null=True, blank=True, related_name='fund')
     total_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
     available_amount = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))  # Total - loans given out
     total_loans_outstanding = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
@@ -231,31 +666,46 @@ class CollectiveFund(models.Model):
     last_updated = models.DateTimeField(auto_now=True)
 
     @classmethod
-    def get_fund(cls):
-        fund, created = cls.objects.get_or_create(id=1)
+    def get_fund(cls, group=None):
+        if group is None:
+            group = SavingsGroup.get_default()
+        fund, created = cls.objects.get_or_create(group=group)
+        return fund
+
+    @classmethod
+    def read_totals(cls, group=None):
+        """The group's fund with totals computed from the rows read, writing nothing.
+
+        For reports that may read from a lagging replica, where saving would put old totals over current ones.
+        """
+        if group is None:
+            group = SavingsGroup.get_default()
+        fund = cls.objects.filter(group=group).first() or cls(group=group)
+        fund.update_totals(save=False)
         return fund
 
-    def update_totals(self):
-        """Recalculate totals from all deposits, penalties, and loans"""
+    def update_totals(self, save=True):
+        """Recalculate totals from the group's deposits, penalties, and loans"""
         from django.db.models import Sum
+        group_id = self.group_id
         
         # 1. Total approved deposits (base group savings)
-        total_deposits = Deposit.objects.filter(status='APPROVED').aggregate(
+        total_deposits = Deposit.objects.filter(group_id=group_id, status='APPROVED').aggregate(
             total=Sum('amount')
         )['total'] or Decimal('0')
         
         # 2. Paid penalties (profit source)
-        paid_penalties = Penalty.objects.filter(is_paid=True).aggregate(
+        paid_penalties = Penalty.objects.filter(group_id=group_id, is_paid=True).aggregate(
             total=Sum('amount')
         )['total'] or Decimal('0')
         
         # 3. Interest earned from loan payments
-        total_loan_payments = LoanPayment.objects.filter(status='APPROVED').aggregate(
+        total_loan_payments = LoanPayment.objects.filter(loan__group_id=group_id, status='APPROVED').aggregate(
             total=Sum('amount')
         )['total'] or Decimal('0')
         
         # Principal amounts that were repaid
-        repaid_loan_principals = Loan.objects.filter(status='REPAID').aggregate(
+        repaid_loan_principals = Loan.objects.filter(group_id=group_id, status='REPAID').aggregate(
             total=Sum('amount')
         )['total'] or Decimal('0')
         
@@ -266,13 +716,14 @@ class CollectiveFund(models.Model):
         
         # 4. Outstanding loan principals (money currently loaned out)
         outstanding_loans = Loan.objects.filter(
+            group_id=group_id,
             status__in=['DISBURSED', 'ACTIVE']
         ).aggregate(
             total=Sum('amount')  # Principal only, not remaining_balance
         )['total'] or Decimal('0')
         
         # 5. Previously distributed profits
-        distributed_profits = ProfitDistribution.objects.aggregate(
+        distributed_profits = ProfitDistribution.objects.filter(group_id=group_id).aggregate(
             total=Sum('total_amount')
         )['total'] or Decimal('0')
         
@@ -286,7 +737,8 @@ class CollectiveFund(models.Model):
         self.total_profit_distributed = distributed_profits
         self.available_profit = self.total_profit_earned - self.total_profit_distributed
         
-        self.save()
+        if save:
+            self.save()
 
     def __str__(self):
         return f"Collective Fund: {self.total_amount} RWF (Available: {self.available_amount} RWF)"
@@ -305,6 +757,7 @@ class LoanPayment(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_payments')  # NEW: Added for tracking
     approval_date = models.DateTimeField(null=True, blank=True)  # NEW: Added for clarity
+    idempotency_key = models.UUIDField(null=True, blank=True, unique=True, editable=False)  # Token of the form that created it
 
     def save(self, *args, **kwargs):
         if self.status == 'APPROVED' and not self.approval_date:
@@ -320,6 +773,7 @@ class Penalty(models.Model):
         ('OTHER', 'Other')
     ]
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    group = models.ForeignKey(SavingsGroup, on_delete=models.SET_NULL, null=True, blank=True)
     penalty_type = models.CharField(max_length=25, choices=PENALTY_TYPES)  # FIXED: Changed from 15 to 25
     amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     date = models.DateTimeField(auto_now_add=True)
@@ -327,6 +781,23 @@ class Penalty(models.Model):
     original_due_date = models.DateTimeField(null=True, blank=True)
     description = models.TextField(blank=True, null=True)
     is_paid = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Daily accrual: amount grows by daily_rate for every day after accrues_from, and reflects
+    # days_late as of accrued_through; a zero rate means the penalty no longer grows
+    accrues_from = models.DateField(null=True, blank=True)
+    daily_rate = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    accrued_through = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='penalty_user_updated_idx'),
+            models.Index(fields=['group', 'is_paid'], name='penalty_group_paid_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.group_id is None:
+            self.group_id = group_id_for_user(self.user_id)
+        super().save(*args, **kwargs)
 
 # penalty payment
 class PenaltyPayment(models.Model):
@@ -345,6 +816,7 @@ class PenaltyPayment(models.Model):
     rejection_reason = models.TextField(blank=True, null=True)
     rejected_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='rejected_penalty_payments')
     rejection_date = models.DateTimeField(null=True, blank=True)
+    idempotency_key = models.UUIDField(null=True, blank=True, unique=True, editable=False)  # Token of the form that created it
 
     def save(self, *args, **kwargs):
         if self.status == 'APPROVED' and not self.approval_date:
@@ -359,21 +831,35 @@ class PenaltyPayment(models.Model):
 # Profit distribution model
 class ProfitDistribution(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='profit_distributions')
+    group = models.ForeignKey(SavingsGroup, on_delete=models.SET_NULL, null=True, blank=True)
     distribution_date = models.DateTimeField()
     total_amount = models.DecimalField(max_digits=12, decimal_places=2)
     per_share_amount = models.DecimalField(max_digits=10, decimal_places=2)
     source = models.CharField(max_length=50)  # e.g., 'LOAN_INTEREST_AND_PENALTIES'
-    shares_distributed = models.PositiveIntegerField()
+    shares_distributed = models.PositiveIntegerField()  # Share-months when basis is 'share_months'
+    basis = models.CharField(max_length=20, default='committed')
+    run = models.ForeignKey(
+        'DistributionRun', on_delete=models.SET_NULL, null=True, blank=True, related_name='distributions'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-distribution_date']
+        indexes = [
+            models.Index(fields=['group', 'distribution_date'], name='distribution_group_date_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.group_id is None:
+            self.group_id = group_id_for_user(self.user_id)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} - {self.total_amount} RWF on {self.distribution_date.date()}"
 
 class ProfitDistributionSummary(models.Model):
+    group = models.ForeignKey(SavingsGroup, on_delete=models.SET_NULL, null=True, blank=True)
     distribution_date = models.DateField(auto_now_add=True)
     total_distributed = models.DecimalField(max_digits=12, decimal_places=2)
     source = models.CharField(max_length=50)
@@ -381,8 +867,109 @@ class ProfitDistributionSummary(models.Model):
     def __str__(self):
         return f"Summary on {self.distribution_date}: {self.total_distributed} RWF"
 
+
+class WorkQueueCounts(models.Model):
+    """Items waiting for a group's coordinators, kept current by the status transitions themselves"""
+    group = models.OneToOneField(SavingsGroup, on_delete=models.CASCADE, primary_key=True, related_name='work_queue_counts')
+    pending_deposits = models.PositiveIntegerField(default=0)
+    requested_loans = models.PositiveIntegerField(default=0)
+    approved_loans = models.PositiveIntegerField(default=0)
+    pending_loan_payments = models.PositiveIntegerField(default=0)
+    pending_penalty_payments = models.PositiveIntegerField(default=0)
+    repaired_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'work queue counts'
+
+    def __str__(self):
+        return f"Work queues of {self.group}"
+
+
+class CacheVersion(models.Model):
+    """A version number that keys cached data, shared by every worker process and the scheduler"""
+    key = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} v{self.version}"
+
+
+class DistributionRun(models.Model):
+    """One month's profit distribution for a group, paid out in chunks of members.
+
+    The profit and every member's weight (DistributionRunMember) are frozen when the run starts.
+    Each chunk pays the next members by user id in its own transaction and advances the cursor in
+    that same transaction, so a run that stops part-way resumes after the last member it paid and
+    never pays anyone twice.
+    """
+    STATUS = models.TextChoices('Status', 'PENDING RUNNING COMPLETED FAILED')
+    # Failures in a row after which the scheduler stops resuming the run and leaves it to a coordinator
+    MAX_AUTO_RETRIES = 3
+
+    group = models.ForeignKey(SavingsGroup, on_delete=models.CASCADE, related_name='distribution_runs')
+    month = models.DateField()
+    basis = models.CharField(max_length=20, default='committed')
+    status = models.CharField(max_length=20, choices=STATUS.choices, default='PENDING')
+    profit = models.DecimalField(max_digits=15, decimal_places=2)
+    total_weight = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField(default=500)
+    # User id of the last member already paid
+    cursor = models.PositiveIntegerField(default=0)
+    members_total = models.PositiveIntegerField()
+    members_done = models.PositiveIntegerField(default=0)
+    total_distributed = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    error = models.TextField(blank=True)
+    failures = models.PositiveIntegerField(default=0)  # Since the last chunk that was paid
+    started_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-month']
+        unique_together = ('group', 'month')
+
+    @property
+    def per_share_amount(self):
+        return self.profit / self.total_weight if self.total_weight else Decimal('0')
+
+    @property
+    def is_finished(self):
+        return self.status == self.STATUS.COMPLETED
+
+    @property
+    def needs_coordinator(self):
+        """Failed too often in a row for the scheduler to keep retrying"""
+        return self.status == self.STATUS.FAILED and self.failures >= self.MAX_AUTO_RETRIES
+
+    @property
+    def percent_done(self):
+        if self.is_finished or not self.members_total:
+            return 100
+        return min(self.members_done * 100 // self.members_total, 99)
+
+    def __str__(self):
+        return f"{self.group} distribution for {self.month:%Y-%m}: {self.status}"
+
+
+class DistributionRunMember(models.Model):
+    """A member's weight in a distribution run, as it stood when the run started"""
+    run = models.ForeignKey(DistributionRun, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    weight = models.PositiveBigIntegerField()
+
+    class Meta:
+        ordering = ['run', 'user']
+        unique_together = ('run', 'user')
+
+    def __str__(self):
+        return f"{self.user} in {self.run}: {self.weight}"
+
 # Monthly deadline model
 class MonthlyDeadline(models.Model):
+    group = models.ForeignKey(SavingsGroup, on_delete=models.SET_NULL, null=True, blank=True)
     month = models.DateField()
     deadline_day = models.PositiveIntegerField(default=10)
     created_at = models.DateTimeField(default=timezone.now)
@@ -392,3 +979,50 @@ class MonthlyDeadline(models.Model):
 
 
 
+class DeadlineComplianceQuerySet(models.QuerySet):
+    def open(self):
+        return self.filter(closed=False)
+
+    def arrears(self):
+        """Members in arrears and the shares they still owe across the open snapshots"""
+        return self.open().aggregate(
+            members=models.Count('user', distinct=True),
+            shares=Coalesce(Sum(F('shares_due') - F('shares_paid')), Value(0)),
+        )
+
+    def record_payment(self, user, payment_month, shares):
+        """Credit a late deposit to the member's open snapshot for that month; returns the snapshots closed"""
+        open_rows = self.open().filter(user=user, deadline__month=payment_month)
+        if not open_rows.update(shares_paid=F('shares_paid') + shares, updated_at=timezone.now()):
+            return 0
+        return open_rows.filter(shares_paid__gte=F('shares_due')).update(closed=True, updated_at=timezone.now())
+
+
+# Per-deadline compliance snapshot: written once when the deadline passes, then only
+# touched by late deposits until the member has paid up, after which it is closed for good
+class DeadlineCompliance(models.Model):
+    deadline = models.ForeignKey(MonthlyDeadline, on_delete=models.CASCADE, related_name='compliance')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='deadline_compliance')
+    group = models.ForeignKey(SavingsGroup, on_delete=models.SET_NULL, null=True, blank=True)
+    due_date = models.DateField()
+    shares_due = models.PositiveIntegerField()
+    shares_paid = models.PositiveIntegerField(default=0)
+    closed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DeadlineComplianceQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('deadline', 'user')
+        indexes = [
+            models.Index(fields=['group', 'closed'], name='compliance_group_closed_idx'),
+            models.Index(fields=['user', 'closed'], name='compliance_user_closed_idx'),
+        ]
+
+    @property
+    def shares_owed(self):
+        return max(0, self.shares_due - self.shares_paid)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.due_date}: {self.shares_paid}/{self.shares_due} shares"
@@ -0,0 +1,98 @@
+"""Amounts of RWF held as whole cents for arithmetic in the batch jobs.
+
+The database keeps money in DecimalFields with two places. Code that adds,
+scales and splits amounts (penalty accrual, profit distribution, their
+summaries) converts once with to_cents() or Money.from_decimal(), works on
+integers and converts back with to_decimal() or .decimal when it writes.
+Adding and multiplying by whole numbers is exact, as it is for two-place
+Decimals; share() splits an amount in proportion with floor division, so the
+parts never add up to more than the whole. Loops over thousands of members
+use the plain int functions: a Money object per step costs more than the
+C-accelerated Decimal it replaces.
+"""
+from decimal import ROUND_HALF_EVEN, Decimal
+from functools import total_ordering
+
+CENT = Decimal('0.01')
+
+
+def to_cents(amount, rounding=ROUND_HALF_EVEN):
+    """Whole cents of a Decimal (or int/str) amount, rounded the way DecimalField stores it"""
+    return int(Decimal(amount).quantize(CENT, rounding=rounding).scaleb(2))
+
+
+def to_decimal(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def share(cents, weight, total_weight):
+    """cents times weight / total_weight, rounded down to the cent"""
+    return cents * weight // total_weight if total_weight else 0
+
+
+@total_ordering
+class Money:
+    __slots__ = ('cents',)
+
+    def __init__(self, cents=0):
+        self.cents = int(cents)
+
+    @classmethod
+    def from_decimal(cls, amount, rounding=ROUND_HALF_EVEN):
+        """Money for a Decimal (or int/str) amount, rounded to the cent the way DecimalField stores it"""
+        return cls(to_cents(amount, rounding))
+
+    @property
+    def decimal(self):
+        return to_decimal(self.cents)
+
+    def share(self, weight, total_weight):
+        """This amount times weight / total_weight, rounded down to the cent"""
+        return Money(share(self.cents, weight, total_weight))
+
+    def __add__(self, other):
+        if isinstance(other, Money):
+            return Money(self.cents + other.cents)
+        return NotImplemented
+
+    def __sub__(self, other):
+        if isinstance(other, Money):
+            return Money(self.cents - other.cents)
+        return NotImplemented
+
+    def __mul__(self, times):
+        if isinstance(times, int):
+            return Money(self.cents * times)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Money(-self.cents)
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __eq__(self, other):
+        return isinstance(other, Money) and self.cents == other.cents
+
+    def __lt__(self, other):
+        if isinstance(other, Money):
+            return self.cents < other.cents
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.cents)
+
+    def __format__(self, spec):
+        return format(self.decimal, spec)
+
+    def __str__(self):
+        return str(self.decimal)
+
+    def __repr__(self):
+        return f'Money({self.decimal})'
+
+
+def total(amounts):
+    return sum(amounts, Money())
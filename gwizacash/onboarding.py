@@ -0,0 +1,176 @@
+"""Bulk member onboarding from a CSV file.
+
+Every row is validated before anything is written. Users and profiles are then
+inserted with two bulk_create calls in one transaction, so the per-user
+post_save receivers never run. The generated passwords are hashed in a thread
+pool (PBKDF2 releases the GIL), and the credential emails go out over a single
+mail connection once the transaction commits.
+"""
+import csv
+import logging
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMessage, get_connection
+from django.core.validators import validate_email
+from django.db import transaction
+
+from .cache_versions import bump_group_version
+from .members import allocate_usernames
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+MEMBER_CSV_COLUMNS = ('first_name', 'last_name', 'email', 'phone', 'committed_shares')
+MAX_IMPORT_ROWS = 1000
+PASSWORD_HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def parse_member_csv(lines):
+    """Validate every row of a member CSV (any iterable of text lines); returns (rows, errors)
+
+    rows is only meant to be imported when errors is empty.
+    """
+    reader = csv.DictReader(lines)
+    try:
+        reader.fieldnames = [name.strip().lower().replace(' ', '_') for name in reader.fieldnames or []]
+    except csv.Error as e:
+        return [], [f'Could not read the file: {e}']
+
+    missing = [column for column in ('first_name', 'last_name', 'committed_shares') if column not in reader.fieldnames]
+    if missing:
+        return [], [f"Missing column(s): {', '.join(missing)}"]
+
+    rows, errors, seen_emails = [], [], {}
+    try:
+        for line, record in enumerate(reader, start=2):
+            if len(rows) + len(errors) >= MAX_IMPORT_ROWS:
+                errors.append(f'Files are limited to {MAX_IMPORT_ROWS} members')
+                break
+            row = {column: (record.get(column) or '').strip() for column in MEMBER_CSV_COLUMNS}
+            if not any(row.values()):
+                continue
+            row_errors = []
+            if not row['first_name'] or not row['last_name']:
+                row_errors.append('first and last name are required')
+            try:
+                row['committed_shares'] = int(row['committed_shares'])
+                if row['committed_shares'] <= 0:
+                    raise ValueError
+            except ValueError:
+                row_errors.append('committed_shares must be a positive whole number')
+            if row['email']:
+                try:
+                    validate_email(row['email'])
+                except ValidationError:
+                    row_errors.append(f"invalid email '{row['email']}'")
+                email_key = row['email'].lower()
+                if email_key in seen_emails:
+                    row_errors.append(f'email already used on row {seen_emails[email_key]}')
+                seen_emails.setdefault(email_key, line)
+            if len(row['phone']) > UserProfile._meta.get_field('phone').max_length:
+                row_errors.append('phone number is too long')
+
+            if row_errors:
+                errors.append(f"Row {line}: {'; '.join(row_errors)}")
+            else:
+                rows.append(row)
+    except csv.Error as e:
+        errors.append(f'Could not read the file: {e}')
+
+    if not rows and not errors:
+        errors.append('The file has no member rows')
+    return rows, errors
+
+
+def hash_passwords(passwords, workers=PASSWORD_HASH_WORKERS):
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(make_password, passwords))
+
+
+def credential_email(username, password, email):
+    return EmailMessage(
+        'Welcome to Gwiza-Cash',
+        f'Your account has been created.\nUsername: {username}\nPassword: {password}\nPlease change your password after logging in.',
+        'from@gwizacash.com',
+        [email],
+    )
+
+
+def send_credential_emails(emails):
+    """Send all messages over one connection; failures are logged, never raised"""
+    try:
+        sent = get_connection(fail_silently=True).send_messages(emails) or 0
+        logger.info(f'Sent {sent} of {len(emails)} member credential emails')
+    except Exception:
+        logger.exception('Sending member credential emails failed')
+
+
+def import_members(coordinator, rows, hash_workers=PASSWORD_HASH_WORKERS, email_in_background=True):
+    """Create a user and profile for every validated row under the coordinator; returns their credentials"""
+    usernames = allocate_usernames([f"{row['first_name'].lower()}_{row['last_name'].lower()}" for row in rows])
+    passwords = [secrets.token_urlsafe(12) for _ in rows]
+    password_hashes = hash_passwords(passwords, workers=hash_workers)
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(
+                username=username,
+                password=password_hash,
+                first_name=row['first_name'],
+                last_name=row['last_name'],
+                email=row['email'],
+            )
+            for row, username, password_hash in zip(rows, usernames, password_hashes)
+        ])
+        if any(user.pk is None for user in users):
+            # Backends that can't return bulk-inserted keys
+            by_username = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+            for user in users:
+                user.pk = by_username[user.username]
+
+        profiles = []
+        for user, row in zip(users, rows):
+            profile = UserProfile(
+                user=user,
+                user_type='MEMBER',
+                coordinator=coordinator,
+                group=coordinator.group,
+                phone=row['phone'],
+                committed_shares=row['committed_shares'],
+            )
+            profile.recalculate_share_totals()
+            profiles.append(profile)
+        UserProfile.objects.bulk_create(profiles)
+
+        emails = [
+            credential_email(user.username, password, user.email)
+            for user, password in zip(users, passwords) if user.email
+        ]
+        if emails:
+            if email_in_background:
+                transaction.on_commit(lambda: threading.Thread(
+                    target=send_credential_emails, args=(emails,), daemon=True
+                ).start())
+            else:
+                transaction.on_commit(lambda: send_credential_emails(emails))
+        # bulk_create sends no post_save, so the cached member tables are invalidated here
+        transaction.on_commit(partial(bump_group_version, coordinator.group_id))
+
+    return [
+        {
+            'name': user.get_full_name(),
+            'username': user.username,
+            'password': password,
+            'email': user.email,
+            'phone': row['phone'],
+            'committed_shares': row['committed_shares'],
+        }
+        for user, password, row in zip(users, passwords, rows)
+    ]
@@ -0,0 +1,87 @@
+"""Run a job's work one savings group at a time.
+
+Each partition runs in its own short transaction, so a slow or failing group
+neither blocks nor rolls back the others. With more than one worker the
+partitions run concurrently in a process pool; workers are spawned rather
+than forked because the scheduler calls the commands from a threaded process.
+A spawned worker sets Django up afresh, so it must not start a scheduler of
+its own: the process that owns the pool already runs the scheduled jobs.
+"""
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    # Before setup, which runs the app's ready() and with it start_scheduler()
+    settings.SCHEDULER_AUTOSTART = False
+    django.setup()
+
+
+def _run_partition(func, group_id, args):
+    started = time.monotonic()
+    try:
+        summary = func(group_id, *args)
+        ok, error = True, ''
+    except Exception as e:
+        logger.exception(f"Partition for group {group_id} failed")
+        summary, ok, error = {}, False, str(e)
+    return {
+        'group_id': group_id,
+        'ok': ok,
+        'summary': summary or {},
+        'error': error,
+        'seconds': time.monotonic() - started,
+    }
+
+
+def _run_partition_in_worker(func, group_id, args):
+    try:
+        return _run_partition(func, group_id, args)
+    finally:
+        connections.close_all()
+
+
+def run_partitions(func, groups, *args, workers=1):
+    """Call func(group_id, *args) for every group and return one result dict per group"""
+    names = {group.pk: str(group) for group in groups}
+    if workers <= 1 or len(names) <= 1:
+        results = [_run_partition(func, group_id, args) for group_id in names]
+    else:
+        # Children open their own connections; never share the parent's sockets
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(names)),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        ) as pool:
+            futures = [pool.submit(_run_partition_in_worker, func, group_id, args) for group_id in names]
+            results = [future.result() for future in as_completed(futures)]
+
+    for result in results:
+        result['group'] = names[result['group_id']]
+    return sorted(results, key=lambda result: result['group_id'])
+
+
+def write_partition_report(command, results):
+    """Print one line per partition to a management command's stdout"""
+    for result in results:
+        if result['ok']:
+            details = ', '.join(f'{key}={value}' for key, value in result['summary'].items())
+            command.stdout.write(command.style.SUCCESS(
+                f"[{result['group']}] ok in {result['seconds']:.2f}s" + (f": {details}" if details else '')
+            ))
+        else:
+            command.stdout.write(command.style.ERROR(
+                f"[{result['group']}] FAILED after {result['seconds']:.2f}s: {result['error']}"
+            ))
+    failed = sum(1 for result in results if not result['ok'])
+    if failed:
+        command.stdout.write(command.style.ERROR(f'{failed} of {len(results)} groups failed'))
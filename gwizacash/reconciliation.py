@@ -0,0 +1,245 @@
+"""Match bank statement lines to pending deposits and repayments.
+
+A statement (CSV or OFX export) is parsed into credit lines. Pending records
+are indexed in dicts: by record reference (DEP-12, LP-5, PP-7), by member
+(username, full name, phone) and by exact amount, each amount bucket sorted
+by submission date. A line looks up whatever its narration names in the hash
+indexes, and bisects its amount bucket for the few submissions nearest its
+date, so no line is compared with every pending record even when most
+members pay the same amount. Candidate pairs are then assigned one-to-one,
+strongest evidence and closest date first; the whole pass is O(n log n).
+"""
+import csv
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+
+from .models import Deposit, LoanPayment, PenaltyPayment
+
+MATCH_WINDOW_DAYS = 5
+# Same-amount submissions on either side of a line's date considered without any reference
+NEAREST_CANDIDATES = 3
+
+# Scores; pairs at or above AUTO_SELECT_SCORE are ticked for approval by default
+SCORE_AMOUNT_AND_DATE = 1
+SCORE_MEMBER_REFERENCE = 2
+SCORE_RECORD_REFERENCE = 3
+AUTO_SELECT_SCORE = SCORE_MEMBER_REFERENCE
+
+# Reference prefixes members are asked to put on their transfers
+RECORD_REFERENCE_PREFIXES = {'DEP': 'deposit', 'LP': 'loan_payment', 'PP': 'penalty_payment'}
+RECORD_REFERENCE_RE = re.compile(r'\b(DEP|LP|PP)[\s#:-]*(\d+)\b', re.IGNORECASE)
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y/%m/%d', '%d %b %Y', '%d-%b-%Y', '%Y%m%d')
+DATE_COLUMNS = ('date', 'value_date', 'transaction_date', 'posting_date', 'booking_date')
+AMOUNT_COLUMNS = ('credit', 'amount', 'credit_amount', 'deposit')
+DESCRIPTION_COLUMNS = ('description', 'narration', 'details', 'reference', 'memo', 'particulars', 'remarks')
+
+StatementLine = namedtuple('StatementLine', 'number date amount description bank_reference')
+Candidate = namedtuple('Candidate', 'kind record member date amount username name phone')
+
+
+class StatementError(ValueError):
+    pass
+
+
+def parse_amount(value):
+    cleaned = re.sub(r'[^\d.,-]', '', value or '').replace(',', '')
+    if not cleaned:
+        return None
+    try:
+        return Decimal(cleaned).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _first_column(fieldnames, choices):
+    return next((name for name in choices if name in fieldnames), None)
+
+
+def parse_csv_statement(text):
+    reader = csv.DictReader(text.splitlines())
+    reader.fieldnames = [name.strip().lower().replace(' ', '_') for name in reader.fieldnames or []]
+    date_column = _first_column(reader.fieldnames, DATE_COLUMNS)
+    amount_column = _first_column(reader.fieldnames, AMOUNT_COLUMNS)
+    if not date_column or not amount_column:
+        raise StatementError('The statement needs a date column and an amount or credit column')
+    description_columns = [name for name in DESCRIPTION_COLUMNS if name in reader.fieldnames]
+
+    lines = []
+    for number, record in enumerate(reader, start=2):
+        amount = parse_amount(record.get(amount_column))
+        posted = parse_date(record.get(date_column))
+        # Only money coming in can settle a deposit or repayment
+        if amount is None or amount <= 0 or posted is None:
+            continue
+        description = ' '.join((record.get(name) or '').strip() for name in description_columns).strip()
+        lines.append(StatementLine(number, posted, amount, description, (record.get('reference') or '').strip()))
+    return lines
+
+
+def _ofx_field(block, tag):
+    match = re.search(rf'<{tag}>([^<\r\n]*)', block, re.IGNORECASE)
+    return match.group(1).strip() if match else ''
+
+
+def parse_ofx_statement(text):
+    lines = []
+    blocks = re.findall(r'<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|(?=</BANKTRANLIST>))', text, re.IGNORECASE | re.DOTALL)
+    for number, block in enumerate(blocks, start=1):
+        amount = parse_amount(_ofx_field(block, 'TRNAMT'))
+        posted = parse_date(_ofx_field(block, 'DTPOSTED')[:8])
+        if amount is None or amount <= 0 or posted is None:
+            continue
+        description = ' '.join(filter(None, (_ofx_field(block, 'NAME'), _ofx_field(block, 'MEMO'))))
+        lines.append(StatementLine(number, posted, amount, description, _ofx_field(block, 'FITID')))
+    return lines
+
+
+def parse_statement(filename, data):
+    """Credit lines of a CSV or OFX bank statement export"""
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = data.decode('latin-1')
+    if filename.lower().endswith(('.ofx', '.qfx')) or '<OFX>' in text[:2000].upper():
+        lines = parse_ofx_statement(text)
+    else:
+        try:
+            lines = parse_csv_statement(text)
+        except csv.Error as e:
+            raise StatementError(f'Could not read the statement: {e}')
+    if not lines:
+        raise StatementError('No incoming payments were found in the statement')
+    return lines
+
+
+def pending_candidates(group):
+    """Every pending deposit, loan payment and penalty payment in the group"""
+    sources = (
+        ('deposit', Deposit.objects.filter(group=group, status='PENDING')
+            .select_related('user', 'user__userprofile'), 'date', lambda record: record.user),
+        ('loan_payment', LoanPayment.objects.filter(loan__group=group, status='PENDING')
+            .select_related('loan', 'loan__user', 'loan__user__userprofile'), 'payment_date', lambda record: record.loan.user),
+        ('penalty_payment', PenaltyPayment.objects.filter(penalty__group=group, status='PENDING')
+            .select_related('penalty', 'penalty__user', 'penalty__user__userprofile'), 'payment_date', lambda record: record.penalty.user),
+    )
+    candidates = []
+    for kind, queryset, date_field, member in sources:
+        for record in queryset:
+            user = member(record)
+            phone = re.sub(r'\D', '', user.userprofile.phone or '')
+            candidates.append(Candidate(
+                kind, record, user, timezone.localdate(getattr(record, date_field)), record.amount,
+                user.username.lower(),
+                (user.first_name.lower(), user.last_name.lower()) if user.first_name and user.last_name else None,
+                # Narrations carry numbers with or without the country code
+                phone[-9:] if len(phone) >= 9 else '',
+            ))
+    return candidates
+
+
+def _index_candidates(candidates):
+    by_amount, by_reference = defaultdict(list), defaultdict(list)
+    for candidate in candidates:
+        by_amount[candidate.amount].append(candidate)
+        by_reference[(candidate.kind, candidate.record.pk)].append(candidate)
+        by_reference[('username', candidate.username)].append(candidate)
+        if candidate.name:
+            by_reference[('name', candidate.name)].append(candidate)
+        if candidate.phone:
+            by_reference[('phone', candidate.phone)].append(candidate)
+    for bucket in by_amount.values():
+        bucket.sort(key=lambda candidate: (candidate.date, candidate.kind, candidate.record.pk))
+    dates = {amount: [candidate.date for candidate in bucket] for amount, bucket in by_amount.items()}
+    return by_amount, dates, by_reference
+
+
+def _line_references(line):
+    """Hash keys for everything in the narration that can identify a record or a member"""
+    references = [
+        ((RECORD_REFERENCE_PREFIXES[prefix.upper()], int(number)), 'record reference')
+        for prefix, number in RECORD_REFERENCE_RE.findall(line.description)
+    ]
+    words = re.findall(r'[a-z0-9_]+', line.description.lower())
+    references += [(('username', word), 'member name') for word in words]
+    references += [(('name', pair), 'member name') for pair in zip(words, words[1:])]
+    references += [(('name', (last, first)), 'member name') for first, last in zip(words, words[1:])]
+    references += [
+        (('phone', digits[-9:]), 'member phone') for digits in re.findall(r'\d{9,}', line.description.replace(' ', ''))
+    ]
+    return references
+
+
+def match_statement(lines, candidates, window_days=MATCH_WINDOW_DAYS):
+    """Propose at most one pending record per statement line; returns (matches, unmatched_lines)"""
+    by_amount, bucket_dates, by_reference = _index_candidates(candidates)
+    window = timedelta(days=window_days)
+
+    pairs = []
+    for line in lines:
+        evidence = defaultdict(set)
+        for key, reason in _line_references(line):
+            for candidate in by_reference.get(key, ()):
+                if candidate.amount == line.amount:
+                    evidence[(candidate.kind, candidate.record.pk)].add(reason)
+        for candidate_key, reasons in evidence.items():
+            candidate = by_reference[candidate_key][0]
+            days_apart = abs((candidate.date - line.date).days)
+            if 'record reference' in reasons:
+                score = SCORE_RECORD_REFERENCE
+            elif days_apart <= window_days:
+                score = SCORE_MEMBER_REFERENCE
+            else:
+                continue
+            pairs.append((-score, days_apart, line.number, candidate, line, sorted(reasons)))
+
+        # Without any reference, only the few submissions closest in date are worth proposing
+        bucket = by_amount.get(line.amount)
+        if bucket:
+            dates = bucket_dates[line.amount]
+            low, high = bisect_left(dates, line.date - window), bisect_right(dates, line.date + window)
+            centre = bisect_left(dates, line.date, low, high)
+            for candidate in bucket[max(low, centre - NEAREST_CANDIDATES):min(high, centre + NEAREST_CANDIDATES)]:
+                if (candidate.kind, candidate.record.pk) not in evidence:
+                    days_apart = abs((candidate.date - line.date).days)
+                    pairs.append((-SCORE_AMOUNT_AND_DATE, days_apart, line.number, candidate, line, ['amount and date']))
+
+    # Greedy one-to-one assignment: strongest evidence first, then the closest dates
+    pairs.sort(key=lambda pair: pair[:3])
+    used_lines, used_records, matches = set(), set(), []
+    for negative_score, days_apart, number, candidate, line, reasons in pairs:
+        record_key = (candidate.kind, candidate.record.pk)
+        if number in used_lines or record_key in used_records:
+            continue
+        used_lines.add(number)
+        used_records.add(record_key)
+        matches.append({
+            'line': line,
+            'kind': candidate.kind,
+            'record': candidate.record,
+            'member': candidate.member,
+            'submitted': candidate.date,
+            'key': f'{candidate.kind}:{candidate.record.pk}',
+            'score': -negative_score,
+            'days_apart': days_apart,
+            'reasons': reasons,
+            'selected': -negative_score >= AUTO_SELECT_SCORE,
+        })
+    matches.sort(key=lambda match: match['line'].number)
+    unmatched = [line for line in lines if line.number not in used_lines]
+    return matches, unmatched
@@ -0,0 +1,120 @@
+"""Optional read-replica routing for reporting pages.
+
+When settings.DATABASES has a 'replica' alias, reads made inside a
+``replica_reads`` view (or a ``read_from_replica()`` block in a management
+command) go to it; every write, and every read inside an open transaction,
+stays on the primary. After a user's own POST the response carries a short
+lived cookie that pins their requests to the primary, so replication lag never
+hides a deposit or payment they have just submitted.
+"""
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+PIN_COOKIE_NAME = 'gwizacash_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_replica_reads = ContextVar('gwizacash_replica_reads', default=False)
+_pinned_to_primary = ContextVar('gwizacash_pinned_to_primary', default=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def read_from_replica():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads(view_func):
+    """Serve a read-only reporting view from the replica unless the user is pinned to the primary"""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        with read_from_replica():
+            return view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or _pinned_to_primary.get() or not replica_configured():
+            return None
+        # Reads that feed a write in the same transaction must see the primary
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaStickyMiddleware:
+    """Pin a user's reads to the primary for REPLICA_STICKY_SECONDS after they submit a write"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI, stay async so async views are not pushed onto a thread by this middleware
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _pinned_to_primary.set(self.is_pinned(request))
+        try:
+            with self.read_scope(request):
+                response = self.get_response(request)
+        finally:
+            _pinned_to_primary.reset(token)
+        return self.pin_after_write(request, response)
+
+    async def __acall__(self, request):
+        token = _pinned_to_primary.set(self.is_pinned(request))
+        try:
+            with self.read_scope(request):
+                response = await self.get_response(request)
+        finally:
+            _pinned_to_primary.reset(token)
+        return self.pin_after_write(request, response)
+
+    def read_scope(self, request):
+        # Whole URL trees (the admin) can be read from the replica without decorating each view
+        if request.method in SAFE_METHODS and request.path_info.startswith(settings.REPLICA_READ_PATH_PREFIXES):
+            return read_from_replica()
+        return nullcontext()
+
+    def pin_after_write(self, request, response):
+        if request.method not in SAFE_METHODS and replica_configured():
+            sticky_seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                PIN_COOKIE_NAME, str(int(time.time()) + sticky_seconds),
+                max_age=sticky_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def is_pinned(self, request):
+        try:
+            return int(request.COOKIES.get(PIN_COOKIE_NAME, 0)) > time.time()
+        except ValueError:
+            return False
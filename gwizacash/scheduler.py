@@ -1,32 +1,62 @@
 import logging
+from functools import wraps
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from django.conf import settings
 from django.core.management import call_command
+from django.db import close_old_connections
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
 _scheduler = None  # Singleton to prevent multiple schedulers
 
+def with_fresh_connections(job):
+    """Scheduler threads never see request start/finish, so recycle their connections around each job"""
+    @wraps(job)
+    def _job(*args, **kwargs):
+        close_old_connections()
+        try:
+            return job(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return _job
+
+@with_fresh_connections
 def reset_monthly_shares():
     try:
-        call_command('reset_shares')
+        call_command('reset_shares', '--workers', str(settings.JOB_WORKERS))
         logger.info("Monthly shares reset successfully.")
     except Exception as e:
         logger.error(f"Error resetting monthly shares: {str(e)}")
 
+@with_fresh_connections
 def distribute_monthly_profits():
     try:
-        call_command('distribute_profits')
+        call_command('distribute_profits', '--workers', str(settings.JOB_WORKERS))
         logger.info("Monthly profit distribution completed.")
     except Exception as e:
         logger.error(f"Error distributing profits: {str(e)}")
 
+@with_fresh_connections
+def resume_profit_distributions():
+    try:
+        call_command('distribute_profits', '--resume', '--workers', str(settings.JOB_WORKERS))
+    except Exception as e:
+        logger.error(f"Error resuming profit distributions: {str(e)}")
+
+@with_fresh_connections
+def repair_work_queues():
+    try:
+        call_command('repair_work_queues', '--workers', str(settings.JOB_WORKERS))
+    except Exception as e:
+        logger.error(f"Error repairing work queue counters: {str(e)}")
+
+@with_fresh_connections
 def calculate_penalties():
     try:
         today = timezone.now().date()
-        call_command('calculate_penalties', '--date', str(today))
+        call_command('calculate_penalties', '--date', str(today), '--workers', str(settings.JOB_WORKERS))
         logger.info(f"Penalty calculation completed for {today}.")
     except Exception as e:
         logger.error(f"Error calculating penalties: {str(e)}")
@@ -36,6 +66,9 @@ def start_scheduler():
     if settings.DEBUG:
         logger.info("Scheduler not started in DEBUG mode.")
         return
+    if not getattr(settings, 'SCHEDULER_AUTOSTART', True):
+        logger.info("Scheduler not started: SCHEDULER_AUTOSTART is off.")
+        return
     if _scheduler is not None:
         logger.info("Scheduler already running, skipping start.")
         return
@@ -64,6 +97,24 @@ def start_scheduler():
         replace_existing=True,
     )
 
+    # Finish any distribution run a crash or restart left part-way, from where it stopped
+    _scheduler.add_job(
+        resume_profit_distributions,
+        trigger=CronTrigger(minute='*/15', timezone="Africa/Kigali"),
+        id="resume_profit_distributions",
+        max_instances=1,
+        replace_existing=True,
+    )
+
+    # Recount the coordinator badges in case anything changed a status behind the counters' back
+    _scheduler.add_job(
+        repair_work_queues,
+        trigger=CronTrigger(minute=30, timezone="Africa/Kigali"),
+        id="repair_work_queues",
+        max_instances=1,
+        replace_existing=True,
+    )
+
     # Calculate penalties every day at 00:10 AM
     _scheduler.add_job(
         calculate_penalties,
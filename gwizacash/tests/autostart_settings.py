@@ -0,0 +1,4 @@
+"""The test settings with the scheduler left to start, as in production"""
+from GCP.test_settings import *  # noqa: F401,F403
+
+SCHEDULER_AUTOSTART = True
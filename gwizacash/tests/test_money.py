@@ -0,0 +1,168 @@
+"""The integer-cent arithmetic against the Decimal arithmetic it replaced.
+
+Each property is checked on a few thousand random amounts plus the edges
+around cent boundaries; the old Decimal expressions are kept here verbatim.
+"""
+import random
+from decimal import ROUND_DOWN, Decimal
+from fractions import Fraction
+
+import pytest
+from django.db.backends.utils import format_number
+
+from gwizacash.management.commands.calculate_penalties import accrual_terms
+from gwizacash.money import Money, share, to_cents, to_decimal, total
+from gwizacash.views import calculate_penalty
+
+CENT = Decimal('0.01')
+CASES = 2000
+
+
+def random_amount(rng, places=2, high=10**9):
+    """A Decimal with up to `places` decimal places"""
+    return Decimal(rng.randint(0, high * 10**places)).scaleb(-places)
+
+
+# Amounts that sit on or either side of a cent boundary
+BOUNDARY_AMOUNTS = [
+    Decimal(value) for value in (
+        '0', '0.001', '0.004', '0.005', '0.006', '0.009', '0.01', '0.015', '0.025', '0.994', '0.995',
+        '0.999', '1.005', '2.675', '99.995', '100.00', '12345678.905', '12345678.915', '9999999999999.99',
+    )
+]
+
+
+@pytest.mark.parametrize('amount', BOUNDARY_AMOUNTS)
+def test_to_cents_rounds_as_decimal_field_stores(amount):
+    stored = Decimal(format_number(amount, 15, 2))
+    assert to_cents(amount) == int(stored * 100)
+    assert to_decimal(to_cents(amount)) == stored
+
+
+def test_to_cents_round_trips_two_place_amounts():
+    rng = random.Random(49)
+    for _ in range(CASES):
+        amount = random_amount(rng)
+        assert to_decimal(to_cents(amount)) == amount
+        assert Money.from_decimal(amount).decimal == amount
+
+
+def test_to_cents_matches_quantize_for_finer_amounts():
+    rng = random.Random(50)
+    for _ in range(CASES):
+        amount = random_amount(rng, places=5)
+        assert to_decimal(to_cents(amount)) == amount.quantize(CENT)
+        assert to_decimal(to_cents(amount, ROUND_DOWN)) == amount.quantize(CENT, rounding=ROUND_DOWN)
+
+
+def test_money_arithmetic_matches_decimal():
+    rng = random.Random(51)
+    for _ in range(CASES):
+        a, b = random_amount(rng), random_amount(rng)
+        times = rng.randint(0, 10**4)
+        ma, mb = Money.from_decimal(a), Money.from_decimal(b)
+        assert (ma + mb).decimal == a + b
+        assert (ma - mb).decimal == a - b
+        assert (ma * times).decimal == a * times
+        assert (times * ma).decimal == a * times
+        assert (-ma).decimal == -a
+        assert (ma < mb) == (a < b)
+        assert (ma == mb) == (a == b)
+
+
+def test_money_total_matches_decimal_sum():
+    rng = random.Random(52)
+    amounts = [random_amount(rng) for _ in range(CASES)]
+    assert total(Money.from_decimal(amount) for amount in amounts).decimal == sum(amounts)
+
+
+def old_accrual_terms(days_late, shares=1):
+    amount = calculate_penalty(days_late, shares).quantize(Decimal('0.01'))
+    daily_rate = (calculate_penalty(2, shares) - calculate_penalty(1, shares)).quantize(Decimal('0.01'))
+    return amount, daily_rate
+
+
+@pytest.mark.parametrize('days_late', [-3, 0, 1, 2, 3, 30, 365, 10**4])
+@pytest.mark.parametrize('shares', [0, 1, 2, 7, 100])
+def test_accrual_terms_match_decimal_penalties(days_late, shares):
+    assert accrual_terms(days_late, shares) == old_accrual_terms(days_late, shares)
+
+
+def test_accrual_terms_match_decimal_penalties_at_random():
+    rng = random.Random(53)
+    for _ in range(CASES):
+        days_late, shares = rng.randint(-5, 5000), rng.randint(0, 500)
+        amount, daily_rate = accrual_terms(days_late, shares)
+        assert (amount, daily_rate) == old_accrual_terms(days_late, shares)
+        assert amount == amount.quantize(CENT) and daily_rate == daily_rate.quantize(CENT)
+
+
+def test_accrued_days_add_up_to_a_fresh_penalty():
+    # The daily UPDATE adds daily_rate per day; it must land where a penalty opened that late would start
+    for shares in (1, 3, 11):
+        amount, daily_rate = accrual_terms(1, shares)
+        for days_late in range(2, 60):
+            amount += daily_rate
+            assert amount == accrual_terms(days_late, shares)[0]
+
+
+def old_member_share(profit, weight, total_weight):
+    """The Decimal per-share distribution: profit / total, times the weight, rounded down to the cent"""
+    per_share_amount = profit / total_weight
+    return (per_share_amount * weight).quantize(CENT, rounding=ROUND_DOWN)
+
+
+def exact_member_share(profit, weight, total_weight):
+    cents = Fraction(profit) * 100 * weight / total_weight
+    return Decimal(cents.numerator // cents.denominator).scaleb(-2)
+
+
+def test_share_is_exact_floor_and_never_below_decimal_path():
+    rng = random.Random(54)
+    for _ in range(CASES):
+        profit = random_amount(rng, high=10**8)
+        total_weight = rng.randint(1, 10**5)
+        weight = rng.randint(0, total_weight)
+        new = to_decimal(share(to_cents(profit), weight, total_weight))
+        old = old_member_share(profit, weight, total_weight)
+
+        assert new == exact_member_share(profit, weight, total_weight)
+        # The Decimal path divides first with 28 significant digits, which can land just under a whole
+        # cent and floor one cent short; it is never above the exact share
+        assert old <= new <= old + CENT
+
+
+@pytest.mark.parametrize('profit, weight, total_weight', [
+    (Decimal('100.00'), 3, 3),
+    (Decimal('100.00'), 1, 3),
+    (Decimal('0.01'), 1, 2),
+    (Decimal('0.02'), 1, 2),
+    (Decimal('12000.00'), 7, 17),
+    (Decimal('1.00'), 1, 1),
+])
+def test_share_at_cent_boundaries(profit, weight, total_weight):
+    assert to_decimal(share(to_cents(profit), weight, total_weight)) == exact_member_share(profit, weight, total_weight)
+
+
+def test_members_shares_never_exceed_the_profit():
+    rng = random.Random(55)
+    for _ in range(200):
+        profit = to_cents(random_amount(rng, high=10**7))
+        weights = [rng.randint(0, 50) for _ in range(rng.randint(1, 300))]
+        paid = [share(profit, weight, sum(weights)) for weight in weights]
+        assert sum(paid) <= profit
+        # Flooring loses under a cent per member
+        assert profit - sum(paid) < len(weights) or not sum(weights)
+
+
+def test_share_of_zero_total_weight_is_zero():
+    assert share(10**6, 0, 0) == 0
+    assert Money(10**6).share(3, 0) == Money(0)
+
+
+def test_money_share_matches_int_share():
+    rng = random.Random(56)
+    for _ in range(CASES):
+        cents, total_weight = rng.randint(0, 10**12), rng.randint(1, 10**6)
+        weight = rng.randint(0, total_weight)
+        assert Money(cents).share(weight, total_weight).cents == share(cents, weight, total_weight)
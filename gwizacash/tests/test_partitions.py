@@ -0,0 +1,20 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from gwizacash import partitions
+
+
+def _scheduler_running():
+    from gwizacash import scheduler
+    return scheduler._scheduler is not None
+
+
+def test_partition_workers_do_not_start_the_scheduler(monkeypatch):
+    # Spawned workers read the settings module from the environment they inherit
+    monkeypatch.setenv('DJANGO_SETTINGS_MODULE', 'gwizacash.tests.autostart_settings')
+    with ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=partitions._init_worker,
+    ) as pool:
+        assert pool.submit(_scheduler_running).result(timeout=60) is False
@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+
+import pytest
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from gwizacash.management.commands.calculate_penalties import calculate_group_penalties
+from gwizacash.models import DeadlineCompliance, Loan, LoanInstallment, MonthlyDeadline, Penalty, SavingsGroup, UserProfile
+
+pytestmark = pytest.mark.django_db
+
+start_open_penalty_accruals = import_module('gwizacash.migrations.0025_penalty_accrual').start_open_penalty_accruals
+
+TODAY = date(2026, 10, 19)
+
+
+@pytest.fixture
+def member():
+    group = SavingsGroup.objects.create(name='Abakorana')
+    user = User.objects.create_user('member')
+    # A profile is created along with the user
+    UserProfile.objects.filter(user=user).update(user_type='MEMBER', group=group)
+    return user
+
+
+def legacy_loan_fine(user, loan, days_late=10):
+    """A loan fine as the full recompute left it: keyed by the loan's due date, not yet accruing"""
+    return Penalty.objects.create(
+        user=user, group_id=loan.group_id, penalty_type='LATE_LOAN_REPAYMENT',
+        amount=Decimal('2000') + Decimal('500') * (days_late - 1), days_late=days_late,
+        original_due_date=loan.due_date, description=f'Late loan repayment - Loan #{loan.id}',
+    )
+
+
+def make_loan(user, status, due_date):
+    return Loan.objects.create(user=user, amount=Decimal('100000'), status=status, due_date=due_date)
+
+
+def test_backfill_leaves_fines_on_repaid_loans_frozen(member):
+    due = timezone.make_aware(timezone.datetime(2026, 6, 1))
+    repaid = legacy_loan_fine(member, make_loan(member, 'REPAID', due))
+    active = legacy_loan_fine(member, make_loan(member, 'ACTIVE', due + timedelta(days=30)))
+
+    start_open_penalty_accruals(apps, None)
+
+    repaid.refresh_from_db()
+    active.refresh_from_db()
+    assert repaid.daily_rate == 0
+    assert active.daily_rate == Decimal('500.00')
+
+
+def test_fine_on_a_repaid_loan_stops_growing(member):
+    due = timezone.make_aware(timezone.datetime(2026, 6, 1))
+    fine = legacy_loan_fine(member, make_loan(member, 'REPAID', due))
+    # An accrual already started before the loan was repaid
+    Penalty.objects.filter(pk=fine.pk).update(
+        daily_rate=Decimal('500.00'), accrues_from=due.date(), accrued_through=due.date() + timedelta(days=10),
+    )
+
+    calculate_group_penalties(fine.group_id, TODAY)
+    calculate_group_penalties(fine.group_id, TODAY + timedelta(days=6))
+
+    fine.refresh_from_db()
+    assert fine.daily_rate == 0
+    assert fine.amount == Decimal('6500.00')
+
+
+def test_fine_on_an_unpaid_installment_keeps_growing(member):
+    due = timezone.make_aware(timezone.datetime(2026, 6, 1))
+    loan = make_loan(member, 'ACTIVE', due)
+    LoanInstallment.objects.create(
+        loan=loan, number=1, due_date=due, expected_amount=Decimal('105000'), scheduled_at=due - timedelta(days=30),
+    )
+    fine = legacy_loan_fine(member, loan)
+    start_open_penalty_accruals(apps, None)
+
+    calculate_group_penalties(fine.group_id, due.date() + timedelta(days=12))
+
+    fine.refresh_from_db()
+    assert fine.daily_rate == Decimal('500.00')
+    assert fine.amount == Decimal('7500.00')
+
+
+def test_late_deposit_fine_without_an_open_compliance_row_stops(member):
+    group_id = member.userprofile.group_id
+    owing, settled = date(2026, 8, 25), date(2026, 9, 25)
+    for due in (owing, settled):
+        MonthlyDeadline.objects.create(month=due.replace(day=1), deadline_day=due.day)
+        Penalty.objects.create(
+            user=member, group_id=group_id, penalty_type='LATE_DEPOSIT', amount=Decimal('2000.00'), days_late=1,
+            original_due_date=timezone.make_aware(timezone.datetime(due.year, due.month, due.day)),
+            accrues_from=due, daily_rate=Decimal('500.00'), accrued_through=due + timedelta(days=1),
+        )
+    DeadlineCompliance.objects.create(
+        deadline=MonthlyDeadline.objects.get(month=owing.replace(day=1)), user=member, group_id=group_id,
+        due_date=owing, shares_due=1,
+    )
+
+    calculate_group_penalties(group_id, TODAY)
+
+    rates = dict(Penalty.objects.values_list('accrues_from', 'daily_rate'))
+    assert rates == {owing: Decimal('500.00'), settled: Decimal('0.00')}
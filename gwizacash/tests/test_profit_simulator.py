@@ -0,0 +1,72 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from gwizacash import profit_simulator
+from gwizacash.profit_simulator import Policy, ProfitInputs, WEIGHT_BASES, simulate
+
+np = pytest.importorskip('numpy')
+
+
+def make_inputs(rng, members, available_profit):
+    return ProfitInputs(
+        members=[{'user_id': index, 'username': f'member{index}', 'name': ''} for index in range(members)],
+        committed=[rng.randint(1, 20) for _ in range(members)],
+        paid=[rng.randint(0, 20) for _ in range(members)],
+        share_months=[rng.randint(0, 240) for _ in range(members)],
+        available_profit=available_profit,
+        penalty_profit=Decimal('0'),
+        interest_profit=available_profit,
+    )
+
+
+POLICIES = [Policy(basis, reserve) for basis in WEIGHT_BASES for reserve in (0, 10, 33)]
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_numpy_and_python_allocations_match(seed):
+    rng = random.Random(seed)
+    profit = Decimal(rng.randint(0, 10**11)) / 100
+    inputs = make_inputs(rng, rng.randint(1, 400), profit)
+    cents = [rng.randint(0, 10**11) for _ in POLICIES]
+
+    assert profit_simulator._allocate_numpy(inputs, POLICIES, cents)[0] == \
+        profit_simulator._allocate_python(inputs, POLICIES, cents)[0]
+
+
+# (distributable cents, member weights) that float64 arithmetic floors one cent short
+@pytest.mark.parametrize('cents, weights', [
+    (67975545910, [498]),
+    (95625689334, [11, 11]),
+    (42703800665, [42, 63]),
+    (16951616500, [198, 242]),
+])
+def test_exact_shares_are_not_lost_to_float_rounding(cents, weights):
+    inputs = make_inputs(random.Random(0), len(weights), Decimal('0'))._replace(committed=weights)
+    policies = [Policy('committed', 0)]
+    expected = [cents * weight // sum(weights) for weight in weights]
+
+    assert profit_simulator._allocate_numpy(inputs, policies, [cents])[0] == [expected]
+    assert profit_simulator._allocate_python(inputs, policies, [cents])[0] == [expected]
+
+
+def test_large_products_fall_back_to_exact_integers():
+    inputs = make_inputs(random.Random(1), 3, Decimal('0'))._replace(share_months=[10**9, 3, 7])
+    cents = [10**11] * len(POLICIES)
+
+    assert profit_simulator._allocate_numpy(inputs, POLICIES, cents)[0] == \
+        profit_simulator._allocate_python(inputs, POLICIES, cents)[0]
+
+
+def test_simulate_is_the_same_with_and_without_numpy(monkeypatch):
+    inputs = make_inputs(random.Random(7), 250, Decimal('9876543.21'))
+    with_numpy = simulate(inputs, POLICIES)
+    monkeypatch.setattr(profit_simulator, 'np', None)
+    without_numpy = simulate(inputs, POLICIES)
+
+    for numpy_result, python_result in zip(with_numpy, without_numpy):
+        assert numpy_result['amounts'] == python_result['amounts']
+        assert numpy_result['distributed'] == python_result['distributed']
+        assert numpy_result['remainder'] == python_result['remainder']
+        assert numpy_result['distributed'] + numpy_result['reserve'] + numpy_result['remainder'] == inputs.available_profit
@@ -1,6 +1,6 @@
 # gwizacash/urls.py
 from django.urls import path
-from . import views
+from . import api, metrics, views
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -8,6 +8,7 @@ app_name = 'gwizacash'
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
+    path('dashboard/<slug:name>/', views.dashboard_fragment, name='dashboard_fragment'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('register/', views.register, name='register'),
@@ -34,9 +35,13 @@ urlpatterns = [
     # Coordinator URLs
     path('members/', views.manage_members, name='manage_members'),
     path('members/create/', views.create_member, name='create_member'),
+    path('members/import/', views.bulk_import_members, name='import_members'),
+    path('members/search/', views.member_search, name='member_search'),
     path('members/<int:user_id>/edit/', views.edit_member, name='edit_member'),
     path('members/<int:user_id>/toggle-status/', views.toggle_member_status, name='toggle_member_status'),
     
+    path('coordinator/queues/', views.work_queue_counts, name='work_queue_counts'),
+
     # Transaction history
     path('transactions/', views.transaction_history, name='transaction_history'),
   
@@ -45,11 +50,26 @@ urlpatterns = [
     
     #profits 
     path('profits/distribute/', views.distribute_profits, name='distribute_profits'),
+    path('profits/simulate/', views.profit_simulator, name='profit_simulator'),
+    path('profits/runs/<int:run_id>/continue/', views.continue_distribution_run, name='continue_distribution_run'),
     
     # Penalty URLs
     path('penalty/pay/<int:penalty_id>/', views.pay_penalty, name='pay_penalty'),
     path('penalty/pending-payments/', views.pending_penalty_payments, name='pending_penalty_payments'),
     path('penalty/approve-payment/<int:payment_id>/', views.approve_penalty_payment, name='approve_penalty_payment'),
+
+    # Bank statement reconciliation
+    path('reconciliation/', views.reconcile_statement, name='reconcile_statement'),
+    path('reconciliation/approve/', views.approve_reconciled, name='approve_reconciled'),
+
+    # Read-only JSON API
+    path('api/summary/', api.member_summary, name='api_member_summary'),
+    path('api/loans/', api.member_loans, name='api_member_loans'),
+    path('api/penalties/', api.member_penalties, name='api_member_penalties'),
+    path('api/transactions/', api.member_transactions, name='api_member_transactions'),
+
+    # Staff-only operational metrics
+    path('metrics/db-pool/', metrics.db_pool_metrics, name='metrics_db_pool'),
 ]
 
 if settings.DEBUG:
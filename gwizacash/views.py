@@ -1,7 +1,8 @@
 # Authentication Views
 from datetime import datetime
 from dateutil.relativedelta import relativedelta # type: ignore
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, F, Prefetch, Window
+from django.db.models.functions import Coalesce, RowNumber
 from django.db import models
 from django.utils import timezone
 import logging
@@ -15,20 +16,39 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.db import transaction, IntegrityError
 from functools import wraps
-from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.exceptions import ObjectDoesNotExist, PermissionDenied, ValidationError
 from django.core.paginator import Paginator
 import secrets
+import uuid
 from django.contrib.auth import update_session_auth_hash
 from django.core.mail import send_mail
 from datetime import date, timedelta
 from django.core.management import call_command
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.http import require_POST, require_safe
 from .models import CollectiveFund, PenaltyPayment, ProfitDistributionSummary
+from django.utils.functional import SimpleLazyObject
+from asgiref.sync import sync_to_async
+from . import approvals
+from .cache_versions import group_version
+from .dashboard import FRAGMENTS, load_dashboard, render_fragment
+from .deadlines import add_months, deadline_calendar
+from .distribution import advance_run, start_run
+from .members import MEMBER_SEARCH_LIMIT, allocate_username, managed_profiles, search_members
+from .profit_simulator import (
+    DEFAULT_POLICIES, DISTRIBUTION_MODES, DISTRIBUTION_WEIGHT_FIELDS, MAX_POLICIES, WEIGHT_BASES, Policy,
+    distribution_weight, load_profit_inputs, preview_rows, simulate
+)
+from .onboarding import MAX_IMPORT_ROWS, MEMBER_CSV_COLUMNS, import_members, parse_member_csv
+from .reconciliation import MATCH_WINDOW_DAYS, StatementError, match_statement, parse_statement, pending_candidates
+from .replicas import replica_reads
+from .work_queues import queue_counts, record_transition
 from .forms import PenaltyPaymentForm
 from .forms import ProfileUpdateForm, UserUpdateForm, CustomPasswordChangeForm
 
 from .models import (
-    MonthlyDeadline, UserProfile, Deposit, Loan, LoanPayment, 
-    Transaction, Penalty, ProfitDistribution, MonthlySharePayment
+    DeadlineCompliance, DistributionRun, MonthlyDeadline, UserProfile, Deposit, Loan, LoanInstallment, LoanPayment, 
+    Transaction, Penalty, ProfitDistribution, MonthlySharePayment, retry_on_conflict
 )
 from .forms import (
     UserRegistrationForm, DepositForm, 
@@ -41,6 +61,18 @@ logger = logging.getLogger(__name__)
 ALLOWED_FILE_TYPES = ['pdf', 'jpg', 'jpeg', 'png']
 MAX_UPLOAD_SIZE = 5 * 1024 * 1024  # 5MB
 
+MEMBERS_PAGE_SIZE = 25
+MEMBER_HISTORY_ROWS = 5  # Latest deposits, loans and penalties shown in a member's details
+MEMBER_SORT_ORDERS = {
+    'name': ('user__first_name', 'user__last_name'),
+    'shares': ('-committed_shares',),
+    'balance': ('-remaining_share_balance',),
+    'savings': ('-total_savings',),
+    'loan': ('-outstanding_loan',),
+    'penalties': ('-unpaid_penalties',),
+    'last_deposit': (F('last_deposit_date').desc(nulls_last=True),),
+}
+
 ##cordinator required
 def coordinator_required(view_func):
     def wrapper(request, *args, **kwargs):
@@ -58,6 +90,33 @@ def validate_file(file):
     if ext not in ALLOWED_FILE_TYPES:
         raise ValidationError('Only PDF, JPG, JPEG, and PNG files are allowed')
 
+# NEW: Idempotent form submissions - each form render carries a fresh token
+def submitted_idempotency_key(request):
+    """Token posted back by the form, or None when missing or malformed"""
+    try:
+        return uuid.UUID(request.POST.get('idempotency_key', ''))
+    except ValueError:
+        return None
+
+def replay_submission(request, queryset, key, redirect_to, *args, **kwargs):
+    """Answer a retried POST with the original outcome instead of validating and saving it again"""
+    if key is None or not queryset.filter(idempotency_key=key).exists():
+        return None
+    messages.info(request, 'This form was already submitted, no duplicate was created.')
+    return redirect(redirect_to, *args, **kwargs)
+
+def create_idempotent(manager, key, **fields):
+    """Create the row for a submission token; a concurrent retry gets the existing row back"""
+    try:
+        with transaction.atomic():
+            record = manager.create(idempotency_key=key, **fields)
+            record_transition(record, None, record.status)  # Joins a coordinator queue
+            return record, True
+    except IntegrityError:
+        if key is None:
+            raise
+        return manager.get(idempotency_key=key), False
+
 # Authentication views
 
 def login_view(request):
@@ -171,67 +230,33 @@ def change_password(request):
 # Dashboard view
 
 @login_required
-def dashboard(request):
+async def dashboard(request):
+    user = await request.auser()
+    user_profile = await UserProfile.objects.aget(user=user)
+    today = timezone.localdate()
+
+    # Every independent read is issued at once; see dashboard.load_dashboard
+    data = await load_dashboard(user, user_profile, today)
+    loans, month = data['loans'], data['month']
+    overdue_loans = loans['overdue_loans']
+    loan_penalties = loans['loan_penalties']
 
-    user = request.user
-    user_profile = user.userprofile
-    
-    # Initialize all variables at the start
-    loan_penalties = 0
-    total_penalties = 0
-    overdue_loans = []
-    user_active_loans = []
-    
-    # Get user's deposits and calculate totals
-    user_deposits = Deposit.objects.filter(user=user, status='APPROVED')
-    total_savings = user_profile.total_savings
-    
     # Get user's shares information
+    total_savings = user_profile.total_savings
     committed_shares = user_profile.committed_shares or 0
     paid_shares = user_profile.paid_shares
     share_percentage = (paid_shares / committed_shares * 100) if committed_shares > 0 else 0
-    
-    # FIXED: Get user's active loans - separate APPROVED from truly active loans
-    user_approved_loans = Loan.objects.filter(
-        user=user, 
-        status='APPROVED'  # Waiting for disbursement
-    )
-    
-    user_active_loans = Loan.objects.filter(
-        user=user, 
-        status__in=['DISBURSED', 'ACTIVE']  # Actually active loans
-    ).order_by('due_date')
-    
-    # FIXED: Calculate total loan balance only for disbursed/active loans
-    total_loan_balance = 0
-    for loan in user_active_loans:
-        total_loan_balance += loan.remaining_balance
-    
-    # FIXED: Get overdue loans and calculate penalties - only from active loans
-    overdue_loans = []
-    loan_penalties = 0
-    
-    for loan in user_active_loans:
-        if loan.is_overdue:
-            overdue_loans.append(loan)
-            loan_penalties += loan.calculate_penalty()
-    
-    # Get user penalties (deposit penalties)
-    user_penalties = Penalty.objects.filter(user=user, is_paid=False)
-    deposit_penalties = user_penalties.aggregate(Sum('amount'))['amount__sum'] or 0
-    
+
     # Calculate total penalties (deposit + loan penalties)
+    user_penalties = data['penalties']
+    deposit_penalties = sum(penalty.amount for penalty in user_penalties)
     total_penalties = deposit_penalties + loan_penalties
-    
- 
-    
-    # Current month shares calculation
+
     # Current month shares calculation
-    current_month_date = timezone.now().date().replace(day=1)
-    has_monthly_payment = MonthlySharePayment.objects.filter(
-        user=user,
-        payment_month=current_month_date
-    ).exists()
+    current_month_date = today.replace(day=1)
+    this_month_deadline = data['deadlines'].deadline_for(user_profile.group_id, current_month_date)
+    next_month_deadline = data['deadlines'].deadline_for(user_profile.group_id, add_months(current_month_date, 1))
+    has_monthly_payment = month['has_monthly_payment']
 
     current_month_paid = 1 if has_monthly_payment else 0
     current_month_remaining = 0 if has_monthly_payment else 1
@@ -247,11 +272,11 @@ def dashboard(request):
         urgent_payment = "Unpaid Penalties"
         urgent_type = "PENALTY"
         urgent_amount = total_penalties
-        urgent_date = timezone.now().date()  # Due immediately
+        urgent_date = today  # Due immediately
 
     # 2. Check overdue loans
     elif overdue_loans:
-        most_overdue = max(overdue_loans, key=lambda x: x.days_overdue)
+        most_overdue = overdue_loans[0]
         urgent_payment = f"Overdue Loan Payment"
         urgent_type = "OVERDUE_LOAN"
         urgent_amount = most_overdue.remaining_balance
@@ -262,143 +287,50 @@ def dashboard(request):
         urgent_payment = "Monthly Deposit"
         urgent_type = "MONTHLY_DEPOSIT"
         urgent_amount = user_profile.committed_shares * user_profile.share_value
-        urgent_date = timezone.now().date().replace(day=10)  # 10th of current month
+        urgent_date = this_month_deadline
 
     # 4. Check upcoming loan payments this month
+    elif month['upcoming_installment']:
+        upcoming_installment = month['upcoming_installment']
+        urgent_payment = f"Loan Payment Due"
+        urgent_type = "UPCOMING_LOAN"
+        urgent_amount = upcoming_installment.remaining_amount
+        urgent_date = upcoming_installment.due_date.date()
     else:
-        # Check for loans due this month
-        current_month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        current_month_end = (current_month_start + timedelta(days=32)).replace(day=1) - timedelta(seconds=1)
-        
-        upcoming_loan = user_active_loans.filter(
-            due_date__range=[current_month_start, current_month_end]
-        ).first()
-        
-        if upcoming_loan:
-            urgent_payment = f"Loan Payment Due"
-            urgent_type = "UPCOMING_LOAN"
-            urgent_amount = upcoming_loan.remaining_balance
-            urgent_date = upcoming_loan.due_date.date() if upcoming_loan.due_date else None
-        else:
-            # Show next month's payment
-            next_month = timezone.now().date().replace(day=1) + timedelta(days=32)
-            next_month = next_month.replace(day=10)
-            urgent_payment = "Next Monthly Payment"
-            urgent_type = "NEXT_PAYMENT"
-            urgent_amount = user_profile.committed_shares * user_profile.share_value
-            urgent_date = next_month
-
+        # Show next month's payment
+        urgent_payment = "Next Monthly Payment"
+        urgent_type = "NEXT_PAYMENT"
+        urgent_amount = user_profile.committed_shares * user_profile.share_value
+        urgent_date = next_month_deadline
 
     # Next payment due date
     next_payment_due = None
     if has_monthly_payment:  # If current month is paid
-        next_month = timezone.now().date().replace(day=1) + timedelta(days=32)
-        next_month = next_month.replace(day=10)  # 10th of next month
-        next_payment_due = next_month
+        next_payment_due = next_month_deadline
 
+    # Shares still owed for past deadlines, from the member's open compliance snapshots
+    member_arrears = data['arrears']
+    member_arrears_shares = sum(compliance.shares_owed for compliance in member_arrears)
 
-    
-    # Recent deposits
-    recent_deposits = user_deposits.order_by('-date')[:5]
-    
-    # Recent transactions - FIXED
-    recent_transactions = []
-    try:
-        recent_transactions = Transaction.objects.filter(
-            user=user
-        ).order_by('-date')[:10]
-    except:
-        recent_transactions = []
-    
-    # Recent profit distributions
-    recent_distributions = []
-    try:
-        recent_distributions = ProfitDistribution.objects.filter(
-            user=user
-        ).order_by('-distribution_date')[:5]
-    except:
-        recent_distributions = []
-
-        
-    # FIXED: Group financials - only count disbursed/active loans
-    collective_fund = CollectiveFund.get_fund()
-    collective_fund.update_totals()
-    
-    group_savings = Deposit.objects.filter(status='APPROVED').aggregate(Sum('amount'))['amount__sum'] or 0
-    group_loans = Loan.objects.filter(
-        status__in=['DISBURSED', 'ACTIVE']
-    ).aggregate(Sum('amount'))['amount__sum'] or 0
-    group_distributions = 0  # Calculate based on your profit distribution logic
-    
-    # Get collective fund
-    collective_fund = None
-    try:
-        collective_fund = CollectiveFund.get_fund()
-        collective_fund.update_totals()
-    except:
-        pass
-    
-    # Coordinator-specific data
-    if user_profile.user_type == 'COORDINATOR':
-        total_members = User.objects.filter(userprofile__isnull=False).count()
-        members_only = User.objects.filter(userprofile__user_type='MEMBER').count()
-        coordinators = User.objects.filter(userprofile__user_type='COORDINATOR').count()
-        
-        system_total_savings = group_savings
-        pending_deposits_count = Deposit.objects.filter(status='PENDING').count()
-        
-        # FIXED: Loan management stats with proper status handling
-        pending_loan_requests = Loan.objects.filter(status='REQUESTED').count()
-        approved_loans_count = Loan.objects.filter(status='APPROVED').count()  # Ready for disbursement
-        active_loans_count = Loan.objects.filter(status__in=['DISBURSED', 'ACTIVE']).count()
-        
-        # Fixed: Get pending payments count
-        try:
-            pending_payments_count = LoanPayment.objects.filter(status='PENDING').count()
-        except:
-            pending_payments_count = 0
-        
-        # FIXED: Members with overdue payments (both deposits and loans)
-        members_with_overdue_loans = Loan.objects.filter(
-            status__in=['DISBURSED', 'ACTIVE'],
-            due_date__lt=timezone.now().date()
-        ).values('user').distinct().count()
-        
-        # You can add deposit overdue logic here too
-        members_with_overdue_payments = members_with_overdue_loans
-        
-        total_system_shares = User.objects.filter(
-            userprofile__isnull=False
-        ).aggregate(
-            total=Sum('userprofile__committed_shares')
-        )['total'] or 0
-    else:
-        # Set default values for non-coordinators
-        total_members = members_only = coordinators = 0
-        system_total_savings = pending_deposits_count = 0
-        pending_loan_requests = approved_loans_count = active_loans_count = 0
-        pending_payments_count = members_with_overdue_payments = 0
-        total_system_shares = 0
-    
     context = {
         # User info
         'user_type': user_profile.get_user_type_display(),
-        
+
         # Financial summary
         'total_savings': total_savings,
         'paid_shares': paid_shares,
         'committed_shares': committed_shares,
         'share_percentage': round(share_percentage, 1),
-        'total_loan_balance': total_loan_balance,
+        'total_loan_balance': loans['total_loan_balance'],
         'total_penalties': total_penalties,
         'loan_penalties': loan_penalties,
         'next_payment_due': next_payment_due,
-        
+
         # FIXED: Loans - separate approved from active
-        'user_approved_loans': user_approved_loans,  # NEW: Loans waiting for disbursement
-        'user_active_loans': user_active_loans,      # Only disbursed/active loans
+        'user_approved_loans': loans['approved_loans'],  # NEW: Loans waiting for disbursement
+        'user_active_loans': loans['active_loans'],      # Only disbursed/active loans
         'overdue_loans': overdue_loans,
-        
+
         # Monthly payment info
         'urgent_payment': urgent_payment,
         'urgent_type' : urgent_type,
@@ -407,36 +339,31 @@ def dashboard(request):
         'has_monthly_payment': has_monthly_payment,
         'current_month_paid': current_month_paid,
         'current_month_remaining': current_month_remaining,
-        
+        'member_arrears': member_arrears,
+        'member_arrears_shares': member_arrears_shares,
+
         # Penalties
         'user_penalties': user_penalties,
-        
-        # Recent activity
-        'recent_deposits': recent_deposits,
-        'recent_transactions': recent_transactions,
-        'recent_distributions': recent_distributions,
-        
-        # Group financials
-        'group_savings': group_savings,
-        'group_loans': group_loans,
-        'group_distributions': group_distributions,
-        'collective_fund': collective_fund,
-        
-        # Coordinator data
-        'total_members': total_members,
-        'members_only': members_only,
-        'coordinators': coordinators,
-        'system_total_savings': system_total_savings,
-        'pending_deposits_count': pending_deposits_count,
-        'pending_loan_requests': pending_loan_requests,
-        'approved_loans_count': approved_loans_count,
-        'active_loans_count': active_loans_count,
-        'pending_payments_count': pending_payments_count,
-        'members_with_overdue_payments': members_with_overdue_payments,
-        'total_system_shares': total_system_shares,
+
+        # Recent activity, group financials and coordinator queues load as separate fragments
+        'is_coordinator': user_profile.user_type == 'COORDINATOR',
     }
-    
-    return render(request, 'gwizacash/dashboard.html', context)
+
+    # Rendering may still query (the request's user, messages), so it runs in a sync thread
+    return await sync_to_async(render)(request, 'gwizacash/dashboard.html', context)
+
+
+@login_required
+@require_safe
+def dashboard_fragment(request, name):
+    """One lazily loaded dashboard panel, served from its own cache entry"""
+    fragment = FRAGMENTS.get(name)
+    if fragment is None:
+        raise Http404('No such dashboard section')
+    user_profile = request.user.userprofile
+    if fragment.coordinator_only and user_profile.user_type != 'COORDINATOR':
+        raise PermissionDenied
+    return HttpResponse(render_fragment(request, fragment, user_profile))
 
 # Member management views
 # UPDATED: Secure password generation and email
@@ -465,13 +392,7 @@ def create_member(request):
             total_commitment = committed_shares * SHARE_VALUE
             
             full_name = f"{first_name} {last_name}"
-            username = f"{first_name.lower()}_{last_name.lower()}"
-            
-            if User.objects.filter(username=username).exists():
-                count = 1
-                while User.objects.filter(username=f"{username}_{count}").exists():
-                    count += 1
-                username = f"{username}_{count}"
+            username = allocate_username(f"{first_name.lower()}_{last_name.lower()}")
             
             password = secrets.token_urlsafe(12)  # Random password
             
@@ -487,12 +408,11 @@ def create_member(request):
                 profile = user.userprofile
                 profile.user_type = 'MEMBER'
                 profile.coordinator = request.user.userprofile
+                profile.group = request.user.userprofile.group
                 profile.phone = phone
                 profile.committed_shares = committed_shares
                 profile.share_value = SHARE_VALUE
-                profile.total_commitment = total_commitment
-                profile.remaining_share_balance = total_commitment
-                profile.save()
+                profile.save()  # Share totals are derived from committed_shares/share_value
                 
                 # Send email with credentials
                 if email:
@@ -537,38 +457,111 @@ def create_member(request):
     
     return render(request, 'gwizacash/create_member.html', {'share_value': SHARE_VALUE})
 
+def latest_per_user(queryset, latest_first):
+    """Each user's MEMBER_HISTORY_ROWS newest rows, numbered per user so no one's full history is loaded"""
+    ordering = (latest_first, '-pk')
+    return queryset.annotate(
+        history_row=Window(RowNumber(), partition_by=F('user'), order_by=ordering)
+    ).filter(history_row__lte=MEMBER_HISTORY_ROWS).order_by(*ordering)
+
 @login_required
 @coordinator_required
 def manage_members(request):
-    assigned_users = UserProfile.objects.filter(
-        coordinator=request.user.userprofile
-    ).select_related('user')
-    
     current_coordinator = request.user.userprofile
-    all_users = list(assigned_users) + [current_coordinator]
-    
-    members_count = assigned_users.filter(user_type='MEMBER').count()
-    coordinators_count = assigned_users.filter(user_type='COORDINATOR').count() + 1
-    
-    total_members = len(all_users)
-    total_committed_shares = sum(user.committed_shares for user in all_users)
-    total_commitment_amount = sum(user.total_commitment for user in all_users)
-    total_paid_shares = sum(user.paid_shares for user in all_users)
-    total_remaining_balance = sum(user.remaining_share_balance for user in all_users)
+    # The coordinator's own profile is listed alongside the members they manage
+    profiles = managed_profiles(current_coordinator)
+
+    # Group totals in one aggregate query
+    totals = profiles.aggregate(
+        total_members=Count('id'),
+        members_count=Count('id', filter=Q(user_type='MEMBER')),
+        coordinators_count=Count('id', filter=Q(user_type='COORDINATOR')),
+        total_committed_shares=Coalesce(Sum('committed_shares'), 0),
+        total_commitment_amount=Coalesce(Sum('total_commitment'), Decimal('0')),
+        total_paid_shares=Coalesce(Sum('paid_shares'), 0),
+        total_remaining_balance=Coalesce(Sum('remaining_share_balance'), Decimal('0')),
+    )
+
+    # Server-side search, status filter and sorting for the member table
+    search = request.GET.get('search', '').strip()
+    if search:
+        profiles = search_members(current_coordinator, search)
+    status = request.GET.get('status')
+    if status in ('active', 'inactive'):
+        profiles = profiles.filter(user__is_active=(status == 'active'))
+    ordering = MEMBER_SORT_ORDERS.get(request.GET.get('sort'), MEMBER_SORT_ORDERS['name'])
+
+    members_page = profiles.with_ledger().select_related('user').prefetch_related(
+        Prefetch('user__deposit_set', queryset=latest_per_user(Deposit.objects.all(), '-date')),
+        Prefetch('user__loan_set', queryset=latest_per_user(Loan.objects.all(), '-request_date')),
+        Prefetch('user__penalty_set', queryset=latest_per_user(Penalty.objects.all(), '-date')),
+    ).order_by(*ordering, 'pk')
+
+    # Only query the requested page, and only when the table fragment isn't cached
+    members = SimpleLazyObject(
+        lambda: Paginator(members_page, MEMBERS_PAGE_SIZE).get_page(request.GET.get('page'))
+    )
+    filter_query = request.GET.copy()
+    filter_query.pop('page', None)
     
     context = {
-        'members': all_users,
-        'total_members': total_members,
-        'members_count': members_count,
-        'coordinators_count': coordinators_count,
-        'total_committed_shares': total_committed_shares,
-        'total_commitment_amount': total_commitment_amount,
-        'total_paid_shares': total_paid_shares,
-        'total_remaining_balance': total_remaining_balance,
+        'members': members,
+        **totals,
+        'filter_query': filter_query.urlencode(),
+        'group_version': group_version(current_coordinator.group_id),
     }
     
     return render(request, 'gwizacash/manage_members.html', context)
 
+@login_required
+@coordinator_required
+def bulk_import_members(request):
+    context = {'columns': MEMBER_CSV_COLUMNS, 'max_rows': MAX_IMPORT_ROWS}
+    if request.method == 'POST':
+        csv_file = request.FILES.get('csv_file')
+        if not csv_file:
+            messages.error(request, 'Choose a CSV file to import')
+            return redirect('gwizacash:import_members')
+        if csv_file.size > MAX_UPLOAD_SIZE:
+            messages.error(request, 'File size exceeds 5MB')
+            return redirect('gwizacash:import_members')
+
+        try:
+            rows, errors = parse_member_csv(csv_file.read().decode('utf-8-sig').splitlines())
+        except UnicodeDecodeError:
+            rows, errors = [], ['The file must be a UTF-8 encoded CSV']
+        if errors:
+            for error in errors[:20]:
+                messages.error(request, error)
+            if len(errors) > 20:
+                messages.error(request, f'...and {len(errors) - 20} more problems')
+            messages.warning(request, 'Nothing was imported. Fix the file and upload it again.')
+            return redirect('gwizacash:import_members')
+
+        context['created'] = import_members(request.user.userprofile, rows)
+        messages.success(request, f"Imported {len(context['created'])} members")
+    return render(request, 'gwizacash/import_members.html', context)
+
+@require_safe
+@login_required
+@coordinator_required
+def member_search(request):
+    """Best matches for the member search box, as JSON"""
+    query = request.GET.get('q', '').strip()
+    matches = search_members(request.user.userprofile, query).select_related('user')[:MEMBER_SEARCH_LIMIT]
+    results = [
+        {
+            'user_id': profile.user_id,
+            'name': profile.user.get_full_name(),
+            'username': profile.user.username,
+            'phone': profile.phone,
+            'user_type': profile.user_type,
+            'is_active': profile.user.is_active,
+        }
+        for profile in matches
+    ]
+    return JsonResponse({'query': query, 'results': results})
+
 @login_required
 @coordinator_required
 def edit_member(request, user_id):
@@ -614,8 +607,13 @@ def toggle_member_status(request, user_id):
 # Deposit views
 @login_required
 def create_deposit(request):
+    idempotency_key = submitted_idempotency_key(request)
+    replay = replay_submission(request, Deposit.objects.filter(user=request.user), idempotency_key, 'gwizacash:dashboard')
+    if replay:
+        return replay
+
     user_profile = request.user.userprofile
-    remaining_shares = user_profile.committed_shares - user_profile.paid_shares
+    remaining_shares = user_profile.remaining_shares
     expected_amount = user_profile.remaining_share_balance.quantize(Decimal('0.01'))
    ##added and not tested for not multideposit
     if Deposit.objects.filter(user=request.user, status='PENDING').exists():
@@ -634,13 +632,16 @@ def create_deposit(request):
                 if amount != expected_amount:
                     messages.error(request, f"You must deposit exactly {expected_amount:,.2f} RWF based on your committed shares.")
                 else:
-                    Deposit.objects.create(
+                    deposit, created = create_idempotent(
+                        Deposit.objects,
+                        idempotency_key,
                         user=request.user,
                         amount=amount,
                         bank_slip=bank_slip,
                         status='PENDING'
                     )
-                    messages.success(request, 'Deposit submitted successfully and is pending approval')
+                    if created:
+                        messages.success(request, 'Deposit submitted successfully and is pending approval')
                     return redirect('gwizacash:dashboard')
             except ValidationError as e:
                 messages.error(request, str(e))
@@ -651,32 +652,26 @@ def create_deposit(request):
 
     context = {
         'remaining_shares': remaining_shares,
-        'max_deposit': expected_amount
+        'max_deposit': expected_amount,
+        'idempotency_key': uuid.uuid4(),
     }
 
     return render(request, 'gwizacash/create_deposit.html', context)
 
 @login_required
 def pending_deposits(request):
-    print(f"Current user: {request.user.username}")
-    print(f"User type: {request.user.userprofile.user_type}")
-    
     if request.user.userprofile.user_type != 'COORDINATOR':
         messages.error(request, 'You do not have permission to access this page')
         return redirect('gwizacash:dashboard')
     
-    pending_deposits = Deposit.objects.filter(status='PENDING').order_by('-date')
-    print(f"Found {pending_deposits.count()} pending deposits")
-    
-    for deposit in pending_deposits:
-        print(f"Deposit: {deposit.id}, User: {deposit.user.username}, Amount: {deposit.amount}")
+    pending_deposits = Deposit.objects.filter(
+        group=request.user.userprofile.group, status='PENDING'
+    ).select_related('user').order_by('-date')
     
     paginator = Paginator(pending_deposits, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    print(f"Page obj has {len(page_obj)} items")
-    
     context = {
         'page_obj': page_obj
     }
@@ -689,48 +684,19 @@ def approve_deposit(request, deposit_id):
         messages.error(request, 'You do not have permission to perform this action')
         return redirect('gwizacash:pending_deposits')
     
+    def approve():
+        deposit = get_object_or_404(
+            Deposit, id=deposit_id, status='PENDING', group=request.user.userprofile.group
+        )
+        return approvals.approve_deposit(deposit, request.user)
+
     if request.method == 'POST':
         try:
-            with transaction.atomic():
-                deposit = get_object_or_404(Deposit.objects.select_for_update(), id=deposit_id, status='PENDING')
-                user_profile = UserProfile.objects.select_for_update().get(user=deposit.user)
-                
-                # Calculate shares based on remaining balance
-                remaining_shares = user_profile.committed_shares - user_profile.paid_shares
-                
-                # Approve the deposit    
-                deposit.status = 'APPROVED'
-                deposit.approved_by = request.user
-                deposit.approval_date = timezone.now()
-                deposit.save()
-                
-                # Update user profile - add ALL remaining shares since amount equals remaining balance
-                user_profile.paid_shares += remaining_shares
-                user_profile.total_savings += deposit.amount
-                user_profile.save()  # This will recalculate remaining_share_balance to 0
-
-                payment_month = timezone.now().date().replace(day=1)
-                MonthlySharePayment.objects.create(
-                    user=deposit.user,
-                    payment_month=payment_month,
-                    shares_paid=remaining_shares,
-                    amount_paid=deposit.amount,
-                    deposit=deposit
-                )
+            deposit = retry_on_conflict(approve)
+            messages.success(request, f'Deposit of {deposit.amount:,.2f} RWF approved and recorded')
 
-                Transaction.objects.create(
-                    user=deposit.user,
-                    transaction_type='DEPOSIT',
-                    amount=deposit.amount,
-                    status='COMPLETED',
-                    reference_id=f'DEP-{deposit.id}',
-               
-                )
-
-                messages.success(request, f'Deposit of {deposit.amount:,.2f} RWF approved and recorded')
-
-        except Deposit.DoesNotExist:
-            messages.error(request, 'Deposit not found or already processed')
+        except ValidationError as e:
+            messages.error(request, e.message)
         except Exception as e:
             messages.error(request, f'Error approving deposit: {str(e)}')
 
@@ -746,13 +712,16 @@ def reject_deposit(request, deposit_id):
         rejection_reason = request.POST.get('rejection_reason', '')
         
         try:
-            deposit = Deposit.objects.get(id=deposit_id, status='PENDING')
-            
-            deposit.status = 'REJECTED'
-            deposit.rejection_reason = rejection_reason
-            deposit.rejected_by = request.user
-            deposit.rejection_date = timezone.now()
-            deposit.save()
+            with transaction.atomic():
+                deposit = Deposit.objects.select_for_update().get(
+                    id=deposit_id, status='PENDING', group=request.user.userprofile.group
+                )
+                deposit.status = 'REJECTED'
+                deposit.rejection_reason = rejection_reason
+                deposit.rejected_by = request.user
+                deposit.rejection_date = timezone.now()
+                deposit.save()
+                record_transition(deposit, 'PENDING', 'REJECTED')
             
             messages.success(request, f'Deposit of {deposit.amount:,.2f} RWF has been rejected')
         except Deposit.DoesNotExist:
@@ -764,6 +733,12 @@ def reject_deposit(request, deposit_id):
 
 @login_required
 def request_loan(request):
+    # A retried submission of an already accepted form goes straight to the result
+    idempotency_key = submitted_idempotency_key(request)
+    replay = replay_submission(request, Loan.objects.filter(user=request.user), idempotency_key, 'gwizacash:my_loans')
+    if replay:
+        return replay
+
     # Check if user has any active, pending, or approved loans FIRST
     existing_loans = Loan.objects.filter(
         user=request.user,
@@ -838,8 +813,11 @@ def request_loan(request):
         due_date = timezone.now() + timedelta(days=duration * 30)
         
         # Create the loan
-        loan = Loan.objects.create(
+        loan, created = create_idempotent(
+            Loan.objects,
+            idempotency_key,
             user=request.user,
+            group=request.user.userprofile.group,
             amount=amount,
             duration=duration,
             interest_rate=interest_rate * 100,  # Store as percentage
@@ -851,12 +829,13 @@ def request_loan(request):
             due_date=due_date
         )
         
-        messages.success(
-            request, 
-            f'Loan request for {amount:,.0f} RWF submitted successfully. '
-            f'Total amount to repay: {total_amount:,.0f} RWF over {duration} months. '
-            f'You will be notified once it is reviewed.'
-        )
+        if created:
+            messages.success(
+                request, 
+                f'Loan request for {amount:,.0f} RWF submitted successfully. '
+                f'Total amount to repay: {total_amount:,.0f} RWF over {duration} months. '
+                f'You will be notified once it is reviewed.'
+            )
         return redirect('gwizacash:my_loans')  # Better to redirect to loans page
     
     # GET request - show the form
@@ -869,6 +848,7 @@ def request_loan(request):
     
     context = {
         'max_loan_amount': max_loan_amount,
+        'idempotency_key': uuid.uuid4(),
     }
     
     return render(request, 'gwizacash/request_loan.html', context)
@@ -877,7 +857,9 @@ def request_loan(request):
 @login_required
 @coordinator_required
 def pending_loans(request):
-    loans = Loan.objects.filter(status='REQUESTED').select_related('user', 'user__userprofile')
+    loans = Loan.objects.filter(
+        group=request.user.userprofile.group, status='REQUESTED'
+    ).select_related('user', 'user__userprofile')
     paginator = Paginator(loans, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
@@ -939,7 +921,7 @@ def pending_payments(request):
     
     pending_payments = LoanPayment.objects.filter(
         status='PENDING',
-        loan__user__userprofile__coordinator=request.user.userprofile
+        loan__group=request.user.userprofile.group
     ).select_related('loan', 'loan__user')
     
     paginator = Paginator(pending_payments, 10)
@@ -957,25 +939,29 @@ def approve_loan(request, loan_id):
     loan = get_object_or_404(
         Loan,
         id=loan_id,
-        status='REQUESTED'
+        status='REQUESTED',
+        group=request.user.userprofile.group
     )
     
     if request.method == 'POST':
         action = request.POST.get('action')
         
-        with transaction.atomic():
+        def decide():
+            # Re-read on every attempt so a retry sees another coordinator's decision
+            loan = get_object_or_404(Loan, id=loan_id, status='REQUESTED', group=request.user.userprofile.group)
+
             if action == 'approve':
                 # Check if collective fund has enough money
-                collective_fund = CollectiveFund.get_fund()
+                collective_fund = CollectiveFund.get_fund(loan.group)
                 collective_fund.update_totals()
                 
                 if loan.amount > collective_fund.available_amount:
-                    messages.error(request, f'Insufficient funds in collective pool. Available: {collective_fund.available_amount:,.2f} RWF')
-                    return redirect('gwizacash:pending_loans')
+                    raise ValidationError(f'Insufficient funds in collective pool. Available: {collective_fund.available_amount:,.2f} RWF')
                 
                 loan.status = 'APPROVED'
                 loan.approved_by = request.user
                 loan.save()  # This will set approval_date automatically
+                record_transition(loan, 'REQUESTED', 'APPROVED')
                 
                 # Create transaction record
                 Transaction.objects.create(
@@ -987,12 +973,13 @@ def approve_loan(request, loan_id):
                     description=f'Loan of {loan.amount:,.2f} RWF approved for {loan.duration} months (Interest: {loan.interest_amount:,.2f} RWF)'
                 )
                 
-                messages.success(request, f'Loan approved! Amount: {loan.amount:,.2f} RWF, Interest: {loan.interest_amount:,.2f} RWF, Total: {loan.total_amount:,.2f} RWF')
+                return f'Loan approved! Amount: {loan.amount:,.2f} RWF, Interest: {loan.interest_amount:,.2f} RWF, Total: {loan.total_amount:,.2f} RWF'
                 
             elif action == 'reject':
                 rejection_reason = request.POST.get('rejection_reason', '')
                 loan.status = 'REJECTED'
                 loan.save()
+                record_transition(loan, 'REQUESTED', 'REJECTED')
                 
                 # Create transaction record
                 Transaction.objects.create(
@@ -1004,7 +991,14 @@ def approve_loan(request, loan_id):
                     description=f'Loan request of {loan.amount:,.2f} RWF rejected. Reason: {rejection_reason}'
                 )
                 
-                messages.success(request, 'Loan request rejected')
+                return 'Loan request rejected'
+
+        try:
+            result = retry_on_conflict(decide)
+            if result:
+                messages.success(request, result)
+        except ValidationError as e:
+            messages.error(request, e.message)
     
     return redirect('gwizacash:pending_loans')
 
@@ -1012,35 +1006,45 @@ def approve_loan(request, loan_id):
 @coordinator_required
 def disburse_loan(request, loan_id):
     """Disburse an approved loan"""
-    loan = get_object_or_404(Loan, id=loan_id)
+    loan = get_object_or_404(Loan, id=loan_id, group=request.user.userprofile.group)
     
-    if request.method == 'POST':
+    def disburse():
+        # Re-read on every attempt so a retry sees a concurrent disbursement
+        loan = Loan.objects.select_related('user').get(pk=loan_id)
         if loan.status != 'APPROVED':
-            messages.error(request, 'Only approved loans can be disbursed.')
-            return redirect('gwizacash:loan_management')
+            raise ValidationError('Only approved loans can be disbursed.')
+
+        # Update loan status to DISBURSED
+        loan.status = 'DISBURSED'
+        loan.disbursement_date = timezone.now()
+        loan.due_date = loan.disbursement_date + timedelta(days=loan.duration * 30)
+        loan.save()
+        record_transition(loan, 'APPROVED', 'DISBURSED')
+
+        # Monthly repayment schedule, used for overdue and "due this month" lookups
+        loan.create_installments()
         
+        # Create transaction record for disbursement
+        Transaction.objects.create(
+            user=loan.user,
+            transaction_type='LOAN_DISBURSEMENT',
+            amount=loan.amount,
+            description=f'Loan disbursement for Loan #{loan.id}',
+            date=timezone.now().date(),
+            status='COMPLETED'
+        )
+        return loan
+
+    if request.method == 'POST':
         try:
-            # Update loan status to DISBURSED
-            loan.status = 'DISBURSED'
-            loan.disbursement_date = timezone.now().date()
-            loan.due_date = timezone.now().date() + timedelta(days=loan.duration * 30)
-            loan.save()
-            
-            # Create transaction record for disbursement
-            Transaction.objects.create(
-                user=loan.user,
-                transaction_type='LOAN_DISBURSEMENT',
-                amount=loan.amount,
-                description=f'Loan disbursement for Loan #{loan.id}',
-                date=timezone.now().date(),
-                status='COMPLETED'
-            )
-            
+            loan = retry_on_conflict(disburse)
             messages.success(
                 request, 
                 f'Loan #{loan.id} of {loan.amount:,.0f} RWF has been successfully disbursed to {loan.user.get_full_name() or loan.user.username}.'
             )
             
+        except ValidationError as e:
+            messages.error(request, e.message)
         except Exception as e:
             messages.error(request, f'Error disbursing loan: {str(e)}')
     
@@ -1051,8 +1055,9 @@ def disburse_loan(request, loan_id):
 @coordinator_required
 def approved_loans(request):
     """View to show approved loans ready for disbursement"""
+    group = request.user.userprofile.group
     loans = Loan.objects.filter(
-        status='APPROVED'
+        group=group, status='APPROVED'
     ).select_related('user', 'user__userprofile').order_by('-approval_date')
     
     paginator = Paginator(loans, 10)
@@ -1061,7 +1066,7 @@ def approved_loans(request):
     
     context = {
         'page_obj': page_obj,
-        'collective_fund': CollectiveFund.get_fund()
+        'collective_fund': CollectiveFund.get_fund(group)
     }
     return render(request, 'gwizacash/approved_loans.html', context)
 
@@ -1069,22 +1074,17 @@ def approved_loans(request):
 @coordinator_required
 def active_loans(request):
     """View to show active loans and overdue loans"""
-    for loan in overdue_loans:
-        if loan.is_overdue:
-            pass
-
-    active_loans = Loan.objects.filter(
-        status__in=['DISBURSED', 'ACTIVE']
-    ).select_related('user', 'user__userprofile').order_by('due_date')
+    group = request.user.userprofile.group
+    active_loans = Loan.objects.filter(group=group).select_related('user', 'user__userprofile').order_by('due_date')
     
     # Separate overdue loans
-    overdue_loans = [loan for loan in active_loans if loan.is_overdue]
-    current_loans = [loan for loan in active_loans if not loan.is_overdue]
+    overdue_loans = active_loans.overdue()
+    current_loans = active_loans.current()
     
     context = {
         'current_loans': current_loans,
         'overdue_loans': overdue_loans,
-        'collective_fund': CollectiveFund.get_fund()
+        'collective_fund': CollectiveFund.get_fund(group)
     }
     return render(request, 'gwizacash/active_loans.html', context)
 
@@ -1092,48 +1092,22 @@ def active_loans(request):
 @coordinator_required
 def approve_loan_payment(request, payment_id):
     """Approve a loan payment"""
-    payment = get_object_or_404(LoanPayment, id=payment_id)
+    payment = get_object_or_404(LoanPayment, id=payment_id, loan__group=request.user.userprofile.group)
     
+    def approve():
+        return approvals.approve_loan_payment(payment, request.user)
+
     if request.method == 'POST':
-        if payment.status != 'PENDING':
-            messages.error(request, 'Only pending payments can be approved.')
-            return redirect('gwizacash:loan_management')
-        
         try:
-            # Update payment status
-            payment.status = 'APPROVED'
-            payment.approved_by = request.user
-            payment.approval_date = timezone.now().date()
-            payment.save()
-            
-            # Update loan balance
-            loan = payment.loan
-            loan.remaining_balance -= payment.amount
-            
-            # Check if loan is fully paid
-            if loan.remaining_balance <= 0:
-                loan.status = 'REPAID'
-                loan.completion_date = timezone.now().date()
-                loan.remaining_balance = 0  # Ensure it's exactly 0
-            
-            loan.save()
-            
-            # Create transaction record
-            Transaction.objects.create(
-                user=loan.user,
-                transaction_type='LOAN_PAYMENT',
-                amount=payment.amount,
-                description=f'Loan payment for Loan #{loan.id}',
-                date=payment.payment_date,
-                status='COMPLETED'
-            )
-            
+            loan = retry_on_conflict(approve)
             messages.success(
                 request, 
                 f'Payment of {payment.amount:,.0f} RWF for Loan #{loan.id} has been approved. '
                 f'Remaining balance: {loan.remaining_balance:,.0f} RWF.'
             )
             
+        except ValidationError as e:
+            messages.error(request, e.message)
         except Exception as e:
             messages.error(request, f'Error approving payment: {str(e)}')
     
@@ -1144,18 +1118,27 @@ def approve_loan_payment(request, payment_id):
 @coordinator_required
 def loan_management(request):
     """Combined view for all loan management tasks"""
-    # Get all loan data
-    pending_loans = Loan.objects.filter(status='REQUESTED').select_related('user', 'user__userprofile')
-    approved_loans = Loan.objects.filter(status='APPROVED').select_related('user', 'user__userprofile')
-    active_loans = Loan.objects.filter(status__in=['DISBURSED', 'ACTIVE']).select_related('user', 'user__userprofile')
-    pending_payments = LoanPayment.objects.filter(status='PENDING').select_related('loan', 'loan__user')
+    # Get all loan data for the coordinator's group
+    group = request.user.userprofile.group
+    group_loans = Loan.objects.filter(group=group)
+    pending_loans = group_loans.filter(status='REQUESTED').select_related('user', 'user__userprofile')
+    approved_loans = group_loans.filter(status='APPROVED').select_related('user', 'user__userprofile')
+    active_loans = group_loans.outstanding().select_related('user', 'user__userprofile')
+    pending_payments = LoanPayment.objects.filter(
+        loan__group=group, status='PENDING'
+    ).select_related('loan', 'loan__user')
     
-    # Separate overdue loans
-    overdue_loans = [loan for loan in active_loans if loan.is_overdue]
-    current_loans = [loan for loan in active_loans if not loan.is_overdue]
+    # Separate overdue loans in SQL and only load the requested page of each,
+    # lazily so a cached "active loans" fragment skips the queries entirely
+    overdue_loans = SimpleLazyObject(lambda: Paginator(
+        active_loans.overdue().order_by('-days_overdue', 'id'), 10
+    ).get_page(request.GET.get('overdue_page')))
+    current_loans = SimpleLazyObject(lambda: Paginator(
+        active_loans.current().order_by('due_date', 'id'), 10
+    ).get_page(request.GET.get('current_page')))
     
     # Get collective fund info
-    collective_fund = CollectiveFund.get_fund()
+    collective_fund = CollectiveFund.get_fund(group)
     collective_fund.update_totals()
     
     context = {
@@ -1166,18 +1149,27 @@ def loan_management(request):
         'overdue_loans': overdue_loans,
         'pending_payments': pending_payments,
         'collective_fund': collective_fund,
+        'group_id': group.pk if group else None,
+        'group_version': group_version(group.pk if group else None),
+        'today': timezone.localdate(),
     }
     return render(request, 'gwizacash/loan_management.html', context)
 
 @login_required
 def pay_loan(request, loan_id):
     """Improved loan payment processing with proper status transitions"""
+    idempotency_key = submitted_idempotency_key(request)
+    replay = replay_submission(
+        request, LoanPayment.objects.filter(loan_id=loan_id, loan__user=request.user), idempotency_key, 'gwizacash:my_loans'
+    )
+    if replay:
+        return replay
+
     # Fetch loan with validation
     loan = get_object_or_404(
-        Loan,
+        Loan.objects.outstanding().with_overdue_info(),
         id=loan_id,
-        user=request.user,
-        status__in=['DISBURSED', 'ACTIVE']
+        user=request.user
     )
     
     # Get payment history
@@ -1210,12 +1202,16 @@ def pay_loan(request, loan_id):
             # Process payment
             with transaction.atomic():
                 # Create payment record
-                payment = LoanPayment.objects.create(
+                payment, created = create_idempotent(
+                    LoanPayment.objects,
+                    idempotency_key,
                     loan=loan,
                     amount=amount,
                     bank_slip=bank_slip,
                     status='PENDING'
                 )
+                if not created:
+                    return redirect('gwizacash:my_loans')
                 
                 # Create transaction record
                 Transaction.objects.create(
@@ -1227,10 +1223,12 @@ def pay_loan(request, loan_id):
                     description=f'Loan payment of {amount:,.2f} RWF for loan #{loan.id}'
                 )
                 
-                # Update loan status to ACTIVE if it's still DISBURSED
+                # Update loan status to ACTIVE if it's still DISBURSED; a conditional
+                # update so it never conflicts with a coordinator saving the loan
                 if loan.status == 'DISBURSED':
-                    loan.status = 'ACTIVE'
-                    loan.save()
+                    Loan.objects.filter(pk=loan.pk, status='DISBURSED').update(
+                        status='ACTIVE', version=F('version') + 1, updated_at=timezone.now()
+                    )
                 
                 messages.success(request, 
                     f'Payment of {amount:,.2f} RWF submitted successfully. '
@@ -1248,11 +1246,13 @@ def pay_loan(request, loan_id):
         'payment_history': payment_history,
         'penalty_amount': penalty_amount,
         'total_amount_due': total_amount_due,
+        'idempotency_key': uuid.uuid4(),
     }
     
     return render(request, 'gwizacash/loan_payment.html', context)
 
 @login_required
+@replica_reads
 def transaction_history(request):
     user_profile = request.user.userprofile
 
@@ -1260,6 +1260,8 @@ def transaction_history(request):
 
     if user_profile.user_type != 'COORDINATOR':
         transactions = transactions.filter(user=request.user)
+    else:
+        transactions = transactions.filter(user__userprofile__group=user_profile.group)
 
     # Pagination
     paginator = Paginator(transactions.order_by('-date'), 10)
@@ -1274,9 +1276,9 @@ def transaction_history(request):
     share_summary = {
         'committed': user_profile.committed_shares,
         'paid': user_profile.paid_shares,
-        'remaining': user_profile.committed_shares - user_profile.paid_shares,
+        'remaining': user_profile.remaining_shares,
         'total_value': user_profile.total_commitment,
-        'paid_value': user_profile.paid_shares * 20000,
+        'paid_value': user_profile.paid_share_value,
         'remaining_value': user_profile.remaining_share_balance
     }
 
@@ -1291,13 +1293,22 @@ def transaction_history(request):
 
     return render(request, 'gwizacash/transaction_history.html', context)
 
+@require_safe
+@login_required
+@coordinator_required
+def work_queue_counts(request):
+    """Counts behind the coordinator menu badges, as JSON; one primary-key read"""
+    return JsonResponse(queue_counts(request.user.userprofile.group_id))
+
 # Profit distribution views
 # NEW: View to show available profits
 @login_required
 @coordinator_required
+@replica_reads
 def view_profits(request):
-    penalty_profits = Penalty.objects.filter(is_paid=True).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-    loan_interest_profits = Loan.objects.filter(status='PAID').aggregate(Sum('total_interest'))['total_interest__sum'] or Decimal('0')
+    group = request.user.userprofile.group
+    penalty_profits = Penalty.objects.filter(group=group, is_paid=True).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+    loan_interest_profits = Loan.objects.filter(group=group, status=Loan.STATUS.REPAID).aggregate(Sum('interest_amount'))['interest_amount__sum'] or Decimal('0')
     total_profits = penalty_profits + loan_interest_profits
     
     context = {
@@ -1314,57 +1325,53 @@ def distribute_profits(request):
     today = timezone.now().date()
     this_month = today.month
     this_year = today.year
+    group = request.user.userprofile.group
 
-    already_distributed = ProfitDistribution.objects.filter(
+    month = today.replace(day=1)
+    run = DistributionRun.objects.filter(group=group, month=month).first()
+    already_distributed = (run is not None and run.is_finished) or ProfitDistribution.objects.filter(
+        group=group,
+        run__isnull=True,
         distribution_date__month=this_month,
         distribution_date__year=this_year
     ).exists()
 
-    # Calculate total profits and shares
-    penalty_profits = Penalty.objects.filter(is_paid=True).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-    loan_profits = Loan.objects.filter(status='PAID').aggregate(Sum('interest_amount'))['interest_amount__sum'] or Decimal('0')
-    total_profits = penalty_profits + loan_profits
-
-    total_shares = UserProfile.objects.aggregate(Sum('committed_shares'))['committed_shares__sum'] or 0
-
-    per_share_amount = total_profits / total_shares if total_shares > 0 else Decimal('0')
-
     if request.method == 'POST':
-        if already_distributed:
-            messages.warning(request, "Profits for this month have already been distributed.")
+        mode = request.POST.get('mode', 'committed')
+        if mode not in DISTRIBUTION_MODES:
+            messages.error(request, 'Choose how the profit should be weighted.')
             return redirect('gwizacash:distribute_profits')
-
-        if total_shares == 0:
-            messages.error(request, 'No committed shares found. Cannot distribute profits.')
+        try:
+            run = start_run(group.pk, today, mode, started_by=request.user)
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
             return redirect('gwizacash:distribute_profits')
+        if run.is_finished:
+            messages.warning(request, "Profits for this month have already been distributed.")
+        else:
+            # The page pays the members chunk by chunk and shows the progress
+            messages.info(request, f'Distributing {run.profit:,.0f} RWF to {run.members_total} members.')
+        return redirect('gwizacash:distribute_profits')
 
-        distribution_date = timezone.now()
-
-        for profile in UserProfile.objects.filter(committed_shares__gt=0):
-            user_profit = per_share_amount * profile.committed_shares
-            ProfitDistribution.objects.create(
-                user=profile.user,
-                distribution_date=distribution_date,
-                total_amount=user_profit,
-                per_share_amount=per_share_amount,
-                source='LOAN_INTEREST_AND_PENALTIES',
-                shares_distributed=profile.committed_shares
-            )
-            Transaction.objects.create(
-                user=profile.user,
-                transaction_type='PROFIT_DISTRIBUTION',
-                amount=user_profit,
-                description=f'Profit distribution for {profile.committed_shares} shares at {per_share_amount:.2f} RWF/share',
-                date=distribution_date
-            )
-            profile.total_savings += user_profit
-            profile.save()
+    # Calculate total profits and shares
+    penalty_profits = Penalty.objects.filter(group=group, is_paid=True).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+    loan_profits = Loan.objects.filter(group=group, status=Loan.STATUS.REPAID).aggregate(Sum('interest_amount'))['interest_amount__sum'] or Decimal('0')
+    total_profits = penalty_profits + loan_profits
+    fund = CollectiveFund.get_fund(group)
+    fund.update_totals()
 
-        messages.success(request, f'Distributed {total_profits:,.0f} RWF at {per_share_amount:,.2f} RWF per share.')
-        return redirect('gwizacash:distribute_profits')
+    # Each member's weight is read straight off their profile; share-months need no payment history scan
+    mode = request.GET.get('mode', 'committed')
+    if mode not in DISTRIBUTION_MODES:
+        mode = 'committed'
+    unit = 'share-month' if mode == 'share_months' else 'share'
+    group_members = UserProfile.objects.filter(group=group, committed_shares__gt=0).only(*DISTRIBUTION_WEIGHT_FIELDS)
+    total_shares = sum(distribution_weight(profile, mode, month) for profile in group_members)
+
+    per_share_amount = fund.available_profit / total_shares if total_shares > 0 else Decimal('0')
 
     # For GET requests
-    last_distribution = ProfitDistribution.objects.order_by('-distribution_date').first()
+    last_distribution = ProfitDistribution.objects.filter(group=group).order_by('-distribution_date').first()
     next_distribution_date = datetime(today.year, today.month, 2) + relativedelta(months=1)
 
     context = {
@@ -1373,27 +1380,91 @@ def distribute_profits(request):
         'next_distribution_date': next_distribution_date,
         'already_distributed': already_distributed,
         'total_profits': total_profits,
+        'available_profit': fund.available_profit,
         'per_share_amount': per_share_amount,
         'loan_profits': loan_profits,
         'penalty_profits': penalty_profits,
         'total_shares': total_shares,
+        'mode': mode,
+        'mode_label': DISTRIBUTION_MODES[mode],
+        'unit': unit,
+        'distribution_modes': DISTRIBUTION_MODES,
+        'run': run,
     }
     return render(request, 'gwizacash/distribute_profits.html', context)
 
+@require_POST
+@login_required
+@coordinator_required
+def continue_distribution_run(request, run_id):
+    """Pay the next chunk of a distribution run and report its progress as JSON"""
+    run = get_object_or_404(DistributionRun, pk=run_id, group=request.user.userprofile.group)
+    error = ''
+    if not run.is_finished:
+        try:
+            run = advance_run(run)
+        except Exception as e:
+            # Paid chunks stay paid; the run can be resumed from here
+            run.refresh_from_db()
+            error = str(e)
+    return JsonResponse({
+        'status': run.status,
+        'members_done': run.members_done,
+        'members_total': run.members_total,
+        'percent': run.percent_done,
+        'total_distributed': f'{run.total_distributed:,.0f}',
+        'error': error,
+    }, status=500 if error else 200)
+
+@login_required
+@coordinator_required
+@replica_reads
+def profit_simulator(request):
+    """Preview what each member would receive under several distribution policies"""
+    policies = []
+    for basis, reserve in zip(request.GET.getlist('basis'), request.GET.getlist('reserve')):
+        if not basis:
+            continue
+        try:
+            reserve_percent = int(reserve or 0)
+        except ValueError:
+            reserve_percent = -1
+        if basis not in WEIGHT_BASES or not 0 <= reserve_percent <= 100:
+            messages.error(request, 'Each policy needs a known weighting and a reserve between 0 and 100%.')
+            policies = []
+            break
+        policies.append(Policy(basis, reserve_percent))
+    if not policies:
+        policies = [Policy(basis, reserve) for basis, reserve in DEFAULT_POLICIES]
+    policies = policies[:MAX_POLICIES]
+
+    inputs = load_profit_inputs(request.user.userprofile.group)
+    results = simulate(inputs, policies)
+    context = {
+        'inputs': inputs,
+        'results': results,
+        'rows': preview_rows(inputs, results),
+        'weight_bases': WEIGHT_BASES,
+        # Blank rows let the coordinator add policies up to the limit
+        'policy_slots': policies + [None] * (MAX_POLICIES - len(policies)),
+    }
+    return render(request, 'gwizacash/profit_simulator.html', context)
+
 # NEW: Group financials view
 
 @login_required
+@replica_reads
 def group_financials(request):
-    # Get collective fund with updated totals
-    fund = CollectiveFund.get_fund()
-    fund.update_totals()
+    # Get the user's group fund with current totals; reads may come from the replica, so nothing is saved
+    group = request.user.userprofile.group
+    fund = CollectiveFund.read_totals(group)
     
     # Existing calculations
-    total_savings = UserProfile.objects.aggregate(Sum('total_savings'))['total_savings__sum'] or Decimal('0')
-    active_loans = Loan.objects.filter(status__in=['APPROVED', 'ACTIVE', 'DISBURSED']).select_related('user').order_by('-created_at')
+    total_savings = UserProfile.objects.filter(group=group).aggregate(Sum('total_savings'))['total_savings__sum'] or Decimal('0')
+    active_loans = Loan.objects.filter(group=group, status__in=['APPROVED', 'ACTIVE', 'DISBURSED']).select_related('user').order_by('-created_at')
     total_loans = active_loans.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
     total_interest = active_loans.aggregate(Sum('interest_amount'))['interest_amount__sum'] or Decimal('0')
-    total_penalties = Penalty.objects.filter(is_paid=True).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
+    total_penalties = Penalty.objects.filter(group=group, is_paid=True).aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
 
     # Calculate distribution percentage in the view
     if fund.total_profit_earned > 0:
@@ -1402,10 +1473,10 @@ def group_financials(request):
         distribution_percentage = 0
     
     # Recent profit distributions
-    recent_distributions = ProfitDistribution.objects.select_related('user').order_by('-distribution_date')[:10]
+    recent_distributions = ProfitDistribution.objects.filter(group=group).select_related('user').order_by('-distribution_date')[:10]
     
     # Monthly distribution summaries
-    distribution_summaries = ProfitDistributionSummary.objects.order_by('-distribution_date')[:6]
+    distribution_summaries = ProfitDistributionSummary.objects.filter(group=group).order_by('-distribution_date')[:6]
     
     paginator = Paginator(active_loans, 10)
     page_number = request.GET.get('page')
@@ -1450,7 +1521,7 @@ def calculate_penalty(days_late, shares=1):
 def pending_penalty_payments(request):
     pending_payments = PenaltyPayment.objects.filter(
         status='PENDING',
-        penalty__user__userprofile__coordinator=request.user.userprofile
+        penalty__group=request.user.userprofile.group
     ).select_related('penalty', 'penalty__user')
     paginator = Paginator(pending_payments, 10)
     page_number = request.GET.get('page')
@@ -1460,6 +1531,14 @@ def pending_penalty_payments(request):
 
 @login_required
 def pay_penalty(request, penalty_id):
+    idempotency_key = submitted_idempotency_key(request)
+    replay = replay_submission(
+        request, PenaltyPayment.objects.filter(penalty_id=penalty_id, penalty__user=request.user),
+        idempotency_key, 'gwizacash:dashboard'
+    )
+    if replay:
+        return replay
+
     penalty = get_object_or_404(Penalty, id=penalty_id, user=request.user, is_paid=False)
     # Prevent duplicate submissions
     if PenaltyPayment.objects.filter(penalty=penalty, status='PENDING').exists():
@@ -1470,12 +1549,16 @@ def pay_penalty(request, penalty_id):
         if form.is_valid():
             try:
                 with transaction.atomic():
-                    payment = PenaltyPayment.objects.create(
+                    payment, created = create_idempotent(
+                        PenaltyPayment.objects,
+                        idempotency_key,
                         penalty=penalty,
                         amount=form.cleaned_data['amount'],
                         bank_slip=form.cleaned_data['bank_slip'],
                         status='PENDING'
                     )
+                    if not created:
+                        return redirect('gwizacash:dashboard')
                     Transaction.objects.create(
                         user=request.user,
                         transaction_type='PENALTY_PAYMENT',
@@ -1492,7 +1575,9 @@ def pay_penalty(request, penalty_id):
             messages.error(request, 'Invalid form submission')
     else:
         form = PenaltyPaymentForm(penalty=penalty)
-    return render(request, 'gwizacash/pay_penalty.html', {'form': form, 'penalty': penalty})
+    return render(request, 'gwizacash/pay_penalty.html', {
+        'form': form, 'penalty': penalty, 'idempotency_key': uuid.uuid4()
+    })
 
 @login_required
 @coordinator_required
@@ -1501,7 +1586,7 @@ def approve_penalty_payment(request, payment_id):
         payment = PenaltyPayment.objects.select_related('penalty', 'penalty__user').get(
             id=payment_id,
             status='PENDING',
-            penalty__user__userprofile__coordinator=request.user.userprofile
+            penalty__group=request.user.userprofile.group
         )
     except PenaltyPayment.DoesNotExist:
         messages.error(request, "This payment cannot be reviewed.")
@@ -1513,19 +1598,7 @@ def approve_penalty_payment(request, payment_id):
         try:
             with transaction.atomic():
                 if action == 'approve':
-                    payment.status = 'APPROVED'
-                    payment.approved_by = request.user
-                    payment.penalty.is_paid = True
-                    payment.penalty.save()
-                    payment.save()
-                    Transaction.objects.filter(
-                        reference_id=f'PENALTY_PAYMENT-{payment.id}',
-                        transaction_type='PENALTY_PAYMENT'
-                    ).update(status='COMPLETED')
-                    Transaction.objects.filter(
-                        reference_id=f'FINE-{payment.penalty.id}',
-                        transaction_type='PENALTY'
-                    ).update(status='COMPLETED')
+                    approvals.approve_penalty_payment(payment, request.user)
                     messages.success(request, f'Payment of {payment.amount:,.2f} RWF approved')
                 elif action == 'reject':
                     if not rejection_reason:
@@ -1535,26 +1608,104 @@ def approve_penalty_payment(request, payment_id):
                     payment.rejection_reason = rejection_reason
                     payment.rejected_by = request.user
                     payment.save()
+                    record_transition(payment, 'PENDING', 'REJECTED')
                     Transaction.objects.filter(
                         reference_id=f'PENALTY_PAYMENT-{payment.id}',
                         transaction_type='PENALTY_PAYMENT'
-                    ).update(status='REJECTED')
+                    ).update(status='REJECTED', updated_at=timezone.now())
                     messages.success(request, 'Payment rejected')
                 return redirect('gwizacash:pending_penalty_payments')
+        except ValidationError as e:
+            messages.error(request, e.message)
         except Exception as e:
             messages.error(request, f'Error processing payment: {str(e)}')
     return render(request, 'gwizacash/approve_penalty_payment.html', {'payment': payment})
 
+# Bank statement reconciliation
+@login_required
+@coordinator_required
+def reconcile_statement(request):
+    """Propose matches between an uploaded bank statement and the group's pending payments"""
+    context = {'window_days': MATCH_WINDOW_DAYS}
+    if request.method == 'POST':
+        statement = request.FILES.get('statement')
+        if not statement:
+            messages.error(request, 'Choose a bank statement to upload')
+            return redirect('gwizacash:reconcile_statement')
+        if statement.size > MAX_UPLOAD_SIZE:
+            messages.error(request, 'File size exceeds 5MB')
+            return redirect('gwizacash:reconcile_statement')
+        try:
+            lines = parse_statement(statement.name, statement.read())
+        except StatementError as e:
+            messages.error(request, str(e))
+            return redirect('gwizacash:reconcile_statement')
+
+        matches, unmatched = match_statement(lines, pending_candidates(request.user.userprofile.group))
+        context.update({
+            'statement_name': statement.name,
+            'line_count': len(lines),
+            'matches': matches,
+            'unmatched': unmatched,
+        })
+    return render(request, 'gwizacash/reconcile_statement.html', context)
+
+@login_required
+@coordinator_required
+def approve_reconciled(request):
+    """Approve every statement match the coordinator ticked, each in its own transaction"""
+    if request.method != 'POST':
+        return redirect('gwizacash:reconcile_statement')
+
+    group = request.user.userprofile.group
+    pending = {
+        'deposit': (Deposit.objects.filter(group=group), approvals.approve_deposit),
+        'loan_payment': (LoanPayment.objects.filter(loan__group=group), approvals.approve_loan_payment),
+        'penalty_payment': (
+            PenaltyPayment.objects.filter(penalty__group=group).select_related('penalty'),
+            approvals.approve_penalty_payment,
+        ),
+    }
+    approved, skipped = 0, 0
+    for key in request.POST.getlist('match'):
+        kind, _, record_id = key.partition(':')
+        if kind not in pending or not record_id.isdigit():
+            continue
+        queryset, approve = pending[kind]
+
+        def approve_match():
+            return approve(queryset.get(pk=record_id, status='PENDING'), request.user)
+
+        try:
+            retry_on_conflict(approve_match)
+            approved += 1
+        except (ObjectDoesNotExist, ValidationError):
+            skipped += 1
+        except Exception as e:
+            logger.exception(f'Approving reconciled {key} failed')
+            messages.error(request, f'Error approving {key}: {str(e)}')
+
+    if approved:
+        messages.success(request, f'Approved {approved} matched payments')
+    if skipped:
+        messages.warning(request, f'{skipped} matches were skipped because they were already processed')
+    if not approved and not skipped:
+        messages.info(request, 'No matches were selected')
+    return redirect('gwizacash:reconcile_statement')
+
 #check profit distribution
 @login_required
 @coordinator_required
+@replica_reads
 def check_profit_distribution(request):
     today = timezone.now().date()
     this_month = today.month
     this_year = today.year
+    group = request.user.userprofile.group
 
-    last_distribution = ProfitDistribution.objects.order_by('-distribution_date').first()
+    last_distribution = ProfitDistribution.objects.filter(group=group).order_by('-distribution_date').first()
     already_distributed = ProfitDistribution.objects.filter(
+        group=group,
         distribution_date__year=this_year,
         distribution_date__month=this_month
     ).exists()
@@ -1567,19 +1718,20 @@ def check_profit_distribution(request):
             next_distribution_date = datetime(today.year, today.month + 1, 2).date()
 
     # Optional: calculate potential profits
-    loan_profits = Loan.objects.filter(status='PAID').aggregate(
+    loan_profits = Loan.objects.filter(group=group, status=Loan.STATUS.REPAID).aggregate(
         total_interest=Sum('interest_amount')
     )['total_interest'] or Decimal('0')
-    penalty_profits = Penalty.objects.filter(is_paid=True).aggregate(
+    penalty_profits = Penalty.objects.filter(group=group, is_paid=True).aggregate(
         total_amount=Sum('amount')
     )['total_amount'] or Decimal('0')
     total_profits = loan_profits + penalty_profits
 
-    total_shares = UserProfile.objects.aggregate(
+    total_shares = UserProfile.objects.filter(group=group).aggregate(
         total_shares=Sum('committed_shares')
     )['total_shares'] or 0
 
     per_share_amount = total_profits / total_shares if total_shares > 0 else Decimal('0')
+    next_deposit_due = deadline_calendar().next_deadline(request.user.userprofile.group_id, today)
 
     context = {
         'recent_distributions': ProfitDistribution.objects.filter(user=request.user)[:5], 
@@ -1588,7 +1740,8 @@ def check_profit_distribution(request):
         'already_distributed': already_distributed,
         'total_profits': total_profits,
         'per_share_amount': per_share_amount,
-        'next_monthly_deposit_note': "Next deposit due on the 10th of this month"
+        'next_deposit_due': next_deposit_due,
+        'next_monthly_deposit_note': f"Next deposit due on {next_deposit_due:%d %B %Y}"
 
 
     }
@@ -0,0 +1,90 @@
+"""Counts of what is waiting for a group's coordinators.
+
+Each queue is a model in one status: deposits and loan or penalty payments
+waiting for approval, loan requests waiting for a decision and approved loans
+waiting for disbursement. Every status transition into or out of a queue calls
+record_transition() in the same transaction as the status write, which moves
+the counters on the group's WorkQueueCounts row with one UPDATE; reading the
+badges is then a primary-key lookup instead of a COUNT per queue. Changes that
+bypass the transitions (the admin, bulk edits) are corrected by
+repair_counts(), which the scheduler runs every hour.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Deposit, Loan, LoanPayment, PenaltyPayment, WorkQueueCounts
+
+# queue -> (model, status, path from the record to its group)
+QUEUES = {
+    'pending_deposits': (Deposit, 'PENDING', 'group'),
+    'requested_loans': (Loan, 'REQUESTED', 'group'),
+    'approved_loans': (Loan, 'APPROVED', 'group'),
+    'pending_loan_payments': (LoanPayment, 'PENDING', 'loan__group'),
+    'pending_penalty_payments': (PenaltyPayment, 'PENDING', 'penalty__group'),
+}
+_QUEUE_OF = {(model, status): queue for queue, (model, status, _) in QUEUES.items()}
+
+
+def _group_id_of(record, path):
+    for step in path.split('__')[:-1]:
+        record = getattr(record, step)
+    return getattr(record, f"{path.split('__')[-1]}_id")
+
+
+def count_queues(group_id):
+    """Every queue counted from the records themselves"""
+    counts = Loan.objects.filter(group_id=group_id).aggregate(
+        requested_loans=Count('pk', filter=Q(status='REQUESTED')),
+        approved_loans=Count('pk', filter=Q(status='APPROVED')),
+    )
+    for queue in ('pending_deposits', 'pending_loan_payments', 'pending_penalty_payments'):
+        model, status, path = QUEUES[queue]
+        counts[queue] = model.objects.filter(**{f'{path}_id': group_id, 'status': status}).count()
+    return counts
+
+
+def repair_counts(group_id):
+    """Recount the group's queues and store the result; returns the queues that had drifted"""
+    with transaction.atomic():
+        # Transitions wait on the row lock, so none is counted twice or lost while recounting
+        stored = WorkQueueCounts.objects.select_for_update().filter(pk=group_id).first()
+        counts = count_queues(group_id)
+        drifted = {
+            queue: count for queue, count in counts.items()
+            if stored is not None and getattr(stored, queue) != count
+        }
+        WorkQueueCounts.objects.update_or_create(group_id=group_id, defaults={**counts, 'repaired_at': timezone.now()})
+    return drifted
+
+
+def record_transition(record, old_status, new_status):
+    """Move the group's counters for a record whose status has just changed; old_status is None for a new record"""
+    leaving = _QUEUE_OF.get((type(record), old_status))
+    entering = _QUEUE_OF.get((type(record), new_status))
+    if leaving == entering:
+        return
+    group_id = _group_id_of(record, QUEUES[leaving or entering][2])
+    if group_id is None:
+        return
+    changes = {'updated_at': timezone.now()}
+    if leaving:
+        changes[leaving] = Greatest(F(leaving) - 1, Value(0))
+    if entering:
+        changes[entering] = F(entering) + 1
+    if not WorkQueueCounts.objects.filter(pk=group_id).update(**changes):
+        # First transition in the group: the recount already sees this one
+        repair_counts(group_id)
+
+
+def queue_counts(group_id):
+    """The group's queue counts by name, from its counters row"""
+    if group_id is None:
+        # Records outside any group have no counters row; count them directly
+        return count_queues(None)
+    counts = WorkQueueCounts.objects.filter(pk=group_id).values(*QUEUES).first()
+    if counts is None:
+        repair_counts(group_id)
+        counts = WorkQueueCounts.objects.filter(pk=group_id).values(*QUEUES).first()
+    return counts